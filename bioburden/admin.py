@@ -1,5 +1,131 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import Area, Lot, BioburdenData, FixedThreshold, DynamicThreshold, DataImport
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, Q
+from django.urls import reverse
+from django.utils.functional import cached_property
+from .cache import cached_result
+from .lookups import LOOKUPS
+from .models import Area, Lot, Organism, LotOrganism, BioburdenData, FixedThreshold, DynamicThreshold, DataImport, DataExport, DataVersion
+from .thresholds import reclassify_tests
+
+
+def _estimated_row_count(model):
+    """Planner row estimate for a table, or None if the database keeps none"""
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            elif connection.vendor == 'sqlite':
+                # Filled in by ANALYZE: the first number is the table's row count
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if not row or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Changelist paginator that avoids COUNT(*) over large tables
+    
+    Unfiltered lists of at least settings.BIOBURDEN_ADMIN_ESTIMATED_COUNT_MIN
+    rows use the database's row estimate. It is only as fresh as the last
+    ANALYZE, so below that size, or when there is no estimate, counts are
+    exact but cached per data version; only use this for models whose writes
+    bump the DataVersion.
+    """
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = _estimated_row_count(queryset.model)
+            if estimate is not None and estimate >= settings.BIOBURDEN_ADMIN_ESTIMATED_COUNT_MIN:
+                return estimate
+        try:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            return 0
+        return cached_result('admin_count', {'query': sql}, queryset.count)
+
+
+class LookupFilter(admin.RelatedFieldListFilter):
+    """Lot/area filter that lists only the selected object
+    
+    Other objects are found through the lookup's autocomplete endpoint from
+    a search box, instead of rendering one link per row of the table.
+    """
+    template = 'admin/bioburden/lookup_filter.html'
+    lookup = None
+    
+    def field_choices(self, field, request, model_admin):
+        if not self.lookup_val:
+            return []
+        model, label_field = LOOKUPS[self.lookup]
+        try:
+            return list(model.objects.filter(pk__in=self.lookup_val).values_list('pk', label_field))
+        except (ValueError, TypeError):
+            return []
+    
+    def has_output(self):
+        return True
+    
+    def autocomplete_url(self):
+        return reverse(f'bioburden:{self.lookup}_autocomplete')
+
+
+class LotFilter(LookupFilter):
+    lookup = 'lot'
+
+
+class AreaFilter(LookupFilter):
+    lookup = 'area'
+
+
+def _recompute_tests(tests):
+    """Set-based recalculation of adjusted CFU, value and status; returns status changes"""
+    with transaction.atomic(), DataVersion.deferred():
+        tests.exclude(cfu_count=0).update(adjusted_cfu=F('cfu_count') * F('dilution_factor'))
+        tests.refresh_values()
+        return reclassify_tests(tests)
+
+
+@admin.action(description="Recompute adjusted CFU and status of selected tests")
+def recompute_tests(modeladmin, request, queryset):
+    changed = _recompute_tests(BioburdenData.objects.filter(pk__in=queryset.values('pk')))
+    modeladmin.message_user(request, f"Recomputed selected tests; {changed} changed status.")
+
+
+@admin.action(description="Recompute adjusted CFU and status of the selected lots' tests")
+def recompute_lot_tests(modeladmin, request, queryset):
+    changed = _recompute_tests(BioburdenData.objects.filter(lot__in=queryset.values('pk')))
+    modeladmin.message_user(request, f"Recomputed tests of {queryset.count()} lot(s); {changed} changed status.")
+
+
+@admin.action(description="Reclassify tests covered by the selected thresholds")
+def reclassify_threshold_tests(modeladmin, request, queryset):
+    covered = Q(pk__in=[])
+    for threshold in queryset:
+        scope = Q()
+        if threshold.lot_id:
+            scope &= Q(lot_id=threshold.lot_id)
+        if threshold.area_id:
+            scope &= Q(area_id=threshold.area_id)
+        if threshold.effective_from:
+            scope &= Q(test_date__gte=threshold.effective_from)
+        if threshold.effective_to:
+            scope &= Q(test_date__lte=threshold.effective_to)
+        covered |= scope
+    changed = reclassify_tests(BioburdenData.objects.filter(covered))
+    modeladmin.message_user(request, f"Reclassified covered tests; {changed} changed status.")
 
 
 @admin.register(Area)
@@ -13,24 +139,64 @@ class LotAdmin(admin.ModelAdmin):
     list_display = ['lot_number', 'product_name', 'manufacture_date', 'created_at']
     search_fields = ['lot_number', 'product_name']
     list_filter = ['manufacture_date']
+    actions = [recompute_lot_tests]
+
+
+class MirroredFromLotAdmin(admin.ModelAdmin):
+    """View-only admin for rows mirrored from the Lot organism columns
+    
+    Lot.save() rewrites the organisms and links from the primary, secondary
+    and tertiary organism columns, so edits made here would disagree with
+    the lot and be overwritten by its next save. Edit the lot instead.
+    """
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Organism)
+class OrganismAdmin(MirroredFromLotAdmin):
+    list_display = ['name', 'created_at']
+    search_fields = ['name']
+
+
+@admin.register(LotOrganism)
+class LotOrganismAdmin(MirroredFromLotAdmin):
+    list_display = ['lot', 'organism', 'rank']
+    list_filter = ['rank']
+    search_fields = ['lot__lot_number', 'organism__name']
+    raw_id_fields = ['lot', 'organism']
 
 
 @admin.register(FixedThreshold)
 class FixedThresholdAdmin(admin.ModelAdmin):
-    list_display = ['lot', 'area', 'alert_level', 'action_level', 'updated_at']
-    list_filter = ['area']
+    list_display = ['lot', 'area', 'effective_from', 'effective_to', 'alert_level', 'action_level', 'updated_at']
+    list_select_related = ['lot', 'area']
+    list_filter = [('area', AreaFilter), 'effective_from']
     search_fields = ['lot__lot_number']
     raw_id_fields = ['lot', 'area']
+    actions = [reclassify_threshold_tests]
 
 
 @admin.register(BioburdenData)
 class BioburdenDataAdmin(admin.ModelAdmin):
     list_display = ['lot', 'area', 'test_date', 'cfu_count', 'adjusted_cfu', 'status', 'get_status_badge']
-    list_filter = ['status', 'area', 'test_date', 'lot']
+    list_select_related = ['lot', 'area']
+    list_filter = ['status', 'organism_type', 'validation', ('area', AreaFilter), 'test_date', ('lot', LotFilter)]
     search_fields = ['lot__lot_number', 'area__name', 'sample_id']
-    date_hierarchy = 'test_date'
     raw_id_fields = ['lot', 'area']
-    readonly_fields = ['adjusted_cfu', 'status', 'created_at', 'updated_at']
+    # Matches the (test_date, id) index instead of sorting on the joined lot number
+    ordering = ['-test_date', '-id']
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    actions = [recompute_tests]
+    readonly_fields = ['adjusted_cfu', 'value', 'status', 'sample_count', 'sample_mean', 'sample_min', 'sample_max', 'created_at', 'updated_at']
     
     def get_status_badge(self, obj):
         colors = {
@@ -56,3 +222,11 @@ class DataImportAdmin(admin.ModelAdmin):
     list_filter = ['status', 'upload_date']
     search_fields = ['file_name', 'imported_by']
     readonly_fields = ['upload_date']
+
+
+@admin.register(DataExport)
+class DataExportAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'format', 'created_at', 'rows_exported', 'status', 'requested_by']
+    list_filter = ['status', 'format', 'created_at']
+    search_fields = ['requested_by']
+    readonly_fields = ['created_at', 'completed_at']
@@ -0,0 +1,81 @@
+"""
+Time-bucketed trend aggregates computed in the database.
+
+Tests carry precomputed test_week / test_month bucket columns (indexed with
+area), so grouping by bucket is a plain GROUP BY. The 95th percentile uses
+the nearest-rank method via ROW_NUMBER() over each group, which works on
+SQLite as well as PostgreSQL.
+"""
+from django.db.models import Avg, Count, ExpressionWrapper, F, IntegerField, Max, Q, Window
+from django.db.models.functions import RowNumber
+
+from .thresholds import STATUS_NAMES
+
+
+BUCKET_FIELDS = {
+    'day': 'test_date',
+    'week': 'test_week',
+    'month': 'test_month',
+}
+
+# Grouping dimension -> (key field, label field)
+GROUP_FIELDS = {
+    'area': ('area_id', 'area__name'),
+    'lot': ('lot_id', 'lot__lot_number'),
+    'organism_type': ('organism_type', 'organism_type'),
+}
+
+
+def _percentile_95(queryset, key_fields):
+    """Nearest-rank p95 of value per group, keyed by the group's key tuple"""
+    partition = [F(field) for field in key_fields]
+    ranked = queryset.order_by().annotate(
+        position=Window(RowNumber(), partition_by=partition, order_by=F('value').asc()),
+        group_size=Window(Count('id'), partition_by=partition),
+    ).filter(
+        # ceil(0.95 * n) in integer arithmetic
+        position=ExpressionWrapper((F('group_size') * 95 + 99) / 100, output_field=IntegerField())
+    )
+    return {row[:-1]: row[-1] for row in ranked.values_list(*key_fields, 'value')}
+
+
+def bucket_aggregates(queryset, bucket='month', group_by=()):
+    """Per-bucket count, mean, max, p95 and status counts for the given tests
+
+    group_by is a sequence of GROUP_FIELDS names that split each bucket
+    further. Rows are ordered by bucket, then by the group labels.
+    """
+    bucket_field = BUCKET_FIELDS[bucket]
+    key_fields = [bucket_field] + [GROUP_FIELDS[name][0] for name in group_by]
+    label_fields = [GROUP_FIELDS[name][1] for name in group_by]
+    value_fields = list(dict.fromkeys(key_fields + label_fields))
+
+    rows = queryset.order_by().values(*value_fields).annotate(
+        count=Count('id'),
+        mean=Avg('value'),
+        max=Max('value'),
+        **{
+            f'status_{status}': Count('id', filter=Q(status=status))
+            for status in STATUS_NAMES
+        },
+    ).order_by(bucket_field, *label_fields)
+
+    p95 = _percentile_95(queryset, key_fields)
+
+    results = []
+    for row in rows:
+        entry = {'bucket': row[bucket_field].isoformat() if row[bucket_field] else None}
+        for name in group_by:
+            key_field, label_field = GROUP_FIELDS[name]
+            entry[name] = row[label_field]
+            if key_field != label_field:
+                entry[f'{name}_id'] = row[key_field]
+        entry.update({
+            'count': row['count'],
+            'mean': round(row['mean'], 2),
+            'max': row['max'],
+            'p95': p95.get(tuple(row[field] for field in key_fields)),
+            'status': {status: row[f'status_{status}'] for status in STATUS_NAMES},
+        })
+        results.append(entry)
+    return results
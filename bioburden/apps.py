@@ -5,3 +5,6 @@ class BioburdenConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bioburden'
     verbose_name = 'Bioburden Management'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,341 @@
+"""
+Latency benchmark of the views and APIs at scaled data sizes.
+
+generate_dataset() replaces the data with synthetic lots, areas, organisms,
+thresholds and tests. Every column is drawn for a whole batch at once with
+NumPy: lot CFU levels are log-normal, areas and organism types are skewed,
+and tests are classified against the generated thresholds with a
+ThresholdIndex. The rows are written with executemany() rather than
+bulk_create(), because building a million model instances would dominate
+the run.
+
+run_benchmark() loads the analytics snapshot once per size (timed on its
+own), then requests each page through the Django test client. The first
+request of a page is the cold one (result cache empty); the following ones
+give the warm p50/p95. Peak Python memory is measured in a separate
+tracemalloc pass with the result cache cleared, so tracing does not slow
+down the timed requests.
+
+The benchmark management command runs this against a throwaway test
+database; never call generate_dataset() on real data.
+"""
+import math
+import time
+import tracemalloc
+from datetime import date
+
+import numpy as np
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache import result_cache
+from .models import Area, BioburdenData, DataVersion, FixedThreshold, Lot, LotOrganism, Organism
+from .snapshot import get_snapshot
+from .thresholds import NO_THRESHOLD, STATUS_NAMES, ThresholdIndex
+
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+AREA_NAMES = [
+    'Clean Room A', 'Clean Room B', 'Clean Room C', 'Filling Line 1', 'Filling Line 2',
+    'Compounding', 'Weighing Room', 'Packaging Area', 'Airlock 1', 'Airlock 2',
+    'Water System', 'Warehouse',
+]
+
+ORGANISM_NAMES = [
+    'Staphylococcus epidermidis', 'Staphylococcus hominis', 'Staphylococcus aureus',
+    'Micrococcus luteus', 'Kocuria rhizophila', 'Bacillus subtilis', 'Bacillus cereus',
+    'Bacillus licheniformis', 'Corynebacterium spp.', 'Cutibacterium acnes',
+    'Pseudomonas aeruginosa', 'Pseudomonas fluorescens', 'Ralstonia pickettii',
+    'Burkholderia cepacia', 'Escherichia coli', 'Enterobacter cloacae',
+    'Streptococcus spp.', 'Paenibacillus spp.', 'Aspergillus niger', 'Aspergillus fumigatus',
+    'Penicillium spp.', 'Cladosporium spp.', 'Candida albicans', 'Rhodotorula spp.',
+    'Alternaria spp.',
+]
+
+PRODUCT_NAMES = ['Product A', 'Product B', 'Product C', 'Product D', 'Product E', 'Product F']
+
+ORGANISM_TYPES = ('AEROBES', 'FUNGI', None)
+ORGANISM_TYPE_WEIGHTS = (0.6, 0.35, 0.05)
+
+SAMPLES_PER_TEST = 3
+HISTORY_DAYS = 3 * 365
+TESTS_PER_LOT = 250
+
+_INSERT_COLUMNS = [
+    'lot_id', 'area_id', 'test_date', 'test_week', 'test_month', 'sample_id', 'organism_type',
+    'validation', 'cfu_count', 'samples', 'sample_count', 'sample_mean', 'sample_min', 'sample_max',
+    'dilution_factor', 'adjusted_cfu', 'value', 'lab_name', 'status', 'created_at', 'updated_at',
+]
+
+
+def _clear_data():
+    for model in (BioburdenData, FixedThreshold, LotOrganism, Lot, Organism, Area):
+        model.objects.all().delete()
+
+
+def _iso_dates(day_numbers):
+    """numpy datetime64 day numbers as ISO date strings"""
+    return np.asarray(day_numbers, dtype='datetime64[D]').astype(str).tolist()
+
+
+def generate_dataset(rows, seed=0, batch_size=10_000):
+    """Replace all data with rows synthetic tests; returns the seconds taken"""
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    n_lots = max(10, rows // TESTS_PER_LOT)
+    end = np.datetime64(date.today(), 'D')
+    first_day = end - HISTORY_DAYS
+
+    with transaction.atomic(), DataVersion.deferred():
+        _clear_data()
+
+        areas = Area.objects.bulk_create([Area(name=name) for name in AREA_NAMES])
+        organisms = Organism.objects.bulk_create([Organism(name=name) for name in ORGANISM_NAMES])
+        area_ids = np.array([area.pk for area in areas], dtype=np.int64)
+
+        # One to three distinct organisms per lot, popular ones more likely
+        popularity = rng.dirichlet(np.full(len(organisms), 0.7))
+        keys = rng.random((n_lots, len(organisms))) ** (1 / popularity)
+        ranked = np.argsort(-keys, axis=1)[:, :3]
+        organism_counts = rng.choice([1, 2, 3], size=n_lots, p=[0.3, 0.4, 0.3])
+        manufactured = _iso_dates(first_day + rng.integers(0, HISTORY_DAYS, n_lots))
+        products = rng.integers(0, len(PRODUCT_NAMES), n_lots)
+        lots = Lot.objects.bulk_create([
+            Lot(
+                lot_number=f'BENCH-{i:07d}',
+                product_name=PRODUCT_NAMES[products[i]],
+                manufacture_date=manufactured[i],
+                primary_organism=ORGANISM_NAMES[ranked[i, 0]],
+                secondary_organism=ORGANISM_NAMES[ranked[i, 1]] if organism_counts[i] > 1 else None,
+                tertiary_organism=ORGANISM_NAMES[ranked[i, 2]] if organism_counts[i] > 2 else None,
+            )
+            for i in range(n_lots)
+        ], batch_size=batch_size)
+        lot_ids = np.array([lot.pk for lot in lots], dtype=np.int64)
+        LotOrganism.objects.bulk_create([
+            LotOrganism(lot=lots[i], organism=organisms[ranked[i, rank]], rank=rank + 1)
+            for i in range(n_lots)
+            for rank in range(int(organism_counts[i]))
+        ], batch_size=batch_size)
+
+        # Lot CFU medians are log-normal; lot thresholds sit well above them,
+        # and a few areas carry their own stricter area-wide levels
+        lot_median = rng.lognormal(mean=2.5, sigma=0.8, size=n_lots)
+        FixedThreshold.objects.bulk_create([
+            FixedThreshold(lot=lots[i], alert_level=round(float(lot_median[i]) * 3, 2),
+                           action_level=round(float(lot_median[i]) * 6, 2))
+            for i in range(n_lots)
+        ], batch_size=batch_size)
+        FixedThreshold.objects.bulk_create([
+            FixedThreshold(area=area, alert_level=20, action_level=50)
+            for area in areas[::4]
+        ])
+        index = ThresholdIndex.load()
+
+        area_weights = rng.dirichlet(np.full(len(area_ids), 2.0))
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        table = connection.ops.quote_name(BioburdenData._meta.db_table)
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            table,
+            ', '.join(connection.ops.quote_name(column) for column in _INSERT_COLUMNS),
+            ', '.join(['%s'] * len(_INSERT_COLUMNS)),
+        )
+
+        with connection.cursor() as cursor:
+            for offset in range(0, rows, batch_size):
+                n = min(batch_size, rows - offset)
+                lot_codes = rng.integers(0, n_lots, n)
+                lot = lot_ids[lot_codes]
+                area = area_ids[rng.choice(len(area_ids), n, p=area_weights)]
+                days = first_day + rng.integers(0, HISTORY_DAYS + 1, n)
+                weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+                weeks = days - weekday
+                months = days.astype('datetime64[M]').astype('datetime64[D]')
+                ordinals = days.astype(np.int64) + date(1970, 1, 1).toordinal()
+
+                samples = rng.lognormal(np.log(lot_median[lot_codes])[:, None], 0.6, (n, SAMPLES_PER_TEST)).round()
+                cfu = samples.mean(axis=1).round(2)
+                dilution = rng.choice([1.0, 1.0, 1.0, 10.0], n)
+                adjusted = (cfu * dilution).round(2)
+                value = np.where(adjusted > 0, adjusted, cfu)
+
+                codes = index.classify(lot, area, ordinals, value)
+                status = np.array(STATUS_NAMES, dtype=object)[np.where(codes == NO_THRESHOLD, 0, codes)]
+                organism_type = np.array(ORGANISM_TYPES, dtype=object)[
+                    rng.choice(len(ORGANISM_TYPES), n, p=ORGANISM_TYPE_WEIGHTS)
+                ]
+                packed = samples.astype(BioburdenData.SAMPLE_DTYPE).tobytes()
+                width = SAMPLES_PER_TEST * 8
+
+                cursor.executemany(sql, zip(
+                    lot.tolist(),
+                    area.tolist(),
+                    _iso_dates(days),
+                    _iso_dates(weeks),
+                    _iso_dates(months),
+                    [f'S{offset + i:08d}' for i in range(n)],
+                    organism_type.tolist(),
+                    (rng.random(n) < 0.05).tolist(),
+                    cfu.tolist(),
+                    [packed[i * width:(i + 1) * width] for i in range(n)],
+                    [SAMPLES_PER_TEST] * n,
+                    samples.mean(axis=1).tolist(),
+                    samples.min(axis=1).tolist(),
+                    samples.max(axis=1).tolist(),
+                    dilution.tolist(),
+                    adjusted.tolist(),
+                    value.tolist(),
+                    ['QC Micro Lab'] * n,
+                    status.tolist(),
+                    [now] * n,
+                    [now] * n,
+                ))
+
+        # Raw inserts bypass the model signals
+        DataVersion.bump()
+
+    return time.perf_counter() - started
+
+
+def benchmark_urls():
+    """(name, url) of every read-only page and API, using generated objects"""
+    lot = Lot.objects.order_by('pk').first()
+    area = Area.objects.order_by('pk').first()
+    test = BioburdenData.objects.order_by('pk').first()
+    threshold = FixedThreshold.objects.order_by('pk').first()
+    simulation = f'alert_level=30&action_level=60&lot={lot.pk}'
+
+    return [
+        ('dashboard', reverse('bioburden:dashboard')),
+        ('data_list', reverse('bioburden:data_list')),
+        ('data_list_filtered', reverse('bioburden:data_list') + f'?lot={lot.pk}&status=alert'),
+        ('data_create', reverse('bioburden:data_create')),
+        ('data_update', reverse('bioburden:data_update', args=[test.pk])),
+        ('threshold_list', reverse('bioburden:threshold_list')),
+        ('threshold_create', reverse('bioburden:threshold_create')),
+        ('threshold_update', reverse('bioburden:threshold_update', args=[threshold.pk])),
+        ('threshold_simulator', reverse('bioburden:threshold_simulator') + f'?{simulation}'),
+        ('import_data', reverse('bioburden:import_data')),
+        ('lot_detail', reverse('bioburden:lot_detail', args=[lot.pk])),
+        ('lot_tests_api', reverse('bioburden:lot_tests_api', args=[lot.pk])),
+        ('area_comparison', reverse('bioburden:area_comparison')),
+        ('outlier_analysis', reverse('bioburden:outlier_analysis')),
+        ('organism_frequency', reverse('bioburden:organism_frequency')),
+        ('cfu_per_area_analysis', reverse('bioburden:cfu_per_area_analysis')),
+        ('statistical_summary', reverse('bioburden:statistical_summary')),
+        ('chart_data_api', reverse('bioburden:chart_data_api')),
+        ('chart_data_api_lot', reverse('bioburden:chart_data_api') + f'?lot={lot.pk}'),
+        ('aggregate_api', reverse('bioburden:aggregate_api') + '?bucket=week&group_by=area'),
+        ('tests_api', reverse('bioburden:tests_api') + f'?area={area.pk}'),
+        ('tests_api_csv', reverse('bioburden:tests_api') + f'?format=csv&lot={lot.pk}'),
+        ('export_csv', reverse('bioburden:export_data') + f'?format=csv&lot={lot.pk}'),
+        ('lot_autocomplete', reverse('bioburden:lot_autocomplete') + '?q=bench-00'),
+        ('area_autocomplete', reverse('bioburden:area_autocomplete') + '?q=clean'),
+        ('threshold_simulation_api', reverse('bioburden:threshold_simulation_api') + f'?{simulation}'),
+        ('cache_stats_api', reverse('bioburden:cache_stats_api')),
+    ]
+
+
+def _get(client, url):
+    """GET url, consuming streamed content; returns (response, body size)"""
+    response = client.get(url)
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    return response, size
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * q / 100) - 1)]
+
+
+def measure(client, url, repeat):
+    """Timings, query count and peak memory of one page"""
+    timings = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(repeat + 1):
+            started = time.perf_counter()
+            response, size = _get(client, url)
+            timings.append((time.perf_counter() - started) * 1000)
+            if len(timings) == 1:
+                cold_queries = len(queries)
+    warm = timings[1:]
+
+    result_cache().clear()
+    tracemalloc.start()
+    try:
+        _get(client, url)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'bytes': size,
+        'cold_ms': round(timings[0], 2),
+        'p50_ms': round(_percentile(warm, 50), 2),
+        'p95_ms': round(_percentile(warm, 95), 2),
+        'cold_queries': cold_queries,
+        'warm_queries': (len(queries) - cold_queries) // repeat,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_benchmark(sizes=SIZES, repeat=10, seed=0, views=None, progress=None):
+    """Generate each data size and measure every page
+
+    Returns (datasets, results): per size the generation and snapshot load
+    times, and per size and page the measure() figures.
+    """
+    datasets, results = [], []
+    for size in sizes:
+        generate_seconds = generate_dataset(size, seed=seed)
+        result_cache().clear()
+        started = time.perf_counter()
+        get_snapshot()
+        snapshot_ms = (time.perf_counter() - started) * 1000
+        datasets.append({'size': size, 'generate_s': round(generate_seconds, 2), 'snapshot_ms': round(snapshot_ms, 2)})
+        if progress:
+            progress(f'{size} rows: generated in {generate_seconds:.1f}s, snapshot loaded in {snapshot_ms:.0f} ms')
+
+        urls = benchmark_urls()
+        unknown = set(views or ()) - {name for name, _ in urls}
+        if unknown:
+            raise ValueError(f"Unknown view(s): {', '.join(sorted(unknown))}")
+
+        client = Client()
+        for name, url in urls:
+            if views and name not in views:
+                continue
+            row = {'size': size, 'view': name, 'url': url, **measure(client, url, repeat)}
+            results.append(row)
+            if progress:
+                progress(
+                    f"  {name:<26} cold {row['cold_ms']:9.1f} ms  p50 {row['p50_ms']:8.1f}  "
+                    f"p95 {row['p95_ms']:8.1f}  {row['cold_queries']:4d} q  {row['peak_kib']:10.1f} KiB"
+                )
+    return datasets, results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Rows of results whose warm p95 or cold time grew by more than tolerance over baseline"""
+    previous = {(row['size'], row['view']): row for row in baseline}
+    regressions = []
+    for row in results:
+        before = previous.get((row['size'], row['view']))
+        if before is None:
+            continue
+        for metric in ('cold_ms', 'p95_ms'):
+            if before[metric] > 0 and row[metric] > before[metric] * (1 + tolerance):
+                regressions.append({
+                    'size': row['size'], 'view': row['view'], 'metric': metric,
+                    'baseline': before[metric], 'current': row[metric],
+                    'change': round(row[metric] / before[metric] - 1, 3),
+                })
+    return regressions
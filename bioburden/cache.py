@@ -0,0 +1,362 @@
+"""
+Result cache for the analysis pages and chart API.
+
+Results are keyed by view name, normalized filter parameters, the global
+DataVersion (with the database's token) and the code version, so any write,
+a different database or a deploy makes every older entry unreachable
+without an explicit purge; stale entries simply age out of the LRU.
+
+SQLiteLRUCache is a Django cache backend backed by a local SQLite file, so
+all worker processes on a host share one cache. It evicts least recently
+read entries once MAX_ENTRIES is exceeded and counts hits and misses per
+key namespace (the part of the key before the first ':'). Reads do not
+write: each process buffers its hit/miss counts and the read times of its
+entries (only refreshed once they are ACCESS_INTERVAL seconds old) and
+flushes them every FLUSH_INTERVAL seconds and at exit.
+
+conditional_on_data_version() lets browsers revalidate those pages: the
+ETag comes from the same data version, database token and code version as
+the result keys, and Last-Modified from the last bump, so a 304 costs one
+query.
+"""
+import atexit
+import functools
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, time as dt_time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import DataVersion
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_entry_accessed ON cache_entry (accessed);
+CREATE TABLE IF NOT EXISTS cache_stat (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class SQLiteLRUCache(BaseCache):
+    """Django cache backend storing pickled values in a local SQLite file"""
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = str(location)
+        self._local = threading.local()
+        options = params.get('OPTIONS', {})
+        self._access_interval = float(options.get('ACCESS_INTERVAL', 60))
+        self._flush_interval = float(options.get('FLUSH_INTERVAL', 10))
+        self._lock = threading.Lock()
+        self._pending_stats = defaultdict(lambda: [0, 0])
+        self._pending_access = {}
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self._path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def _namespace(key):
+        return key.split(':', 1)[0]
+
+    def _record(self, key, hit):
+        with self._lock:
+            self._pending_stats[self._namespace(key)][0 if hit else 1] += 1
+
+    def get(self, key, default=None, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            'SELECT value, expires, accessed FROM cache_entry WHERE key = ?', (cache_key,)
+        ).fetchone()
+
+        if row is None or (row[1] is not None and row[1] <= now):
+            self._record(key, hit=False)
+            self.maybe_flush()
+            return default
+        self._record(key, hit=True)
+        if now - row[2] >= self._access_interval:
+            with self._lock:
+                self._pending_access[cache_key] = now
+        self.maybe_flush()
+        return pickle.loads(row[0])
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered read times and hit/miss counts of this process"""
+        with self._lock:
+            stats, self._pending_stats = self._pending_stats, defaultdict(lambda: [0, 0])
+            access, self._pending_access = self._pending_access, {}
+            self._last_flush = time.monotonic()
+        if not stats and not access:
+            return
+        try:
+            with self._connection() as connection:
+                connection.executemany(
+                    'UPDATE cache_entry SET accessed = MAX(accessed, ?) WHERE key = ?',
+                    [(accessed, cache_key) for cache_key, accessed in access.items()],
+                )
+                connection.executemany(
+                    'INSERT INTO cache_stat (namespace, hits, misses) VALUES (?, ?, ?) '
+                    'ON CONFLICT (namespace) DO UPDATE SET '
+                    'hits = hits + excluded.hits, misses = misses + excluded.misses',
+                    [(namespace, hits, misses) for namespace, (hits, misses) in stats.items()],
+                )
+        except sqlite3.Error:
+            # Keep the counts for the next flush rather than losing them
+            with self._lock:
+                for namespace, (hits, misses) in stats.items():
+                    self._pending_stats[namespace][0] += hits
+                    self._pending_stats[namespace][1] += misses
+                for cache_key, accessed in access.items():
+                    self._pending_access.setdefault(cache_key, accessed)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store(key, value, timeout, version, replace=True)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._store(key, value, timeout, version, replace=False)
+
+    def _store(self, key, value, timeout, version, replace):
+        cache_key = self.make_and_validate_key(key, version=version)
+        blob = pickle.dumps(value, self.pickle_protocol)
+        connection = self._connection()
+        now = time.time()
+
+        with connection:
+            if not replace:
+                connection.execute(
+                    'DELETE FROM cache_entry WHERE key = ? AND expires IS NOT NULL AND expires <= ?',
+                    (cache_key, now),
+                )
+            cursor = connection.execute(
+                f'INSERT OR {"REPLACE" if replace else "IGNORE"} INTO cache_entry '
+                '(key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                (cache_key, blob, self.get_backend_timeout(timeout), now),
+            )
+            stored = cursor.rowcount > 0
+            if stored:
+                self._cull(connection, now)
+        return stored
+
+    def _cull(self, connection, now):
+        (count,) = connection.execute('SELECT COUNT(*) FROM cache_entry').fetchone()
+        if count <= self._max_entries:
+            return
+        connection.execute(
+            'DELETE FROM cache_entry WHERE expires IS NOT NULL AND expires <= ?', (now,)
+        )
+        (count,) = connection.execute('SELECT COUNT(*) FROM cache_entry').fetchone()
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache_entry')
+            return
+        # Evict the least recently read entries
+        connection.execute(
+            'DELETE FROM cache_entry WHERE key IN '
+            '(SELECT key FROM cache_entry ORDER BY accessed LIMIT ?)',
+            (max(count // self._cull_frequency, count - self._max_entries),),
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        with self._connection() as connection:
+            cursor = connection.execute(
+                'UPDATE cache_entry SET expires = ?, accessed = ? WHERE key = ?',
+                (self.get_backend_timeout(timeout), time.time(), cache_key),
+            )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        with self._connection() as connection:
+            cursor = connection.execute('DELETE FROM cache_entry WHERE key = ?', (cache_key,))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (cache_key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM cache_entry')
+
+    def stats(self):
+        """Return entry count, stored bytes and hits/misses per namespace"""
+        self.flush()
+        connection = self._connection()
+        entries, size = connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache_entry'
+        ).fetchone()
+        namespaces = {}
+        for namespace, hits, misses in connection.execute(
+            'SELECT namespace, hits, misses FROM cache_stat ORDER BY namespace'
+        ):
+            namespaces[namespace] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+            }
+        return {
+            'entries': entries,
+            'size_bytes': size,
+            'max_entries': self._max_entries,
+            'namespaces': namespaces,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._pending_stats.clear()
+        with self._connection() as connection:
+            connection.execute('DELETE FROM cache_stat')
+
+
+def result_cache():
+    """The cache holding analysis results (settings.BIOBURDEN_RESULT_CACHE alias)"""
+    return caches[getattr(settings, 'BIOBURDEN_RESULT_CACHE', 'results')]
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """settings.BIOBURDEN_CODE_VERSION, or a digest of the app's code and templates
+
+    Part of every result key, so results pickled by an older deploy are
+    never unpickled into (or rendered by) newer views.
+    """
+    configured = getattr(settings, 'BIOBURDEN_CODE_VERSION', '')
+    if configured:
+        return configured
+    digest = hashlib.sha1()
+    roots = [Path(__file__).resolve().parent]
+    for engine in settings.TEMPLATES:
+        roots.extend(Path(directory) for directory in engine.get('DIRS', []))
+    for root in roots:
+        for path in sorted(root.rglob('*')):
+            if path.suffix in ('.py', '.html') and '__pycache__' not in path.parts:
+                digest.update(str(path.relative_to(root)).encode())
+                digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def result_key(name, params, version=None):
+    """Cache key for a view result: name, code and data version, digest of the params
+
+    version defaults to DataVersion.key(), the data version qualified by the
+    database's token. Empty parameters are dropped and the rest sorted, so
+    equivalent query strings share one entry.
+    """
+    if version is None:
+        version = DataVersion.key()
+    normalized = json.dumps(
+        sorted((key, str(value)) for key, value in params.items() if value not in (None, '')),
+        separators=(',', ':'),
+    )
+    digest = hashlib.sha1(normalized.encode()).hexdigest()[:16]
+    return f'{name}:{code_version()}-{version}:{digest}'
+
+
+_MISSING = object()
+
+
+def cached_result(name, params, compute):
+    """Return compute() for this view and params at the current data version"""
+    cache = result_cache()
+    key = result_key(name, params)
+    result = cache.get(key, _MISSING)
+    if result is _MISSING:
+        result = compute()
+        cache.set(key, result)
+    return result
+
+
+def result_cache_stats():
+    """Hit/miss statistics of the result cache, if its backend keeps them"""
+    cache = result_cache()
+    if not hasattr(cache, 'stats'):
+        return {}
+    return cache.stats()
+
+
+def _data_state(request):
+    # Shared by the ETag and Last-Modified callbacks of one request
+    if not hasattr(request, '_bioburden_data_state'):
+        request._bioburden_data_state = DataVersion.state()
+    return request._bioburden_data_state
+
+
+def conditional_on_data_version(name, daily=False, negotiate_gzip=False):
+    """Answer conditional GETs with 304 until the data version changes
+
+    The ETag covers the view name, URL kwargs, query parameters, data
+    version, database token and code version (see result_key()), so a
+    reset database or a new deploy never answers 304 for a page the
+    browser got elsewhere; Last-Modified is the time of the last bump. Views whose output
+    also depends on today's date (e.g. the threshold in force) pass
+    daily=True; views that may gzip their body pass negotiate_gzip=True so
+    the two encodings get distinct ETags. Responses carry Cache-Control:
+    no-cache so browsers store them but revalidate on every use.
+    """
+    def etag(request, *args, **kwargs):
+        data_key, _ = _data_state(request)
+        params = {**request.GET.dict(), **kwargs}
+        if daily:
+            params['today'] = date.today()
+        if negotiate_gzip and 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            params['encoding'] = 'gzip'
+        return result_key(name, params, version=data_key).replace(':', '-')
+
+    def last_modified(request, *args, **kwargs):
+        _, updated_at = _data_state(request)
+        if updated_at is None or not daily:
+            return updated_at
+        # Server-local midnight, matching the date the views resolve thresholds for
+        midnight = datetime.combine(date.today(), dt_time.min).astimezone()
+        return max(updated_at, midnight)
+
+    def decorator(view):
+        return cache_control(no_cache=True)(
+            condition(etag_func=etag, last_modified_func=last_modified)(view)
+        )
+    return decorator
@@ -0,0 +1,93 @@
+"""
+Server-side downsampling of chart time series.
+
+Both methods return sorted row indices into the input so callers can pick
+any columns for the kept points. Points flagged in `keep` (e.g. alert and
+action results) are always part of the output.
+"""
+import numpy as np
+
+
+METHODS = ('lttb', 'minmax')
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: n_out indices that preserve the visual shape"""
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out <= 2:
+        return np.array([0, n - 1][:max(n_out, 0)], dtype=np.int64)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # First and last points are fixed; the rest is split into n_out - 2 buckets
+    edges = (np.arange(n_out - 1) * ((n - 2) / (n_out - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Pick the point forming the largest triangle with the previous pick
+        # and the average of the next bucket
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, n_out):
+    """Keep the lowest and highest point of each of n_out // 2 equal-count buckets"""
+    n = len(y)
+    n_buckets = n_out // 2
+    if n_out >= n:
+        return np.arange(n)
+    if n_buckets < 1:
+        return np.array([0, n - 1][:max(n_out, 0)], dtype=np.int64)
+
+    bucket = np.arange(n) * n_buckets // n
+    order = np.lexsort((np.asarray(y), bucket))
+    counts = np.bincount(bucket, minlength=n_buckets)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    return np.unique(np.concatenate([order[starts], order[ends - 1]]))
+
+
+def downsample(x, y, max_points, keep=None, method='lttb'):
+    """Return sorted indices of the points to plot
+
+    Kept points count against max_points; the output only exceeds it when
+    there are more kept points than that.
+    """
+    n = len(y)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+
+    budget = max_points
+    if keep is not None:
+        budget = max(max_points - int(np.count_nonzero(keep)), 2)
+
+    if method == 'minmax':
+        indices = minmax_indices(y, budget)
+    elif method == 'lttb':
+        indices = lttb_indices(x, y, budget)
+    else:
+        raise ValueError(f"Unknown downsampling method {method!r} (expected one of {', '.join(METHODS)})")
+
+    if keep is not None:
+        indices = np.union1d(indices, np.flatnonzero(keep))
+    return indices
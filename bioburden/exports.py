@@ -0,0 +1,141 @@
+"""
+Filtered exports of bioburden tests to CSV and XLSX.
+
+Records come from extracts.iter_records(), a server-side iterator in
+(test_date, id) order, and get the alert/action level in force joined on
+one chunk at a time through a ThresholdIndex, so an export of any size only
+holds one chunk in memory. XLSX goes through openpyxl's write-only workbook
+into a temporary file that is then streamed back.
+
+DataExport records run the same export in a background thread and keep the
+finished file for download. The thread dies with its worker process, so
+exports unfinished after settings.BIOBURDEN_EXPORT_TIMEOUT are marked failed
+when their status is looked at (DataExport.fail_stale()).
+"""
+import math
+import tempfile
+import threading
+from datetime import datetime
+from itertools import islice
+
+from django.core.files import File
+from django.db import connection
+from django.utils import timezone
+
+from .extracts import EXTRACT_COLUMNS, STREAM_CHUNK_SIZE, csv_stream, iter_records
+from .lazy import lazy_module
+from .thresholds import ThresholdIndex
+
+openpyxl = lazy_module('openpyxl')
+
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+EXPORT_COLUMNS = [name for name, _ in EXTRACT_COLUMNS if name != 'updated_at'] + [
+    'alert_level', 'action_level', 'updated_at',
+]
+
+
+def export_records(queryset, chunk_size=STREAM_CHUNK_SIZE, index=None):
+    """Yield extract records with the alert/action level in force on the test date"""
+    if index is None:
+        index = ThresholdIndex.load()
+    records = iter_records(queryset, chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        alert, action = index.lookup(
+            [record['lot_id'] for record in chunk],
+            [record['area_id'] for record in chunk],
+            [record['test_date'].toordinal() for record in chunk],
+        )
+        for record, alert_level, action_level in zip(chunk, alert.tolist(), action.tolist()):
+            record['alert_level'] = None if math.isnan(alert_level) else alert_level
+            record['action_level'] = None if math.isnan(action_level) else action_level
+            yield record
+
+
+def _xlsx_cell(value):
+    if isinstance(value, datetime):
+        # Excel has no time zones
+        return timezone.localtime(value).replace(tzinfo=None) if timezone.is_aware(value) else value
+    if isinstance(value, list):
+        return ';'.join(f'{v:g}' for v in value)
+    return value
+
+
+def write_xlsx(records, target):
+    """Write records to target (path or binary file) as one sheet; returns the row count"""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Bioburden Tests')
+    sheet.append(EXPORT_COLUMNS)
+    rows = 0
+    for record in records:
+        sheet.append([_xlsx_cell(record[name]) for name in EXPORT_COLUMNS])
+        rows += 1
+    workbook.save(target)
+    return rows
+
+
+def write_csv(records, target):
+    """Write records to a text file as CSV; returns the row count"""
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for record in records:
+            rows += 1
+            yield record
+
+    for chunk in csv_stream(counted(), EXPORT_COLUMNS):
+        target.write(chunk)
+    return rows
+
+
+def xlsx_file(records):
+    """Temporary binary file holding the XLSX export, rewound for reading"""
+    target = tempfile.TemporaryFile()
+    write_xlsx(records, target)
+    target.seek(0)
+    return target
+
+
+def run_export(export, queryset):
+    """Write the export file for a DataExport and record the outcome"""
+    export.status = 'processing'
+    export.save(update_fields=['status'])
+    try:
+        records = export_records(queryset)
+        if export.format == 'xlsx':
+            with tempfile.TemporaryFile() as target:
+                export.rows_exported = write_xlsx(records, target)
+                export.file.save(export.default_file_name(), File(target), save=False)
+        else:
+            with tempfile.TemporaryFile('w+', newline='', encoding='utf-8') as target:
+                export.rows_exported = write_csv(records, target)
+                target.seek(0)
+                export.file.save(export.default_file_name(), File(target), save=False)
+        export.status = 'completed'
+    except Exception as e:
+        export.status = 'failed'
+        export.error_message = str(e)
+    export.completed_at = timezone.now()
+    export.save()
+
+
+def start_export(export, queryset):
+    """Run an export in a daemon thread of this worker (lost if the worker exits)"""
+    def target():
+        try:
+            run_export(export, queryset)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=target, name=f'bioburden-export-{export.pk}', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,181 @@
+"""
+Keyset-paginated and streamed extracts of bioburden tests.
+
+Extracts walk the table in (test_date, id) order. A cursor is that pair for
+the last row returned, so fetching the next page is an index seek instead
+of an OFFSET scan. Streams read through QuerySet.iterator(chunk_size=...) and
+serialize row by row, so memory use does not grow with the extract size.
+"""
+import base64
+import csv
+import json
+from datetime import date
+
+import numpy as np
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .models import BioburdenData
+
+
+# (output name, ORM path)
+EXTRACT_COLUMNS = [
+    ('id', 'id'),
+    ('test_date', 'test_date'),
+    ('lot', 'lot__lot_number'),
+    ('lot_id', 'lot_id'),
+    ('area', 'area__name'),
+    ('area_id', 'area_id'),
+    ('sample_id', 'sample_id'),
+    ('organism_type', 'organism_type'),
+    ('validation', 'validation'),
+    ('cfu_count', 'cfu_count'),
+    ('dilution_factor', 'dilution_factor'),
+    ('adjusted_cfu', 'adjusted_cfu'),
+    ('value', 'value'),
+    ('status', 'status'),
+    ('sample_count', 'sample_count'),
+    ('samples', 'samples'),
+    ('updated_at', 'updated_at'),
+]
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+STREAM_CHUNK_SIZE = 2000
+
+# Serialized rows are sent in batches of this many lines
+_LINES_PER_CHUNK = 500
+
+
+def encode_cursor(test_date, pk):
+    """Opaque cursor for the position after (test_date, pk)"""
+    raw = f'{test_date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (test_date, pk) for a cursor; raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        test_date, pk = raw.split('|')
+        return date.fromisoformat(test_date), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+
+
+def keyset_order(queryset, descending=False):
+    if descending:
+        return queryset.order_by('-test_date', '-id')
+    return queryset.order_by('test_date', 'id')
+
+
+def after_cursor(queryset, position, descending=False):
+    """Rows strictly after position ((test_date, pk) or None) in keyset order"""
+    if position is None:
+        return queryset
+    test_date, pk = position
+    if descending:
+        return queryset.filter(Q(test_date__lt=test_date) | Q(test_date=test_date, id__lt=pk))
+    return queryset.filter(Q(test_date__gt=test_date) | Q(test_date=test_date, id__gt=pk))
+
+
+def seek_page(queryset, page_size, after=None, before=None, descending=False):
+    """One page of rows in keyset order, starting after `after` or ending before `before`
+
+    Returns (rows, next cursor, previous cursor); a cursor is None when
+    there is nothing further in that direction. Works on model instances
+    and on values() dicts.
+    """
+    if before is not None:
+        # Walk backwards from `before`, then restore the page order
+        rows = list(after_cursor(keyset_order(queryset, not descending), before, not descending)[:page_size + 1])
+        has_prev = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_next = True
+    else:
+        rows = list(after_cursor(keyset_order(queryset, descending), after, descending)[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_prev = after is not None
+    if not rows:
+        return rows, None, None
+    return (
+        rows,
+        encode_cursor(*_position(rows[-1])) if has_next else None,
+        encode_cursor(*_position(rows[0])) if has_prev else None,
+    )
+
+
+def _position(row):
+    if isinstance(row, dict):
+        return row['test_date'], row['id']
+    return row.test_date, row.pk
+
+
+def _record(row):
+    record = dict(zip((name for name, _ in EXTRACT_COLUMNS), row))
+    samples = record['samples']
+    record['samples'] = (
+        np.frombuffer(samples, dtype=BioburdenData.SAMPLE_DTYPE).tolist() if samples else []
+    )
+    return record
+
+
+def _values(queryset):
+    return queryset.values_list(*(path for _, path in EXTRACT_COLUMNS))
+
+
+def keyset_page(queryset, position=None, page_size=DEFAULT_PAGE_SIZE):
+    """Return (records, next cursor or None) for one page in (test_date, id) order"""
+    rows = list(_values(after_cursor(keyset_order(queryset), position))[:page_size + 1])
+    records = [_record(row) for row in rows[:page_size]]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = records[-1]
+        next_cursor = encode_cursor(last['test_date'], last['id'])
+    return records, next_cursor
+
+
+def iter_records(queryset, position=None, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield every record after position in keyset order, chunk_size rows per fetch"""
+    rows = _values(after_cursor(keyset_order(queryset), position)).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield _record(row)
+
+
+def _batched(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= _LINES_PER_CHUNK:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def ndjson_stream(records):
+    """One JSON object per line"""
+    return _batched(json.dumps(record, cls=DjangoJSONEncoder) + '\n' for record in records)
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(records, columns=None):
+    """Header line, then one CSV line per record (samples joined with ';')"""
+    if columns is None:
+        columns = [name for name, _ in EXTRACT_COLUMNS]
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(columns)
+        for record in records:
+            record['samples'] = ';'.join(f'{value:g}' for value in record['samples'])
+            yield writer.writerow(['' if record[name] is None else record[name] for name in columns])
+
+    return _batched(lines())
@@ -1,7 +1,60 @@
+import math
+from decimal import Decimal
+
 from django import forms
+from django.urls import reverse
+from .lookups import cached_choices
 from .models import BioburdenData, FixedThreshold, Area, Lot, DataImport
 
 
+# Largest value the CFU columns (DecimalField(max_digits=10, decimal_places=2)) hold
+MAX_CFU = Decimal('99999999.99')
+
+
+class LookupSelect(forms.Select):
+    """Select for a lot or area ModelChoiceField
+    
+    Renders every option from the cached choice list while the table is
+    small; beyond that only the selected option is rendered and the browser
+    fills in the rest from the lookup's autocomplete endpoint (see the
+    data-autocomplete-url script in base.html).
+    """
+    
+    def __init__(self, lookup, attrs=None):
+        super().__init__(attrs)
+        self.lookup = lookup
+    
+    def get_context(self, name, value, attrs):
+        self.cached = cached_choices(self.lookup)
+        if self.cached is None:
+            attrs = {**(attrs or {}), 'data-autocomplete-url': reverse(f'bioburden:{self.lookup}_autocomplete')}
+        return super().get_context(name, value, attrs)
+    
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        selected = {str(v) for v in value if v not in (None, '')}
+        
+        choices = self.cached
+        if choices is None:
+            choices = []
+            if selected:
+                try:
+                    choices = [
+                        (obj.pk, field.label_from_instance(obj))
+                        for obj in self.choices.queryset.filter(pk__in=selected)
+                    ]
+                except (ValueError, TypeError):
+                    pass
+        if field.empty_label is not None:
+            choices = [('', field.empty_label)] + list(choices)
+        
+        groups = []
+        for index, (option_value, label) in enumerate(choices):
+            is_selected = str(option_value) in selected or (not selected and option_value == '')
+            groups.append((None, [self.create_option(name, option_value, label, is_selected, index, attrs=attrs)], index))
+        return groups
+
+
 class DataImportForm(forms.ModelForm):
     """Form for uploading Excel files"""
     class Meta:
@@ -23,13 +76,15 @@ class BioburdenDataForm(forms.ModelForm):
     """Form for manual bioburden data entry"""
     class Meta:
         model = BioburdenData
-        fields = ['lot', 'area', 'test_date', 'sample_id', 'cfu_count', 
-                  'dilution_factor', 'lab_name', 'analyst', 'notes']
+        fields = ['lot', 'area', 'test_date', 'sample_id', 'organism_type', 'validation',
+                  'cfu_count', 'dilution_factor', 'lab_name', 'analyst', 'notes']
         widgets = {
             'test_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
-            'lot': forms.Select(attrs={'class': 'form-control'}),
-            'area': forms.Select(attrs={'class': 'form-control'}),
+            'lot': LookupSelect('lot', attrs={'class': 'form-control'}),
+            'area': LookupSelect('area', attrs={'class': 'form-control'}),
             'sample_id': forms.TextInput(attrs={'class': 'form-control'}),
+            'organism_type': forms.Select(attrs={'class': 'form-control'}),
+            'validation': forms.NullBooleanSelect(attrs={'class': 'form-control'}),
             'cfu_count': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'dilution_factor': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'lab_name': forms.TextInput(attrs={'class': 'form-control'}),
@@ -42,10 +97,12 @@ class FixedThresholdForm(forms.ModelForm):
     """Form for setting fixed alert/action levels"""
     class Meta:
         model = FixedThreshold
-        fields = ['lot', 'area', 'alert_level', 'action_level', 'notes']
+        fields = ['lot', 'area', 'effective_from', 'effective_to', 'alert_level', 'action_level', 'notes']
         widgets = {
-            'lot': forms.Select(attrs={'class': 'form-control'}),
-            'area': forms.Select(attrs={'class': 'form-control'}),
+            'lot': LookupSelect('lot', attrs={'class': 'form-control'}),
+            'area': LookupSelect('area', attrs={'class': 'form-control'}),
+            'effective_from': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+            'effective_to': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'alert_level': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'action_level': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
@@ -57,12 +114,12 @@ class FilterForm(forms.Form):
     lot = forms.ModelChoiceField(
         queryset=Lot.objects.all(),
         required=False,
-        widget=forms.Select(attrs={'class': 'form-control'})
+        widget=LookupSelect('lot', attrs={'class': 'form-control'})
     )
     area = forms.ModelChoiceField(
         queryset=Area.objects.all(),
         required=False,
-        widget=forms.Select(attrs={'class': 'form-control'})
+        widget=LookupSelect('area', attrs={'class': 'form-control'})
     )
     date_from = forms.DateField(
         required=False,
@@ -77,3 +134,133 @@ class FilterForm(forms.Form):
         required=False,
         widget=forms.Select(attrs={'class': 'form-control'})
     )
+    organism_type = forms.ChoiceField(
+        label='Type',
+        choices=[('', 'All')] + BioburdenData.ORGANISM_TYPE_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+
+class ThresholdSimulationForm(forms.Form):
+    """Candidate alert/action levels for the threshold what-if simulator"""
+    lot = forms.ModelChoiceField(
+        queryset=Lot.objects.all(),
+        required=False,
+        empty_label='All lots',
+        widget=LookupSelect('lot', attrs={'class': 'form-control'})
+    )
+    area = forms.ModelChoiceField(
+        queryset=Area.objects.all(),
+        required=False,
+        empty_label='All areas',
+        widget=LookupSelect('area', attrs={'class': 'form-control'})
+    )
+    effective_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    effective_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    alert_level = forms.DecimalField(
+        min_value=0,
+        max_digits=10,
+        decimal_places=2,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
+    )
+    action_level = forms.DecimalField(
+        min_value=0,
+        max_digits=10,
+        decimal_places=2,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        alert_level = cleaned_data.get('alert_level')
+        action_level = cleaned_data.get('action_level')
+        if alert_level is not None and action_level is not None and action_level < alert_level:
+            raise forms.ValidationError("Action level must not be below the alert level.")
+        
+        effective_from = cleaned_data.get('effective_from')
+        effective_to = cleaned_data.get('effective_to')
+        if effective_from and effective_to and effective_to < effective_from:
+            raise forms.ValidationError("Effective to must not be before effective from.")
+        return cleaned_data
+    
+    def as_rule(self):
+        """Return the cleaned candidate as a simulate_thresholds() rule"""
+        data = self.cleaned_data
+        return {
+            'lot': data['lot'].pk if data.get('lot') else None,
+            'area': data['area'].pk if data.get('area') else None,
+            'effective_from': data.get('effective_from'),
+            'effective_to': data.get('effective_to'),
+            'alert_level': data['alert_level'],
+            'action_level': data['action_level'],
+        }
+
+
+class SampleValuesField(forms.Field):
+    """Per-sample CFU values as a JSON list or a ';'-separated string"""
+    
+    def to_python(self, value):
+        if value in (None, '', []):
+            return []
+        if isinstance(value, str):
+            value = [v for v in value.split(';') if v.strip()]
+        if not isinstance(value, (list, tuple)):
+            raise forms.ValidationError("Enter a list of sample values.")
+        try:
+            values = [float(v) for v in value]
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Sample values must be numbers.")
+        if not all(math.isfinite(v) for v in values):
+            raise forms.ValidationError("Sample values must be finite numbers.")
+        if any(v < 0 for v in values):
+            raise forms.ValidationError("Sample values must not be negative.")
+        if any(v > MAX_CFU for v in values):
+            raise forms.ValidationError(f"Sample values must not exceed {MAX_CFU}.")
+        return values
+
+
+class IngestRecordForm(forms.Form):
+    """One test result pushed through the bulk ingest API
+    
+    Lots and areas are given by lot number and area name. Either cfu_count
+    or samples is required; with samples only, cfu_count is their mean.
+    """
+    lot = forms.CharField(max_length=100)
+    area = forms.CharField(max_length=200)
+    test_date = forms.DateField()
+    sample_id = forms.CharField(max_length=100)
+    organism_type = forms.ChoiceField(
+        choices=[('', '')] + BioburdenData.ORGANISM_TYPE_CHOICES,
+        required=False
+    )
+    validation = forms.NullBooleanField(required=False)
+    cfu_count = forms.DecimalField(min_value=0, max_digits=10, decimal_places=2, required=False)
+    samples = SampleValuesField(required=False)
+    dilution_factor = forms.DecimalField(min_value=Decimal('0.01'), max_digits=10, decimal_places=2, required=False)
+    lab_name = forms.CharField(max_length=200, required=False)
+    analyst = forms.CharField(max_length=100, required=False)
+    notes = forms.CharField(required=False)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        cfu_count = cleaned_data.get('cfu_count')
+        samples = cleaned_data.get('samples')
+        if cfu_count is None and not samples:
+            if not self.has_error('cfu_count') and not self.has_error('samples'):
+                raise forms.ValidationError("Either cfu_count or samples is required.")
+            return cleaned_data
+        
+        # The adjusted CFU is stored in a column as narrow as cfu_count
+        if cfu_count is None:
+            cfu_count = Decimal(str(round(math.fsum(samples) / len(samples), 2)))
+        dilution_factor = cleaned_data.get('dilution_factor') or Decimal('1.00')
+        if cfu_count * dilution_factor > MAX_CFU:
+            raise forms.ValidationError(f"cfu_count × dilution_factor must not exceed {MAX_CFU}.")
+        return cleaned_data
@@ -0,0 +1,212 @@
+"""
+Batch ingest of test results pushed by a laboratory information system.
+
+A batch is validated record by record (IngestRecordForm), then written in
+a few bulk queries instead of one save() per record: lots and areas
+are resolved (and created) in bulk, adjusted CFU, value and trend buckets
+are computed in Python, status is classified for the whole batch through a
+ThresholdIndex, and tests are written with bulk_create()/bulk_update().
+
+Records are upserted on the natural key (lot, area, test_date,
+organism_type, sample_id), so sending a batch again is harmless: tests
+whose fields already match are reported as unchanged and not written. The
+key is a unique constraint, so when concurrent batches insert the same
+test, the loser's write fails and is retried against the winner's rows.
+"""
+import csv
+import io
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .forms import IngestRecordForm
+from .metrics import observe_import
+from .models import Area, BioburdenData, DataVersion, Lot
+from .thresholds import NO_THRESHOLD, STATUS_NAMES, ThresholdIndex
+
+
+MAX_INGEST_RECORDS = 5000
+
+# Fields an upsert writes (the key fields never change)
+UPDATE_FIELDS = [
+    'validation', 'cfu_count', 'samples', 'sample_count', 'sample_mean', 'sample_min',
+    'sample_max', 'dilution_factor', 'adjusted_cfu', 'value', 'lab_name', 'analyst',
+    'notes', 'status',
+]
+
+_BATCH_SIZE = 500
+
+# Tries of a batch write that loses a race on the natural key
+_WRITE_ATTEMPTS = 3
+
+
+def parse_csv_records(text):
+    """Records from a CSV body with IngestRecordForm field names as the header"""
+    return [
+        {name: value for name, value in row.items() if name is not None and value != ''}
+        for row in csv.DictReader(io.StringIO(text))
+    ]
+
+
+def _natural_key(lot_id, area_id, test_date, organism_type, sample_id):
+    return (lot_id, area_id, test_date, organism_type or '', sample_id)
+
+
+def _resolve(model, field, names):
+    """Map names to pks for Lot/Area, creating the missing ones in one insert"""
+    found = dict(model.objects.filter(**{f'{field}__in': names}).values_list(field, 'pk'))
+    missing = [name for name in names if name not in found]
+    if missing:
+        model.objects.bulk_create([model(**{field: name}) for name in missing], ignore_conflicts=True)
+        found.update(model.objects.filter(**{f'{field}__in': missing}).values_list(field, 'pk'))
+    return found
+
+
+def _build_test(data, lot_id, area_id):
+    """Unsaved test with the derived columns BioburdenData.save() would set"""
+    test_date = data['test_date']
+    test = BioburdenData(
+        lot_id=lot_id,
+        area_id=area_id,
+        test_date=test_date,
+        test_week=test_date - timedelta(days=test_date.weekday()),
+        test_month=test_date.replace(day=1),
+        sample_id=data['sample_id'],
+        organism_type=data.get('organism_type') or None,
+        validation=data.get('validation'),
+        dilution_factor=data.get('dilution_factor') or Decimal('1.00'),
+        lab_name=data.get('lab_name') or None,
+        analyst=data.get('analyst') or None,
+        notes=data.get('notes') or None,
+    )
+    if data.get('samples'):
+        test.set_samples(data['samples'])
+    cfu_count = data.get('cfu_count')
+    if cfu_count is None:
+        cfu_count = Decimal(str(round(test.sample_mean, 2)))
+    test.cfu_count = cfu_count
+    if not data.get('samples'):
+        test.set_samples([cfu_count])
+    if test.cfu_count and test.dilution_factor:
+        test.adjusted_cfu = test.cfu_count * test.dilution_factor
+    test.value = float(test.get_value)
+    return test
+
+
+def _unchanged(test, current):
+    return all(getattr(test, field) == current[field] for field in UPDATE_FIELDS)
+
+
+def _upsert(valid):
+    """Write validated (index, cleaned_data) records; returns (results by index, counts)"""
+    results = {}
+    counts = dict.fromkeys(['created', 'updated', 'unchanged', 'duplicate'], 0)
+    with transaction.atomic(), DataVersion.deferred():
+        lots = _resolve(Lot, 'lot_number', sorted({data['lot'] for _, data in valid}))
+        areas = _resolve(Area, 'name', sorted({data['area'] for _, data in valid}))
+
+        # Last record wins when a key repeats within the batch
+        batch = {}
+        for i, data in valid:
+            test = _build_test(data, lots[data['lot']], areas[data['area']])
+            key = _natural_key(test.lot_id, test.area_id, test.test_date, test.organism_type, test.sample_id)
+            if key in batch:
+                earlier = batch[key][0]
+                results[earlier] = {'index': earlier, 'status': 'duplicate', 'superseded_by': i}
+                counts['duplicate'] += 1
+            batch[key] = (i, test)
+
+        tests = [test for _, test in batch.values()]
+        existing = {}
+        candidates = BioburdenData.objects.filter(
+            lot_id__in={test.lot_id for test in tests},
+            test_date__range=(min(test.test_date for test in tests), max(test.test_date for test in tests)),
+            sample_id__in={test.sample_id for test in tests},
+        ).values('id', 'lot_id', 'area_id', 'test_date', 'organism_type', 'sample_id', *UPDATE_FIELDS)
+        for row in candidates:
+            key = _natural_key(row['lot_id'], row['area_id'], row['test_date'], row['organism_type'], row['sample_id'])
+            existing[key] = row
+
+        # Classify the whole batch at once; with no threshold in force a
+        # new test is normal and an existing one keeps its status
+        index = ThresholdIndex.load()
+        codes = index.classify(
+            [test.lot_id for test in tests],
+            [test.area_id for test in tests],
+            [test.test_date.toordinal() for test in tests],
+            [test.value for test in tests],
+        )
+
+        now = timezone.now()
+        to_create, to_update = [], []
+        for (key, (i, test)), code in zip(batch.items(), codes.tolist()):
+            current = existing.get(key)
+            if code != NO_THRESHOLD:
+                test.status = STATUS_NAMES[code]
+            elif current is not None:
+                test.status = current['status']
+            if current is None:
+                to_create.append((i, test))
+                continue
+            test.pk = current['id']
+            if _unchanged(test, current):
+                results[i] = {'index': i, 'status': 'unchanged', 'id': test.pk}
+                counts['unchanged'] += 1
+            else:
+                test.updated_at = now
+                to_update.append(test)
+                results[i] = {'index': i, 'status': 'updated', 'id': test.pk}
+                counts['updated'] += 1
+
+        BioburdenData.objects.bulk_create([test for _, test in to_create], batch_size=_BATCH_SIZE)
+        for i, test in to_create:
+            results[i] = {'index': i, 'status': 'created', 'id': test.pk}
+        counts['created'] = len(to_create)
+        BioburdenData.objects.bulk_update(to_update, UPDATE_FIELDS + ['updated_at'], batch_size=_BATCH_SIZE)
+
+        # bulk_create() bypasses the model signals
+        if to_create or to_update:
+            DataVersion.bump()
+    return results, counts
+
+
+def ingest_records(records):
+    """Validate and upsert a batch of records; returns counts and per-record results
+
+    Each result has the record's index in the batch and a status of
+    created, updated, unchanged, duplicate (a later record in the same batch
+    has the same key and wins) or error (with the validation errors).
+    Valid records are written even when others in the batch fail.
+    """
+    started = time.perf_counter()
+    results = [None] * len(records)
+    valid = []
+    for i, record in enumerate(records):
+        form = IngestRecordForm(record if isinstance(record, dict) else {})
+        if form.is_valid():
+            valid.append((i, form.cleaned_data))
+        else:
+            results[i] = {'index': i, 'status': 'error', 'errors': form.errors.get_json_data()}
+
+    counts = dict.fromkeys(['created', 'updated', 'unchanged', 'duplicate', 'error'], 0)
+    counts['error'] = len(records) - len(valid)
+
+    if valid:
+        # Another batch may insert one of our keys between our read and our
+        # write; the retry then finds that test and updates it instead
+        for attempt in range(_WRITE_ATTEMPTS):
+            try:
+                written, write_counts = _upsert(valid)
+                break
+            except IntegrityError:
+                if attempt == _WRITE_ATTEMPTS - 1:
+                    raise
+        for i, result in written.items():
+            results[i] = result
+        counts.update(write_counts)
+
+    observe_import('api', time.perf_counter() - started, counts['created'] + counts['updated'], not counts['error'])
+    return {**counts, 'results': results}
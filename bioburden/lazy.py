@@ -0,0 +1,78 @@
+"""
+Deferred imports of the heavy analytics and import stacks.
+
+pandas, openpyxl and scipy take several hundred milliseconds and tens of
+megabytes to import, but only the Excel import, XLSX export and organism
+co-occurrence code uses them. Modules bind them through lazy_module(), which
+returns a facade that imports the real module on first attribute access, so
+a worker serving the dashboard never loads them.
+
+warm_imports() loads them ahead of time instead. Call it from a post-fork
+hook (see gunicorn.conf.py) so each worker warms up in a background thread
+right after it starts, instead of on its first import or export request.
+The modules come from settings.BIOBURDEN_WARM_IMPORTS.
+"""
+import importlib
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+
+HEAVY_MODULES = ('pandas', 'openpyxl', 'scipy.sparse')
+
+
+class LazyModule:
+    """Module facade that imports name on first attribute access"""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_module(name):
+    """The module if it is already imported, otherwise a LazyModule facade"""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def warm_imports(modules=None, background=False):
+    """Import modules (default settings.BIOBURDEN_WARM_IMPORTS) now
+
+    Returns [(module, seconds)], or the started thread when background is
+    true. Modules that fail to import are skipped; the facades will raise
+    the error when the code that needs them runs.
+    """
+    if modules is None:
+        modules = getattr(settings, 'BIOBURDEN_WARM_IMPORTS', ())
+
+    def run():
+        timings = []
+        for name in modules:
+            started = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                continue
+            timings.append((name, time.perf_counter() - started))
+        return timings
+
+    if not background:
+        return run()
+    thread = threading.Thread(target=run, name='bioburden-warm-imports', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,433 @@
+"""
+Mixed read/write load against a running server.
+
+Simulated users (threads, each with its own cookie jar) request the
+dashboard, data list, analysis pages and chart API with exponentially
+distributed think times, while up to two writers run alongside them: an
+editor that changes the CFU count of a test through its edit form, and an
+importer that uploads an Excel workbook through the import page (which
+replaces all data, like any Excel import). Only the standard library and
+the project's own dependencies are used, so it runs against the dev server
+or any WSGI/ASGI server on localhost.
+
+Every request is timed per page. 5xx answers and network failures count
+as errors; errors whose body mentions "database is locked" (visible when
+the server runs with DEBUG) are counted separately as lock-wait errors.
+After each write the writer polls the cached chart API until the change is
+visible, which gives the time to consistency.
+"""
+import html.parser
+import http.cookiejar
+import io
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.urls import reverse
+
+
+# (name, url name, query string, weight)
+READ_PAGES = [
+    ('dashboard', 'bioburden:dashboard', '', 4),
+    ('data_list', 'bioburden:data_list', '', 3),
+    ('area_comparison', 'bioburden:area_comparison', '', 1),
+    ('outlier_analysis', 'bioburden:outlier_analysis', '', 1),
+    ('organism_frequency', 'bioburden:organism_frequency', '', 1),
+    ('cfu_per_area_analysis', 'bioburden:cfu_per_area_analysis', '', 1),
+    ('statistical_summary', 'bioburden:statistical_summary', '', 1),
+    ('chart_data_api', 'bioburden:chart_data_api', '', 3),
+    ('aggregate_api', 'bioburden:aggregate_api', 'bucket=week', 1),
+]
+
+LOCK_MARKER = b'database is locked'
+POLL_INTERVAL = 0.05
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Response:
+    def __init__(self, status, body, seconds, error=None):
+        self.status = status
+        self.body = body
+        self.seconds = seconds
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None and 200 <= self.status < 400
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class Session:
+    """One simulated browser: cookies kept, redirects returned rather than followed"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def request(self, path, data=None, content_type=None):
+        url = self.base_url + path
+        headers = {'Referer': url}
+        if content_type:
+            headers['Content-Type'] = content_type
+        started = time.perf_counter()
+        try:
+            with self.opener.open(urllib.request.Request(url, data=data, headers=headers), timeout=self.timeout) as r:
+                body = r.read()
+                return Response(r.status, body, time.perf_counter() - started)
+        except urllib.error.HTTPError as e:
+            return Response(e.code, e.read(), time.perf_counter() - started)
+        except (urllib.error.URLError, OSError) as e:
+            return Response(0, b'', time.perf_counter() - started, error=str(getattr(e, 'reason', e)))
+
+    def get(self, path):
+        return self.request(path)
+
+    def post_form(self, path, fields, files=None):
+        if not files:
+            return self.request(path, urllib.parse.urlencode(fields).encode(), 'application/x-www-form-urlencoded')
+        boundary = uuid.uuid4().hex
+        body = io.BytesIO()
+        for name, value in fields.items():
+            body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        for name, (filename, content) in files.items():
+            body.write(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                'Content-Type: application/octet-stream\r\n\r\n'.encode()
+            )
+            body.write(content)
+            body.write(b'\r\n')
+        body.write(f'--{boundary}--\r\n'.encode())
+        return self.request(path, body.getvalue(), f'multipart/form-data; boundary={boundary}')
+
+
+class _FormParser(html.parser.HTMLParser):
+    """Current values of the inputs, selects and textareas of an HTML page"""
+
+    def __init__(self):
+        super().__init__()
+        self.fields = {}
+        self._select = None
+        self._textarea = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        name = attrs.get('name')
+        if tag == 'input' and name:
+            if attrs.get('type') in ('checkbox', 'radio') and 'checked' not in attrs:
+                return
+            if attrs.get('type') not in ('submit', 'button', 'file'):
+                self.fields[name] = attrs.get('value') or ''
+        elif tag == 'select' and name:
+            self._select = name
+            self.fields.setdefault(name, '')
+        elif tag == 'option' and self._select and 'selected' in attrs:
+            self.fields[self._select] = attrs.get('value') or ''
+        elif tag == 'textarea' and name:
+            self._textarea = name
+            self.fields[name] = ''
+
+    def handle_endtag(self, tag):
+        if tag == 'select':
+            self._select = None
+        elif tag == 'textarea':
+            self._textarea = None
+
+    def handle_data(self, data):
+        if self._textarea:
+            self.fields[self._textarea] += data
+
+
+def form_fields(body):
+    parser = _FormParser()
+    parser.feed(body.decode('utf-8', 'replace'))
+    return parser.fields
+
+
+class Recorder:
+    """Thread-safe latency and error tallies per page, plus consistency delays"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_errors = defaultdict(int)
+        self.consistency = defaultdict(list)
+        self.consistency_timeouts = defaultdict(int)
+        self.write_failures = defaultdict(int)
+
+    def record(self, name, response):
+        with self._lock:
+            self.latencies[name].append(response.seconds)
+            if response.error is not None or response.status >= 500:
+                self.errors[name] += 1
+                if LOCK_MARKER in response.body:
+                    self.lock_errors[name] += 1
+        return response
+
+    def write_failed(self, name):
+        with self._lock:
+            self.write_failures[name] += 1
+
+    def consistent(self, name, seconds):
+        with self._lock:
+            if seconds is None:
+                self.consistency_timeouts[name] += 1
+            else:
+                self.consistency[name].append(seconds)
+
+
+def _percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(len(ordered) * q / 100) - 1)]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def _summary(values):
+    ordered = sorted(values)
+    return {
+        'p50_ms': _ms(_percentile(ordered, 50)),
+        'p95_ms': _ms(_percentile(ordered, 95)),
+        'p99_ms': _ms(_percentile(ordered, 99)),
+        'max_ms': _ms(ordered[-1] if ordered else None),
+    }
+
+
+def _lot_count(rows):
+    return max(1, rows // 10)
+
+
+def raw_data_workbook(lot_prefix, rows, rng):
+    """xlsx bytes in the RAW DATA layout the importer reads; lots are lot_prefix-NNNN"""
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('RAW DATA')
+    samples = [f'CFU {kind} S{i}' for kind in ('AEROBES', 'FUNGI') for i in (1, 2, 3)]
+    sheet.append(['LOT VECTOR', 'AREA TESTED', 'DATE', 'CORRECTION FACTOR', 'VALIDATION', 'PROVIDER', *samples])
+    areas = ['Clean Room A', 'Clean Room B', 'Filling Line 1', 'Packaging Area']
+    today = date.today()
+    for i in range(rows):
+        sheet.append([
+            f'{lot_prefix}-{i % _lot_count(rows):04d}',
+            rng.choice(areas),
+            today - timedelta(days=rng.randrange(365)),
+            rng.choice([1.0, 1.0, 10.0]),
+            'NO',
+            'Load Test Lab',
+            *[round(rng.lognormvariate(2.5, 0.7)) for _ in samples],
+        ])
+    target = io.BytesIO()
+    workbook.save(target)
+    return target.getvalue()
+
+
+class LoadTest:
+    """Readers and writers against base_url for duration seconds"""
+
+    def __init__(self, base_url, users=20, duration=60.0, think_time=1.0, timeout=60.0, edit_interval=None,
+                 import_interval=None, import_rows=200, import_file=None, consistency_timeout=30.0, seed=None):
+        self.base_url = base_url
+        self.users = users
+        self.duration = duration
+        self.think_time = think_time
+        self.timeout = timeout
+        self.edit_interval = edit_interval
+        self.import_interval = import_interval
+        self.import_rows = import_rows
+        self.import_file = import_file
+        self.consistency_timeout = consistency_timeout
+        self.rng = random.Random(seed)
+        self.recorder = Recorder()
+        self.pages = [(name, reverse(url_name) + (f'?{query}' if query else ''), weight)
+                      for name, url_name, query, weight in READ_PAGES]
+        self._stop = threading.Event()
+
+    def _sleep(self, seconds):
+        return self._stop.wait(seconds)
+
+    def _think(self, rng):
+        return self._sleep(rng.expovariate(1 / self.think_time) if self.think_time > 0 else 0)
+
+    def _reader(self, seed):
+        rng = random.Random(seed)
+        session = Session(self.base_url, self.timeout)
+        names = [(name, path) for name, path, _ in self.pages]
+        weights = [weight for _, _, weight in self.pages]
+        while not self._stop.is_set():
+            name, path = rng.choices(names, weights)[0]
+            self.recorder.record(name, session.get(path))
+            self._think(rng)
+
+    def _wait_until(self, name, started, check):
+        """Poll check() until it is true; records the delay since started"""
+        deadline = started + self.consistency_timeout
+        while time.perf_counter() < deadline and not self._stop.is_set():
+            if check():
+                self.recorder.consistent(name, time.perf_counter() - started)
+                return
+            time.sleep(POLL_INTERVAL)
+        self.recorder.consistent(name, None)
+
+    def _chart_values(self, session, lot_id):
+        response = session.get(f"{reverse('bioburden:chart_data_api')}?lot={lot_id}")
+        if not response.ok:
+            return None
+        return [point['value'] for point in response.json()['data']]
+
+    def _editor(self, seed):
+        rng = random.Random(seed)
+        session = Session(self.base_url, self.timeout)
+        tests = []
+        while not self._sleep(self.edit_interval):
+            if not tests:
+                response = self.recorder.record('tests_api', session.get(f"{reverse('bioburden:tests_api')}?page_size=200"))
+                tests = response.json()['results'] if response.ok else []
+                if not tests:
+                    continue
+            test = rng.choice(tests)
+            path = reverse('bioburden:data_update', args=[test['id']])
+            response = self.recorder.record('edit_form', session.get(path))
+            if response.status == 404:
+                tests = []  # replaced by an import
+                continue
+            if not response.ok:
+                continue
+
+            fields = form_fields(response.body)
+            cfu = round(rng.uniform(1000, 9000), 2)
+            fields['cfu_count'] = f'{cfu:.2f}'
+            response = self.recorder.record('edit_submit', session.post_form(path, fields))
+            if response.status == 404:
+                tests = []  # deleted by an import since the form was loaded
+                continue
+            if response.status != 302:
+                self.recorder.write_failed('edit')
+                continue
+
+            expected = cfu * float(fields.get('dilution_factor') or 1)
+            self._wait_until('edit', time.perf_counter(), lambda: any(
+                abs(value - expected) < 0.01 for value in self._chart_values(session, test['lot_id']) or []
+            ))
+
+    def _importer(self, seed):
+        rng = random.Random(seed)
+        session = Session(self.base_url, self.timeout)
+        path = reverse('bioburden:import_data')
+        count = 0
+        while not self._sleep(self.import_interval):
+            count += 1
+            lot_prefix = f'LOADTEST-{seed % 10000:04d}-{count:03d}'
+            if self.import_file:
+                with open(self.import_file, 'rb') as f:
+                    content = f.read()
+            else:
+                content = raw_data_workbook(lot_prefix, self.import_rows, rng)
+
+            response = self.recorder.record('import_form', session.get(path))
+            if not response.ok:
+                continue
+            fields = form_fields(response.body)
+            fields['imported_by'] = 'load test'
+            response = self.recorder.record(
+                'import_submit', session.post_form(path, fields, {'uploaded_file': (f'{lot_prefix}.xlsx', content)})
+            )
+            if response.status != 302:
+                self.recorder.write_failed('import')
+                continue
+            if self.import_file:
+                continue
+
+            # Rows cycle through the lots; each row is one test per organism type
+            marker = f'{lot_prefix}-0000'
+            expected = 2 * len(range(0, self.import_rows, _lot_count(self.import_rows)))
+
+            def visible():
+                found = session.get(f"{reverse('bioburden:lot_autocomplete')}?q={marker}")
+                results = found.json()['results'] if found.ok else []
+                lot = next((result for result in results if result['text'] == marker), None)
+                return lot is not None and len(self._chart_values(session, lot['id']) or []) == expected
+
+            self._wait_until('import', time.perf_counter(), visible)
+
+    def run(self):
+        """Run the load; returns the report dict"""
+        threads = [
+            threading.Thread(target=self._reader, args=(self.rng.randrange(2 ** 32),), daemon=True)
+            for _ in range(self.users)
+        ]
+        if self.edit_interval:
+            threads.append(threading.Thread(target=self._editor, args=(self.rng.randrange(2 ** 32),), daemon=True))
+        if self.import_interval:
+            threads.append(threading.Thread(target=self._importer, args=(self.rng.randrange(2 ** 32),), daemon=True))
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        self._stop.wait(self.duration)
+        self._stop.set()
+        for thread in threads:
+            thread.join(self.timeout)
+        return self.report(time.perf_counter() - started)
+
+    def report(self, elapsed):
+        recorder = self.recorder
+        pages = {}
+        for name in sorted(recorder.latencies):
+            latencies = recorder.latencies[name]
+            pages[name] = {
+                'requests': len(latencies),
+                'throughput_rps': round(len(latencies) / elapsed, 2),
+                'errors': recorder.errors[name],
+                'lock_errors': recorder.lock_errors[name],
+                **_summary(latencies),
+            }
+        consistency = {}
+        for name in sorted(set(recorder.consistency) | set(recorder.consistency_timeouts)):
+            consistency[name] = {
+                'writes': len(recorder.consistency[name]) + recorder.consistency_timeouts[name],
+                'timeouts': recorder.consistency_timeouts[name],
+                **_summary(recorder.consistency[name]),
+            }
+        everything = [seconds for latencies in recorder.latencies.values() for seconds in latencies]
+        return {
+            'config': {
+                'base_url': self.base_url,
+                'users': self.users,
+                'duration_s': self.duration,
+                'think_time_s': self.think_time,
+                'edit_interval_s': self.edit_interval,
+                'import_interval_s': self.import_interval,
+                'import_rows': None if self.import_file else self.import_rows,
+            },
+            'elapsed_s': round(elapsed, 1),
+            'total': {
+                'requests': len(everything),
+                'throughput_rps': round(len(everything) / elapsed, 2),
+                'errors': sum(recorder.errors.values()),
+                'lock_errors': sum(recorder.lock_errors.values()),
+                'write_failures': dict(recorder.write_failures),
+                **_summary(everything),
+            },
+            'pages': pages,
+            'consistency': consistency,
+        }
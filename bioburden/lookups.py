@@ -0,0 +1,65 @@
+"""
+Lot and area lookups for select widgets.
+
+Prefix searches are written as a range on the unique lot_number / name
+column (value >= prefix AND value < prefix with its last character
+incremented) rather than LIKE, so they are index range scans on every
+database. Lot numbers and area names are mostly upper case, so a lower case
+prefix is also tried upper-cased.
+
+Small tables are rendered as ordinary <select> options from a list cached
+per data version; larger ones switch to the autocomplete endpoints.
+"""
+from django.db.models import Q
+
+from .cache import cached_result
+from .models import Area, Lot
+
+
+# name -> (model, label field)
+LOOKUPS = {
+    'lot': (Lot, 'lot_number'),
+    'area': (Area, 'name'),
+}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Tables with more rows than this use autocomplete instead of full option lists
+AUTOCOMPLETE_MIN_CHOICES = 200
+
+
+def _prefix_range(field, prefix):
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': upper})
+
+
+def search(name, term, limit=DEFAULT_LIMIT):
+    """Return ([{'id', 'text'}, ...], more) for labels starting with term"""
+    model, field = LOOKUPS[name]
+    queryset = model.objects.order_by(field)
+    term = term.strip()
+    if term:
+        condition = Q()
+        for prefix in dict.fromkeys([term, term.upper()]):
+            condition |= _prefix_range(field, prefix)
+        queryset = queryset.filter(condition)
+
+    rows = list(queryset.values_list('pk', field)[:limit + 1])
+    return [{'id': pk, 'text': label} for pk, label in rows[:limit]], len(rows) > limit
+
+
+def cached_choices(name):
+    """All (pk, label) pairs of a small table, or None when it is too large
+
+    Cached per data version, so rendering a form does not query the table.
+    """
+    model, field = LOOKUPS[name]
+
+    def compute():
+        rows = list(model.objects.order_by(field).values_list('pk', field)[:AUTOCOMPLETE_MIN_CHOICES + 1])
+        if len(rows) > AUTOCOMPLETE_MIN_CHOICES:
+            return None
+        return rows
+
+    return cached_result(f'{name}_choices', {}, compute)
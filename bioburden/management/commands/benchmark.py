@@ -0,0 +1,125 @@
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from bioburden.benchmark import SIZES, compare, run_benchmark
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every page and API at scaled synthetic data sizes (in a throwaway test database) '
+        'and write p50/p95 latency, query counts and peak memory as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default=','.join(str(size) for size in SIZES),
+            help='Comma-separated numbers of tests to generate (default: %(default)s)',
+        )
+        parser.add_argument('--repeat', type=int, default=10, help='Warm requests per page (default: 10)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the data generator')
+        parser.add_argument('--views', default='', help='Comma-separated page names to run (default: all)')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='Baseline JSON file from an earlier run to compare against')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Relative slowdown over the baseline reported as a regression (default: 0.2)',
+        )
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--sizes must be comma-separated integers')
+        if not sizes or min(sizes) < 1 or options['repeat'] < 1:
+            raise CommandError('--sizes and --repeat must be positive')
+        views = {name.strip() for name in options['views'].split(',') if name.strip()}
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)['results']
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        started = time.perf_counter()
+        try:
+            with tempfile.TemporaryDirectory() as scratch, override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                DEBUG=False,
+                CACHES={
+                    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                    'results': {
+                        'BACKEND': 'bioburden.cache.SQLiteLRUCache',
+                        'LOCATION': os.path.join(scratch, 'result_cache.sqlite3'),
+                        'TIMEOUT': None,
+                        'OPTIONS': {'MAX_ENTRIES': 1000},
+                    },
+                },
+                BIOBURDEN_RESULT_CACHE='results',
+                BIOBURDEN_SNAPSHOT_SHARED=False,
+                BIOBURDEN_METRICS=False,
+                BIOBURDEN_QUERY_PROFILING=False,
+            ):
+                datasets, results = run_benchmark(
+                    sizes, repeat=options['repeat'], seed=options['seed'], views=views, progress=self.stdout.write,
+                )
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = {
+            'meta': {
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'duration_s': round(time.perf_counter() - started, 1),
+                'revision': _git_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'machine': platform.machine(),
+                'cpus': os.cpu_count(),
+                'repeat': options['repeat'],
+                'seed': options['seed'],
+            },
+            'datasets': datasets,
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['tolerance'])
+            for row in regressions:
+                self.stdout.write(self.style.WARNING(
+                    f"  {row['size']:>8} {row['view']:<26} {row['metric']:<8} "
+                    f"{row['baseline']:9.1f} -> {row['current']:9.1f} ms ({row['change']:+.0%})"
+                ))
+            if regressions:
+                self.stdout.write(self.style.ERROR(f'{len(regressions)} regression(s) over the baseline'))
+            else:
+                self.stdout.write(self.style.SUCCESS('No regressions over the baseline'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Benchmarked {len(results)} page/size combinations in {report["meta"]["duration_s"]}s'
+        ))
@@ -0,0 +1,90 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bioburden.loadtest import LoadTest
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive concurrent users against a running server while edits and imports run, and report '
+        'throughput, tail latency, lock-wait errors and time to consistency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to load (default: %(default)s)')
+        parser.add_argument('--users', type=int, default=20, help='Concurrent reading users (default: 20)')
+        parser.add_argument('--duration', type=float, default=60, help='Seconds to run (default: 60)')
+        parser.add_argument(
+            '--think-time', type=float, default=1.0,
+            help='Mean seconds between one user\'s requests; 0 sends them back to back (default: 1.0)',
+        )
+        parser.add_argument('--timeout', type=float, default=60, help='Per-request timeout in seconds (default: 60)')
+        parser.add_argument(
+            '--allow-writes', action='store_true',
+            help='Run the editor and importer. Imports REPLACE ALL DATA on the server; never use against real data',
+        )
+        parser.add_argument('--edit-interval', type=float, default=2, help='Seconds between edits (0 disables)')
+        parser.add_argument('--import-interval', type=float, default=30, help='Seconds between imports (0 disables)')
+        parser.add_argument('--import-rows', type=int, default=200, help='RAW DATA rows per generated workbook')
+        parser.add_argument('--import-file', help='Upload this workbook instead of generated ones (no consistency check)')
+        parser.add_argument(
+            '--consistency-timeout', type=float, default=30,
+            help='Seconds to wait for a write to show up in the chart API (default: 30)',
+        )
+        parser.add_argument('--seed', type=int, default=None, help='Random seed')
+        parser.add_argument('--output', help='Write the report to this JSON file')
+
+    def handle(self, *args, **options):
+        if options['users'] < 0 or options['duration'] <= 0:
+            raise CommandError('--users must not be negative and --duration must be positive')
+        writes = options['allow_writes']
+        if not writes:
+            self.stdout.write('Read-only run; pass --allow-writes to run edits and imports as well.')
+
+        load = LoadTest(
+            options['base_url'],
+            users=options['users'],
+            duration=options['duration'],
+            think_time=options['think_time'],
+            timeout=options['timeout'],
+            edit_interval=options['edit_interval'] if writes else None,
+            import_interval=options['import_interval'] if writes else None,
+            import_rows=options['import_rows'],
+            import_file=options['import_file'],
+            consistency_timeout=options['consistency_timeout'],
+            seed=options['seed'],
+        )
+        report = load.run()
+
+        self.stdout.write(f"{'page':<24} {'reqs':>6} {'rps':>7} {'err':>5} {'lock':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for name, page in [*report['pages'].items(), ('TOTAL', report['total'])]:
+            self.stdout.write(
+                f"{name:<24} {page['requests']:>6} {page['throughput_rps']:>7.2f} {page['errors']:>5} "
+                f"{page['lock_errors']:>5} {_ms(page['p50_ms'])} {_ms(page['p95_ms'])} {_ms(page['p99_ms'])} "
+                f"{_ms(page['max_ms'])}"
+            )
+        for name, consistency in report['consistency'].items():
+            self.stdout.write(
+                f"{name} visible after p50 {_ms(consistency['p50_ms'])} p95 {_ms(consistency['p95_ms'])} "
+                f"max {_ms(consistency['max_ms'])} ms ({consistency['writes']} writes, "
+                f"{consistency['timeouts']} not visible within {options['consistency_timeout']:g}s)"
+            )
+        for name, failures in report['total']['write_failures'].items():
+            self.stdout.write(self.style.WARNING(f'{failures} {name} write(s) were rejected'))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        total = report['total']
+        style = self.style.ERROR if total['errors'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{total['requests']} requests in {report['elapsed_s']}s, {total['errors']} errors "
+            f"({total['lock_errors']} lock waits)"
+        ))
+
+
+def _ms(value):
+    return f"{'-' if value is None else f'{value:.1f}':>8}"
@@ -0,0 +1,105 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bioburden.lazy import HEAVY_MODULES
+
+
+# Runs in a fresh interpreter, like a worker that has just been forked from
+# a master without --preload: set Django up, load the URLconf (and with it
+# every view module), optionally warm the heavy imports, then report timings
+# and memory as JSON on stdout.
+WORKER_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+warm = {warm!r}
+if warm:
+    from bioburden.lazy import warm_imports
+    warm_imports(warm)
+warmed = time.perf_counter()
+rss = 0
+with open('/proc/self/status') as status:
+    for line in status:
+        if line.startswith('VmRSS:'):
+            rss = int(line.split()[1])
+print(json.dumps({{
+    'setup_s': setup - started,
+    'urlconf_s': urls - setup,
+    'warm_s': warmed - urls,
+    'rss_kib': rss,
+    'modules': len(sys.modules),
+    'heavy_loaded': [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Measure worker startup: import time and resident memory of fresh processes, lazy and warmed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=5, help='Fresh processes per mode (default: 5)')
+        parser.add_argument(
+            '--warm', default=','.join(HEAVY_MODULES),
+            help='Modules the warmed mode imports (default: %(default)s)',
+        )
+        parser.add_argument('--output', help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/status'):
+            raise CommandError('Resident memory is read from /proc; run this on Linux')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be positive')
+        warm = [name.strip() for name in options['warm'].split(',') if name.strip()]
+
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'bioburden_project.settings')}
+        modes = {}
+        for mode, modules in (('lazy', []), ('warmed', warm)):
+            script = WORKER_SCRIPT.format(warm=modules, heavy=list(HEAVY_MODULES))
+            runs = []
+            for _ in range(options['workers']):
+                started = time.perf_counter()
+                process = subprocess.run(
+                    [sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+                )
+                if process.returncode:
+                    raise CommandError(f'Worker failed:\n{process.stderr}')
+                run = json.loads(process.stdout.strip().splitlines()[-1])
+                run['total_s'] = time.perf_counter() - started
+                runs.append(run)
+
+            modes[mode] = {
+                'workers': len(runs),
+                'heavy_loaded': runs[0]['heavy_loaded'],
+                'modules': runs[0]['modules'],
+                **{
+                    f'{key}_median': round(statistics.median(run[key] for run in runs), 4)
+                    for key in ('total_s', 'setup_s', 'urlconf_s', 'warm_s')
+                },
+                'rss_kib_median': statistics.median(run['rss_kib'] for run in runs),
+                'runs': runs,
+            }
+            self.stdout.write(
+                f"{mode:<7} process {modes[mode]['total_s_median'] * 1000:7.0f} ms  "
+                f"setup {modes[mode]['setup_s_median'] * 1000:6.0f} ms  "
+                f"urlconf {modes[mode]['urlconf_s_median'] * 1000:6.0f} ms  "
+                f"warm {modes[mode]['warm_s_median'] * 1000:6.0f} ms  "
+                f"RSS {modes[mode]['rss_kib_median'] / 1024:6.1f} MiB  "
+                f"heavy modules loaded: {', '.join(modes[mode]['heavy_loaded']) or 'none'}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'python': sys.version.split()[0], 'warm': warm, 'modes': modes}, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
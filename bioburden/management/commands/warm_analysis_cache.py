@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bioburden.precompute import warm_result_cache
+
+
+class Command(BaseCommand):
+    help = 'Precompute the default analysis pages into the result cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Worker threads (default: one per CPU, at most one per page)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        timings = warm_result_cache(workers=options['workers'])
+        for name, seconds in timings:
+            self.stdout.write(f'  {name:<24} {seconds * 1000:8.1f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'Precomputed {len(timings)} results in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,263 @@
+"""
+Request and import metrics in the Prometheus text format.
+
+MetricsMiddleware counts requests and errors, and observes latency and
+database time, per URL name (e.g. bioburden:dashboard); imports and ingest
+batches record their duration through observe_import(). Unresolved URLs are
+counted under the view name "unresolved", so the label set stays bounded.
+
+Every value is a counter (histograms are stored as per-bucket counts plus a
+sum), so aggregating across worker processes is plain addition: each
+process accumulates increments in memory and adds them to a local SQLite
+file (settings.BIOBURDEN_METRICS_PATH) at most every
+BIOBURDEN_METRICS_FLUSH_INTERVAL seconds and at exit. The metrics endpoint
+flushes its own process and renders the totals of all of them.
+"""
+import atexit
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+# Prometheus client defaults, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+IMPORT_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'bioburden_http_requests_total': ('counter', 'HTTP requests by view, method and status code', None),
+    'bioburden_http_request_errors_total': ('counter', 'HTTP requests answered with a 5xx status, by view', None),
+    'bioburden_http_request_duration_seconds': ('histogram', 'Request latency by view', LATENCY_BUCKETS),
+    'bioburden_http_request_db_seconds_total': ('counter', 'Time spent in database queries by view', None),
+    'bioburden_http_request_db_queries_total': ('counter', 'Database queries issued by view', None),
+    'bioburden_import_duration_seconds': ('histogram', 'Duration of data imports by source and outcome', IMPORT_BUCKETS),
+    'bioburden_import_records_total': ('counter', 'Records written by data imports by source', None),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric_value (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+);
+"""
+
+_SKIPPED_VIEWS = {'bioburden:metrics'}
+
+
+def _labels(**labels):
+    return json.dumps(labels, sort_keys=True)
+
+
+class MetricsRegistry:
+    """Per-process counter increments, flushed into a SQLite file shared by all workers"""
+
+    def __init__(self, path, flush_interval=10.0):
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self._pending = defaultdict(float)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._last_flush = time.monotonic()
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def inc(self, name, labels, amount=1.0):
+        with self._lock:
+            self._pending[(name, labels)] += amount
+
+    def observe(self, name, labels, value):
+        """Add an observation to a histogram (non-cumulative bucket counts)"""
+        le = next((bound for bound in METRICS[name][2] if value <= bound), math.inf)
+        bucket_labels = _labels(**json.loads(labels), le=_format_le(le))
+        with self._lock:
+            self._pending[(f'{name}_bucket', bucket_labels)] += 1
+            self._pending[(f'{name}_sum', labels)] += value
+            self._pending[(f'{name}_count', labels)] += 1
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            with self._connection() as connection:
+                connection.executemany(
+                    'INSERT INTO metric_value (name, labels, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                    [(name, labels, value) for (name, labels), value in pending.items()],
+                )
+        except sqlite3.Error:
+            # Keep the increments for the next flush rather than losing them
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] += value
+
+    def totals(self):
+        """{name: {labels: value}} summed over all processes"""
+        self.flush()
+        totals = defaultdict(dict)
+        for name, labels, value in self._connection().execute('SELECT name, labels, value FROM metric_value'):
+            totals[name][labels] = value
+        return totals
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+        with self._connection() as connection:
+            connection.execute('DELETE FROM metric_value')
+
+
+def _format_le(bound):
+    return '+Inf' if bound == math.inf else repr(float(bound))
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def render_prometheus(totals):
+    """Prometheus text exposition (format 0.0.4) of the registry totals"""
+    lines = []
+    for name, (kind, help_text, bounds) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for labels, value in sorted(totals.get(name, {}).items()):
+                lines.append(f'{name}{_format_labels(json.loads(labels))} {_format_value(value)}')
+            continue
+
+        # Histogram: cumulate the stored per-bucket counts for each label set
+        buckets = defaultdict(dict)
+        for labels, value in totals.get(f'{name}_bucket', {}).items():
+            labels = json.loads(labels)
+            le = labels.pop('le')
+            buckets[_labels(**labels)][float(le)] = value
+        for labels in sorted(totals.get(f'{name}_count', {})):
+            base = json.loads(labels)
+            running = 0
+            for bound in (*bounds, math.inf):
+                running += buckets[labels].get(bound, 0)
+                lines.append(f'{name}_bucket{_format_labels({**base, "le": _format_le(bound)})} {_format_value(running)}')
+            lines.append(f'{name}_sum{_format_labels(base)} {_format_value(totals[f"{name}_sum"].get(labels, 0))}')
+            lines.append(f'{name}_count{_format_labels(base)} {_format_value(totals[f"{name}_count"][labels])}')
+    return '\n'.join(lines) + '\n'
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def registry():
+    """The process's MetricsRegistry at settings.BIOBURDEN_METRICS_PATH"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry(
+                    getattr(settings, 'BIOBURDEN_METRICS_PATH', 'metrics.sqlite3'),
+                    flush_interval=getattr(settings, 'BIOBURDEN_METRICS_FLUSH_INTERVAL', 10.0),
+                )
+                atexit.register(_registry.flush)
+    return _registry
+
+
+def metrics_enabled():
+    return getattr(settings, 'BIOBURDEN_METRICS', False)
+
+
+def observe_import(source, seconds, records, success):
+    """Record one import (source is e.g. 'excel' or 'api')"""
+    if not metrics_enabled():
+        return
+    metrics = registry()
+    labels = _labels(source=source, outcome='success' if success else 'failure')
+    metrics.observe('bioburden_import_duration_seconds', labels, seconds)
+    metrics.inc('bioburden_import_records_total', _labels(source=source), records)
+    metrics.maybe_flush()
+
+
+class _QueryTimer:
+    """connection.execute_wrapper() callable adding up query time"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Count requests and observe latency and database time per URL name"""
+
+    def __init__(self, get_response):
+        if not metrics_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        seconds = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        if view in _SKIPPED_VIEWS:
+            return response
+
+        metrics = registry()
+        labels = _labels(view=view)
+        metrics.inc('bioburden_http_requests_total', _labels(view=view, method=request.method, code=str(response.status_code)))
+        if response.status_code >= 500:
+            metrics.inc('bioburden_http_request_errors_total', labels)
+        metrics.observe('bioburden_http_request_duration_seconds', labels, seconds)
+        metrics.inc('bioburden_http_request_db_seconds_total', labels, timer.seconds)
+        metrics.inc('bioburden_http_request_db_queries_total', labels, timer.count)
+        metrics.maybe_flush()
+        return response
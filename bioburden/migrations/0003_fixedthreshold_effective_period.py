@@ -0,0 +1,42 @@
+# Generated by Django 5.0 on 2026-10-19 02:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bioburden', '0002_lot_primary_organism_lot_production_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='fixedthreshold',
+            options={'ordering': ['lot__lot_number', 'area__name', '-effective_from'], 'verbose_name': 'Fixed Threshold', 'verbose_name_plural': 'Fixed Thresholds'},
+        ),
+        migrations.AddField(
+            model_name='fixedthreshold',
+            name='effective_from',
+            field=models.DateField(blank=True, help_text='First test date these levels apply to (blank = no start)', null=True),
+        ),
+        migrations.AddField(
+            model_name='fixedthreshold',
+            name='effective_to',
+            field=models.DateField(blank=True, help_text='Last test date these levels apply to (blank = open-ended)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='fixedthreshold',
+            name='area',
+            field=models.ForeignKey(blank=True, help_text='Leave blank to apply to all areas', null=True, on_delete=django.db.models.deletion.CASCADE, to='bioburden.area'),
+        ),
+        migrations.AlterField(
+            model_name='fixedthreshold',
+            name='lot',
+            field=models.ForeignKey(blank=True, help_text='Leave blank to apply to all lots', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thresholds', to='bioburden.lot'),
+        ),
+        migrations.AddIndex(
+            model_name='fixedthreshold',
+            index=models.Index(fields=['lot', 'area', 'effective_from'], name='bioburden_f_lot_id_dd9e5b_idx'),
+        ),
+    ]
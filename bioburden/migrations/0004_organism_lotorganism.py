@@ -0,0 +1,52 @@
+# Generated by Django 5.0 on 2026-10-19 03:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bioburden', '0003_fixedthreshold_effective_period'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Organism',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LotOrganism',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(choices=[(1, 'Primary'), (2, 'Secondary'), (3, 'Tertiary')])),
+                ('lot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='organism_links', to='bioburden.lot')),
+                ('organism', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lot_links', to='bioburden.organism')),
+            ],
+            options={
+                'verbose_name': 'Lot Organism',
+                'verbose_name_plural': 'Lot Organisms',
+                'ordering': ['lot', 'rank'],
+            },
+        ),
+        migrations.AddField(
+            model_name='lot',
+            name='organisms',
+            field=models.ManyToManyField(blank=True, related_name='lots', through='bioburden.LotOrganism', to='bioburden.organism'),
+        ),
+        migrations.AddIndex(
+            model_name='lotorganism',
+            index=models.Index(fields=['organism', 'lot'], name='bioburden_l_organis_c2e886_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='lotorganism',
+            constraint=models.UniqueConstraint(fields=('lot', 'rank'), name='unique_lot_organism_rank'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+
+ORGANISM_FIELDS = [
+    ('primary_organism', 1),
+    ('secondary_organism', 2),
+    ('tertiary_organism', 3),
+]
+
+
+def backfill_lot_organisms(apps, schema_editor):
+    """Create Organism rows and rank links from the free-text lot columns"""
+    Lot = apps.get_model('bioburden', 'Lot')
+    Organism = apps.get_model('bioburden', 'Organism')
+    LotOrganism = apps.get_model('bioburden', 'LotOrganism')
+    
+    field_names = [field for field, _ in ORGANISM_FIELDS]
+    links = []
+    for row in Lot.objects.values_list('id', *field_names).iterator(chunk_size=2000):
+        lot_id, values = row[0], row[1:]
+        for (field, rank), value in zip(ORGANISM_FIELDS, values):
+            name = (value or '').strip()
+            if name:
+                links.append((lot_id, name, rank))
+    
+    names = sorted({name for _, name, _ in links})
+    Organism.objects.bulk_create([Organism(name=name) for name in names], ignore_conflicts=True)
+    organism_ids = dict(Organism.objects.values_list('name', 'id'))
+    
+    LotOrganism.objects.bulk_create(
+        [LotOrganism(lot_id=lot_id, organism_id=organism_ids[name], rank=rank) for lot_id, name, rank in links],
+        batch_size=2000,
+        ignore_conflicts=True,
+    )
+
+
+def clear_lot_organisms(apps, schema_editor):
+    apps.get_model('bioburden', 'LotOrganism').objects.all().delete()
+    apps.get_model('bioburden', 'Organism').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bioburden', '0004_organism_lotorganism'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_lot_organisms, clear_lot_organisms),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.0 on 2026-10-19 03:02
+
+import struct
+
+from django.db import migrations, models
+
+
+def backfill_samples(apps, schema_editor):
+    """Existing rows hold a single value each; store it as a one-sample array"""
+    BioburdenData = apps.get_model('bioburden', 'BioburdenData')
+    
+    batch = []
+    for row_id, cfu_count in BioburdenData.objects.values_list('id', 'cfu_count').iterator(chunk_size=2000):
+        value = float(cfu_count)
+        batch.append(BioburdenData(
+            id=row_id,
+            samples=struct.pack('<d', value),
+            sample_count=1,
+            sample_mean=value,
+            sample_min=value,
+            sample_max=value,
+        ))
+        if len(batch) >= 2000:
+            BioburdenData.objects.bulk_update(batch, ['samples', 'sample_count', 'sample_mean', 'sample_min', 'sample_max'])
+            batch = []
+    if batch:
+        BioburdenData.objects.bulk_update(batch, ['samples', 'sample_count', 'sample_mean', 'sample_min', 'sample_max'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bioburden', '0005_backfill_lot_organisms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bioburdendata',
+            name='sample_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bioburdendata',
+            name='sample_max',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bioburdendata',
+            name='sample_mean',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bioburdendata',
+            name='sample_min',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bioburdendata',
+            name='samples',
+            field=models.BinaryField(blank=True, help_text='Per-sample CFU values packed as little-endian float64', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['sample_count'], name='bioburden_b_sample__d97d4c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['sample_mean'], name='bioburden_b_sample__9718ea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['sample_min'], name='bioburden_b_sample__4ff5ae_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['sample_max'], name='bioburden_b_sample__fc1d36_idx'),
+        ),
+        migrations.RunPython(backfill_samples, migrations.RunPython.noop),
+    ]
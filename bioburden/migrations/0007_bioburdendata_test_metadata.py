@@ -0,0 +1,82 @@
+# Generated by Django 5.0 on 2026-10-19 03:03
+
+import re
+
+from django.db import migrations, models
+
+
+NOTES_PATTERN = re.compile(
+    r'Type:\s*(?P<type>AEROBES|FUNGI),\s*Validation:\s*(?P<validation>\w+),\s*'
+    r'Samples:\s*(?P<count>\d+),\s*Min:\s*(?P<min>[\d.]+),\s*Max:\s*(?P<max>[\d.]+)'
+)
+
+
+def parse_test_metadata(apps, schema_editor):
+    """Fill the metadata columns from notes text and sample_id prefixes"""
+    BioburdenData = apps.get_model('bioburden', 'BioburdenData')
+    fields = ['organism_type', 'validation', 'samples', 'sample_count', 'sample_min', 'sample_max']
+    
+    batch = []
+    rows = BioburdenData.objects.values_list('id', 'sample_id', 'notes', 'sample_count', 'sample_min', 'sample_max')
+    for row_id, sample_id, notes, sample_count, sample_min, sample_max in rows.iterator(chunk_size=2000):
+        test = BioburdenData(id=row_id, sample_count=sample_count, sample_min=sample_min, sample_max=sample_max)
+        match = NOTES_PATTERN.search(notes or '')
+        if match:
+            # Written by import_complete_data.py: summary only, the
+            # individual values were not kept
+            test.organism_type = match.group('type')
+            test.validation = match.group('validation').upper() == 'YES'
+            test.samples = None
+            test.sample_count = int(match.group('count'))
+            test.sample_min = float(match.group('min'))
+            test.sample_max = float(match.group('max'))
+            update_fields = fields
+        else:
+            prefix = (sample_id or '').split('-', 1)[0].upper()
+            if prefix not in ('AEROBES', 'FUNGI'):
+                continue
+            test.organism_type = prefix
+            update_fields = ['organism_type']
+        
+        batch.append((test, update_fields))
+        if len(batch) >= 2000:
+            _flush(BioburdenData, batch)
+            batch = []
+    _flush(BioburdenData, batch)
+
+
+def _flush(BioburdenData, batch):
+    for update_fields in {tuple(fields) for _, fields in batch}:
+        BioburdenData.objects.bulk_update(
+            [test for test, fields in batch if tuple(fields) == update_fields],
+            list(update_fields),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bioburden', '0006_bioburdendata_samples'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bioburdendata',
+            name='organism_type',
+            field=models.CharField(blank=True, choices=[('AEROBES', 'Aerobes'), ('FUNGI', 'Fungi')], max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='bioburdendata',
+            name='validation',
+            field=models.BooleanField(blank=True, help_text='Validation run (VALIDATION column)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['organism_type', 'area', 'test_date'], name='bioburden_b_organis_e41ab2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['organism_type', 'test_date'], name='bioburden_b_organis_edd0c4_idx'),
+        ),
+        migrations.RunPython(parse_test_metadata, migrations.RunPython.noop),
+    ]
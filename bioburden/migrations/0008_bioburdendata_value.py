@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-19 03:05
+
+from django.db import migrations, models
+from django.db.models import Case, FloatField, When
+from django.db.models.functions import Cast
+
+
+def backfill_value(apps, schema_editor):
+    BioburdenData = apps.get_model('bioburden', 'BioburdenData')
+    BioburdenData.objects.update(value=Case(
+        When(adjusted_cfu__gt=0, then=Cast('adjusted_cfu', FloatField())),
+        default=Cast('cfu_count', FloatField()),
+        output_field=FloatField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bioburden', '0007_bioburdendata_test_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bioburdendata',
+            name='value',
+            field=models.FloatField(default=0, help_text='Adjusted CFU (or raw CFU), kept in sync on save'),
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['value'], name='bioburden_b_value_4834c2_idx'),
+        ),
+        migrations.RunPython(backfill_value, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-19 03:18
+
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth, TruncWeek
+
+
+def backfill_buckets(apps, schema_editor):
+    BioburdenData = apps.get_model('bioburden', 'BioburdenData')
+    BioburdenData.objects.update(test_week=TruncWeek('test_date'), test_month=TruncMonth('test_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bioburden', '0009_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bioburdendata',
+            name='test_month',
+            field=models.DateField(blank=True, editable=False, help_text='First day of the test month', null=True),
+        ),
+        migrations.AddField(
+            model_name='bioburdendata',
+            name='test_week',
+            field=models.DateField(blank=True, editable=False, help_text='Monday of the test week', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['test_week', 'area'], name='bioburden_b_test_we_01db1f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['test_month', 'area'], name='bioburden_b_test_mo_c66e9e_idx'),
+        ),
+        migrations.RunPython(backfill_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-19 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bioburden', '0010_bioburdendata_time_buckets'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['test_date', 'id'], name='bioburden_b_test_da_b18340_idx'),
+        ),
+    ]
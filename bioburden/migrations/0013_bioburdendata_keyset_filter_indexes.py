@@ -0,0 +1,41 @@
+# Generated by Django 5.0 on 2026-10-19 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bioburden', '0012_dataexport'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bioburdendata',
+            name='bioburden_b_lot_id_bebb7b_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='bioburdendata',
+            name='bioburden_b_area_id_fba580_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='bioburdendata',
+            name='bioburden_b_organis_edd0c4_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['lot', 'test_date', 'id'], name='bioburden_b_lot_id_283ea9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['area', 'test_date', 'id'], name='bioburden_b_area_id_97de3d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['status', 'test_date', 'id'], name='bioburden_b_status_7dc4af_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bioburdendata',
+            index=models.Index(fields=['organism_type', 'test_date', 'id'], name='bioburden_b_organis_4f1c90_idx'),
+        ),
+    ]
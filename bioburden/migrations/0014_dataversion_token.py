@@ -0,0 +1,24 @@
+import bioburden.models
+from django.db import migrations, models
+
+
+def create_data_version(apps, schema_editor):
+    """Give databases that hold data but were never bumped their row (and token)"""
+    DataVersion = apps.get_model('bioburden', 'DataVersion')
+    DataVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bioburden', '0013_bioburdendata_keyset_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataversion',
+            name='token',
+            field=models.CharField(default=bioburden.models.new_data_token, editable=False, max_length=32),
+        ),
+        migrations.RunPython(create_data_version, migrations.RunPython.noop),
+    ]
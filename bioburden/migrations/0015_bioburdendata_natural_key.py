@@ -0,0 +1,67 @@
+# Generated by Django 5.0 on 2026-10-19 04:03
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, F, Value
+from django.db.models.functions import Coalesce
+
+
+KEY_FIELDS = ['lot_id', 'area_id', 'test_date', 'type_key', 'sample_id']
+
+
+def disambiguate_natural_key_duplicates(apps, schema_editor):
+    """Make existing tests unique on the natural key before the constraint is added
+
+    Repeats of (lot, area, test_date, organism_type, sample_id) come from the
+    old per-sample import (one AEROBES-S1 row per sheet row), repeated
+    imports and fallback-sheet Sample IDs. Exact copies (same CFU count,
+    samples and dilution) are dropped; the other tests keep their data and
+    get '-2', '-3', ... appended to their sample ID, in id order.
+    """
+    BioburdenData = apps.get_model('bioburden', 'BioburdenData')
+    DataVersion = apps.get_model('bioburden', 'DataVersion')
+
+    keyed = BioburdenData.objects.filter(sample_id__gt='').annotate(type_key=Coalesce('organism_type', Value('')))
+    groups = keyed.order_by().values(*KEY_FIELDS).annotate(rows=Count('id')).filter(rows__gt=1)
+    changed = False
+    for group in list(groups):
+        key = {field: group[field] for field in KEY_FIELDS}
+        seen = set()
+        kept = []
+        for test in keyed.filter(**key).order_by('id'):
+            fingerprint = (test.cfu_count, bytes(test.samples or b''), test.dilution_factor)
+            if fingerprint in seen:
+                BioburdenData.objects.filter(pk=test.pk).delete()
+            else:
+                seen.add(fingerprint)
+                kept.append(test)
+        changed = True
+
+        siblings = keyed.filter(**{field: value for field, value in key.items() if field != 'sample_id'})
+        number = 1
+        for test in kept[1:]:
+            while True:
+                number += 1
+                suffix = f'-{number}'
+                sample_id = key['sample_id'][:100 - len(suffix)] + suffix
+                if not siblings.filter(sample_id=sample_id).exists():
+                    break
+            BioburdenData.objects.filter(pk=test.pk).update(sample_id=sample_id)
+
+    if changed:
+        DataVersion.objects.filter(pk=1).update(version=F('version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bioburden', '0014_dataversion_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(disambiguate_natural_key_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='bioburdendata',
+            constraint=models.UniqueConstraint(models.F('lot'), models.F('area'), models.F('test_date'), django.db.models.functions.comparison.Coalesce('organism_type', models.Value('')), models.F('sample_id'), condition=models.Q(('sample_id__gt', '')), name='unique_test_natural_key', violation_error_message='A test with this lot, area, test date, organism type and sample ID already exists.'),
+        ),
+    ]
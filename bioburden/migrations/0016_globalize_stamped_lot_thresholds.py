@@ -0,0 +1,65 @@
+from django.db import migrations
+from django.db.models import Case, F, Q, Value, When
+
+
+def globalize_stamped_lot_thresholds(apps, schema_editor):
+    """Replace the levels the old importer stamped onto every lot by one global threshold
+
+    Before effective-dated thresholds, the ALERT_ACTION LEVELS import wrote
+    the sheet's last levels to every lot (lot set, no area, no period).
+    Lot-scoped rows outrank the global periods imported since, so tests kept
+    being classified against the stamped levels. The stamps are recognised
+    as one row per lot, all with the same levels; they become a single
+    open-ended global threshold unless global periods already exist. Tests
+    that only global thresholds govern are then reclassified.
+    """
+    Lot = apps.get_model('bioburden', 'Lot')
+    FixedThreshold = apps.get_model('bioburden', 'FixedThreshold')
+    BioburdenData = apps.get_model('bioburden', 'BioburdenData')
+    DataVersion = apps.get_model('bioburden', 'DataVersion')
+
+    stamped = FixedThreshold.objects.filter(
+        lot__isnull=False, area__isnull=True, effective_from__isnull=True, effective_to__isnull=True,
+    )
+    levels = list(stamped.order_by().values_list('alert_level', 'action_level').distinct())
+    lots = Lot.objects.count()
+    if len(levels) != 1 or lots < 2 or stamped.count() != lots:
+        return
+
+    global_periods = FixedThreshold.objects.filter(lot__isnull=True, area__isnull=True)
+    if not global_periods.exists():
+        alert_level, action_level = levels[0]
+        FixedThreshold.objects.create(
+            alert_level=alert_level,
+            action_level=action_level,
+            notes="Levels previously stamped onto every lot",
+        )
+    stamped.delete()
+
+    scoped_lots = FixedThreshold.objects.filter(lot__isnull=False).values('lot_id')
+    scoped_areas = FixedThreshold.objects.filter(area__isnull=False).values('area_id')
+    tests = BioburdenData.objects.exclude(lot_id__in=scoped_lots).exclude(area_id__in=scoped_areas)
+    for threshold in global_periods:
+        period = Q()
+        if threshold.effective_from:
+            period &= Q(test_date__gte=threshold.effective_from)
+        if threshold.effective_to:
+            period &= Q(test_date__lte=threshold.effective_to)
+        tests.filter(period).update(status=Case(
+            When(value__gte=float(threshold.action_level), then=Value('action')),
+            When(value__gte=float(threshold.alert_level), then=Value('alert')),
+            default=Value('normal'),
+        ))
+
+    DataVersion.objects.filter(pk=1).update(version=F('version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bioburden', '0015_bioburdendata_natural_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(globalize_stamped_lot_thresholds, migrations.RunPython.noop),
+    ]
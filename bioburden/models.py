@@ -1,4 +1,12 @@
+import secrets
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+
 from django.db import models
+from django.db.models import Case, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from decimal import Decimal
@@ -17,6 +25,18 @@ class Area(models.Model):
         return self.name
 
 
+class Organism(models.Model):
+    """Identified microorganism (normalized from the lot organism columns)"""
+    name = models.CharField(max_length=200, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
 class Lot(models.Model):
     """Product lots being tested"""
     lot_number = models.CharField(max_length=100, unique=True)
@@ -26,19 +46,116 @@ class Lot(models.Model):
     primary_organism = models.CharField(max_length=200, blank=True, null=True)
     secondary_organism = models.CharField(max_length=200, blank=True, null=True)
     tertiary_organism = models.CharField(max_length=200, blank=True, null=True)
+    organisms = models.ManyToManyField(Organism, through='LotOrganism', related_name='lots', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Organism columns mirrored into LotOrganism links, with their rank
+    ORGANISM_FIELDS = [
+        ('primary_organism', 1),
+        ('secondary_organism', 2),
+        ('tertiary_organism', 3),
+    ]
+    
     class Meta:
         ordering = ['-lot_number']
     
     def __str__(self):
         return self.lot_number
+    
+    def save(self, *args, **kwargs):
+        # Bump the data version once the organism links are in place too
+        with DataVersion.deferred():
+            super().save(*args, **kwargs)
+            self.sync_organisms()
+    
+    def sync_organisms(self):
+        """Mirror the primary/secondary/tertiary organism columns into LotOrganism links"""
+        names = {}
+        for field, rank in self.ORGANISM_FIELDS:
+            name = (getattr(self, field) or '').strip()
+            if name:
+                names[rank] = name
+        
+        existing = {
+            link.rank: link
+            for link in LotOrganism.objects.filter(lot=self).select_related('organism')
+        }
+        if {rank: link.organism.name for rank, link in existing.items()} == names:
+            return
+        
+        LotOrganism.objects.filter(lot=self).delete()
+        organisms = {}
+        for name in set(names.values()):
+            organisms[name], _ = Organism.objects.get_or_create(name=name)
+        LotOrganism.objects.bulk_create([
+            LotOrganism(lot=self, organism=organisms[name], rank=rank)
+            for rank, name in names.items()
+        ])
+    
+    @property
+    def threshold(self):
+        """Lot-wide threshold in force today (area-specific levels are ignored)"""
+        return FixedThreshold.resolve(self.pk, None, timezone.now().date())
+
+
+class LotOrganism(models.Model):
+    """Organism identified on a lot, with its rank (1 = primary)"""
+    RANK_CHOICES = [
+        (1, 'Primary'),
+        (2, 'Secondary'),
+        (3, 'Tertiary'),
+    ]
+    lot = models.ForeignKey(Lot, on_delete=models.CASCADE, related_name='organism_links')
+    organism = models.ForeignKey(Organism, on_delete=models.CASCADE, related_name='lot_links')
+    rank = models.PositiveSmallIntegerField(choices=RANK_CHOICES)
+    
+    class Meta:
+        ordering = ['lot', 'rank']
+        verbose_name = 'Lot Organism'
+        verbose_name_plural = 'Lot Organisms'
+        constraints = [
+            models.UniqueConstraint(fields=['lot', 'rank'], name='unique_lot_organism_rank'),
+        ]
+        indexes = [
+            models.Index(fields=['organism', 'lot']),
+        ]
+    
+    def __str__(self):
+        return f"{self.lot.lot_number} - {self.get_rank_display()}: {self.organism.name}"
 
 
 class FixedThreshold(models.Model):
-    """Fixed alert and action levels by lot (reference table)"""
-    lot = models.OneToOneField(Lot, on_delete=models.CASCADE, related_name='threshold')
-    area = models.ForeignKey(Area, on_delete=models.CASCADE, blank=True, null=True)
+    """Fixed alert and action levels (reference table)
+    
+    A threshold may be scoped to a lot, an area, both or neither, and is valid
+    between effective_from and effective_to (blank means open-ended). The most
+    specific threshold in force on the test date wins.
+    """
+    lot = models.ForeignKey(
+        Lot,
+        on_delete=models.CASCADE,
+        related_name='thresholds',
+        blank=True,
+        null=True,
+        help_text="Leave blank to apply to all lots"
+    )
+    area = models.ForeignKey(
+        Area,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        help_text="Leave blank to apply to all areas"
+    )
+    effective_from = models.DateField(
+        blank=True,
+        null=True,
+        help_text="First test date these levels apply to (blank = no start)"
+    )
+    effective_to = models.DateField(
+        blank=True,
+        null=True,
+        help_text="Last test date these levels apply to (blank = open-ended)"
+    )
     alert_level = models.DecimalField(
         max_digits=10, 
         decimal_places=2,
@@ -56,12 +173,126 @@ class FixedThreshold(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
-        ordering = ['lot__lot_number']
+        ordering = ['lot__lot_number', 'area__name', '-effective_from']
         verbose_name = 'Fixed Threshold'
         verbose_name_plural = 'Fixed Thresholds'
+        indexes = [
+            models.Index(fields=['lot', 'area', 'effective_from']),
+        ]
     
     def __str__(self):
-        return f"{self.lot.lot_number} - Alert: {self.alert_level}, Action: {self.action_level}"
+        scope = self.lot.lot_number if self.lot else 'All lots'
+        return f"{scope} - Alert: {self.alert_level}, Action: {self.action_level}"
+    
+    def clean(self):
+        if self.effective_from and self.effective_to and self.effective_to < self.effective_from:
+            raise ValidationError({'effective_to': "Effective to must not be before effective from."})
+        
+        # Periods within one lot/area scope must not overlap, otherwise the
+        # threshold in force on a given date would be ambiguous
+        overlapping = FixedThreshold.objects.filter(lot=self.lot, area=self.area).exclude(pk=self.pk)
+        if self.effective_to:
+            overlapping = overlapping.filter(
+                Q(effective_from__lte=self.effective_to) | Q(effective_from__isnull=True)
+            )
+        if self.effective_from:
+            overlapping = overlapping.filter(
+                Q(effective_to__gte=self.effective_from) | Q(effective_to__isnull=True)
+            )
+        if overlapping.exists():
+            raise ValidationError("Another threshold for this lot and area overlaps the effective period.")
+    
+    @classmethod
+    def resolve(cls, lot_id, area_id, test_date):
+        """Return the most specific threshold in force for a lot/area on a date, or None"""
+        return cls.objects.filter(
+            Q(lot_id=lot_id) | Q(lot__isnull=True),
+            Q(area_id=area_id) | Q(area__isnull=True),
+            Q(effective_from__lte=test_date) | Q(effective_from__isnull=True),
+            Q(effective_to__gte=test_date) | Q(effective_to__isnull=True),
+        ).order_by(
+            F('lot').asc(nulls_last=True),
+            F('area').asc(nulls_last=True),
+            F('effective_from').desc(nulls_last=True),
+        ).first()
+
+
+class BioburdenDataQuerySet(models.QuerySet):
+    """Bulk operations and array access for bioburden tests"""
+    
+    def value_expression(self):
+        """SQL equivalent of get_value (adjusted CFU, falling back to raw CFU)"""
+        return Case(
+            When(adjusted_cfu__gt=0, then=Cast('adjusted_cfu', FloatField())),
+            default=Cast('cfu_count', FloatField()),
+            output_field=FloatField(),
+        )
+    
+    def status_code_expression(self):
+        """Status as its index in STATUS_CHOICES"""
+        return Case(
+            *[When(status=status, then=code) for code, (status, _) in enumerate(BioburdenData.STATUS_CHOICES)],
+            default=0,
+            output_field=IntegerField(),
+        )
+    
+    def update(self, **kwargs):
+        # Stamp updated_at so incremental snapshot refreshes see bulk edits
+        kwargs.setdefault('updated_at', timezone.now())
+        rows = super().update(**kwargs)
+        if rows:
+            DataVersion.bump()
+        return rows
+    
+    update.alters_data = True
+    
+    def delete(self):
+        deleted = super().delete()
+        if deleted[0]:
+            DataVersion.bump()
+        return deleted
+    
+    delete.alters_data = True
+    delete.queryset_only = True
+    
+    def refresh_values(self):
+        """Recompute the stored value column in one UPDATE (for bulk edits that bypass save())"""
+        return self.update(value=self.value_expression())
+    
+    def organism_type_code_expression(self):
+        """Organism type as its index in ORGANISM_TYPE_CHOICES (-1 when unset)"""
+        return Case(
+            *[When(organism_type=value, then=code)
+              for code, (value, _) in enumerate(BioburdenData.ORGANISM_TYPE_CHOICES)],
+            default=-1,
+            output_field=IntegerField(),
+        )
+    
+    def analytics_arrays(self):
+        """Return id, lot_id, area_id, date_ordinal, value, status_code and
+        organism_type_code as typed NumPy arrays
+        
+        Reads straight from values_list, so no model instances or Decimals
+        are created.
+        """
+        import numpy as np
+        
+        rows = list(self.order_by().values_list(
+            'id', 'lot_id', 'area_id', 'test_date', 'value',
+            self.status_code_expression(),
+            self.organism_type_code_expression(),
+        ))
+        n = len(rows)
+        columns = list(zip(*rows)) if rows else [()] * 7
+        return {
+            'id': np.fromiter(columns[0], dtype=np.int64, count=n),
+            'lot_id': np.fromiter(columns[1], dtype=np.int64, count=n),
+            'area_id': np.fromiter(columns[2], dtype=np.int64, count=n),
+            'date_ordinal': np.fromiter(map(date.toordinal, columns[3]), dtype=np.int64, count=n),
+            'value': np.fromiter(columns[4], dtype=np.float64, count=n),
+            'status_code': np.fromiter(columns[5], dtype=np.int8, count=n),
+            'organism_type_code': np.fromiter(columns[6], dtype=np.int8, count=n),
+        }
 
 
 class BioburdenData(models.Model):
@@ -71,6 +302,18 @@ class BioburdenData(models.Model):
     test_date = models.DateField()
     sample_id = models.CharField(max_length=100, blank=True, null=True)
     
+    # Time buckets of test_date for trend aggregation, kept in sync on save
+    test_week = models.DateField(blank=True, null=True, editable=False, help_text="Monday of the test week")
+    test_month = models.DateField(blank=True, null=True, editable=False, help_text="First day of the test month")
+    
+    # Test metadata
+    ORGANISM_TYPE_CHOICES = [
+        ('AEROBES', 'Aerobes'),
+        ('FUNGI', 'Fungi'),
+    ]
+    organism_type = models.CharField(max_length=10, choices=ORGANISM_TYPE_CHOICES, blank=True, null=True)
+    validation = models.BooleanField(blank=True, null=True, help_text="Validation run (VALIDATION column)")
+    
     # Bioburden measurements (CFU - Colony Forming Units)
     cfu_count = models.DecimalField(
         max_digits=10, 
@@ -79,6 +322,18 @@ class BioburdenData(models.Model):
         help_text="Colony Forming Units count"
     )
     
+    # Individual sample values (S1..S10) packed as little-endian float64
+    samples = models.BinaryField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Per-sample CFU values packed as little-endian float64"
+    )
+    sample_count = models.PositiveSmallIntegerField(default=0)
+    sample_mean = models.FloatField(blank=True, null=True)
+    sample_min = models.FloatField(blank=True, null=True)
+    sample_max = models.FloatField(blank=True, null=True)
+    
     # Dilution factor if applicable
     dilution_factor = models.DecimalField(
         max_digits=10, 
@@ -96,6 +351,9 @@ class BioburdenData(models.Model):
         help_text="CFU adjusted for dilution"
     )
     
+    # Value compared against thresholds, stored as a float for analytics
+    value = models.FloatField(default=0, help_text="Adjusted CFU (or raw CFU), kept in sync on save")
+    
     # Laboratory information
     lab_name = models.CharField(max_length=200, blank=True, null=True)
     analyst = models.CharField(max_length=100, blank=True, null=True)
@@ -114,24 +372,66 @@ class BioburdenData(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = BioburdenDataQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-test_date', 'lot__lot_number']
         verbose_name = 'Bioburden Test'
         verbose_name_plural = 'Bioburden Tests'
         indexes = [
-            models.Index(fields=['lot', 'test_date']),
-            models.Index(fields=['area', 'test_date']),
+            # Each list filter followed by the (test_date, id) keyset order
+            models.Index(fields=['lot', 'test_date', 'id']),
+            models.Index(fields=['area', 'test_date', 'id']),
+            models.Index(fields=['status', 'test_date', 'id']),
+            models.Index(fields=['organism_type', 'test_date', 'id']),
             models.Index(fields=['status']),
+            models.Index(fields=['value']),
+            models.Index(fields=['organism_type', 'area', 'test_date']),
+            models.Index(fields=['sample_count']),
+            models.Index(fields=['sample_mean']),
+            models.Index(fields=['sample_min']),
+            models.Index(fields=['sample_max']),
+            models.Index(fields=['test_week', 'area']),
+            models.Index(fields=['test_month', 'area']),
+            models.Index(fields=['test_date', 'id']),
         ]
+        constraints = [
+            # Natural key the ingest API upserts on; tests without a sample
+            # ID (manual entry, older imports) are not keyed
+            models.UniqueConstraint(
+                'lot', 'area', 'test_date', Coalesce('organism_type', Value('')), 'sample_id',
+                condition=Q(sample_id__gt=''),
+                name='unique_test_natural_key',
+                violation_error_message=(
+                    "A test with this lot, area, test date, organism type and sample ID already exists."
+                ),
+            ),
+        ]
+    
+    # dtype of the packed samples field
+    SAMPLE_DTYPE = '<f8'
     
     def save(self, *args, **kwargs):
+        # Single-value tests (manual entry) keep their sample summary in step
+        # with cfu_count; multi-sample tests are set through set_samples()
+        if self.sample_count <= 1 and self.cfu_count is not None:
+            self.set_samples([self.cfu_count])
+        
+        # Trend buckets (test_date may still be a string, e.g. '2024-01-01')
+        if self.test_date:
+            self.test_date = self._meta.get_field('test_date').to_python(self.test_date)
+            self.test_week = self.test_date - timedelta(days=self.test_date.weekday())
+            self.test_month = self.test_date.replace(day=1)
+        
         # Calculate adjusted CFU
         if self.cfu_count and self.dilution_factor:
             self.adjusted_cfu = self.cfu_count * self.dilution_factor
+        self.value = float(self.get_value)
         
-        # Determine status based on fixed thresholds
-        if hasattr(self.lot, 'threshold'):
-            threshold = self.lot.threshold
+        # Determine status based on the fixed threshold in force for this
+        # lot, area and test date
+        threshold = FixedThreshold.resolve(self.lot_id, self.area_id, self.test_date)
+        if threshold:
             value = self.adjusted_cfu or self.cfu_count
             
             if value >= threshold.action_level:
@@ -143,9 +443,46 @@ class BioburdenData(models.Model):
         
         super().save(*args, **kwargs)
     
+    def delete(self, *args, **kwargs):
+        # No post_delete receiver for tests: it would stop Django from
+        # fast-deleting them in bulk, so bump the data version here instead
+        deleted = super().delete(*args, **kwargs)
+        DataVersion.bump()
+        return deleted
+    
     def __str__(self):
         return f"{self.lot.lot_number} - {self.area.name} ({self.test_date})"
     
+    @classmethod
+    def pack_samples(cls, values):
+        """Return (packed bytes, count, mean, min, max) for a list of sample values"""
+        import numpy as np
+        
+        array = np.asarray([float(v) for v in values], dtype=cls.SAMPLE_DTYPE)
+        if len(array) == 0:
+            return None, 0, None, None, None
+        return (
+            array.tobytes(),
+            len(array),
+            float(array.mean()),
+            float(array.min()),
+            float(array.max()),
+        )
+    
+    def set_samples(self, values):
+        """Store per-sample values in this row and refresh the summary columns"""
+        (self.samples, self.sample_count, self.sample_mean,
+         self.sample_min, self.sample_max) = self.pack_samples(values)
+    
+    @property
+    def sample_values(self):
+        """Per-sample values as a read-only NumPy view over the stored bytes (no copy)"""
+        import numpy as np
+        
+        if not self.samples:
+            return np.empty(0, dtype=self.SAMPLE_DTYPE)
+        return np.frombuffer(self.samples, dtype=self.SAMPLE_DTYPE)
+    
     @property
     def get_value(self):
         """Get the value to compare against thresholds"""
@@ -214,3 +551,123 @@ class DataImport(models.Model):
     
     def __str__(self):
         return f"{self.file_name} - {self.upload_date.strftime('%Y-%m-%d %H:%M')}"
+
+
+
+class DataExport(models.Model):
+    """Track background exports of filtered test data"""
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (XLSX)'),
+    ]
+    
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES, default='csv')
+    filters = models.JSONField(default=dict, blank=True, help_text="Filter parameters the export was requested with")
+    file = models.FileField(upload_to='exports/', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    rows_exported = models.IntegerField(default=0)
+    status = models.CharField(max_length=20, choices=[
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ], default='pending')
+    error_message = models.TextField(blank=True, null=True)
+    requested_by = models.CharField(max_length=100, blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.get_format_display()} export - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+    
+    def default_file_name(self):
+        return f"bioburden_tests_{self.created_at.strftime('%Y%m%d_%H%M%S')}.{self.format}"
+    
+    @classmethod
+    def fail_stale(cls, timeout):
+        """Mark exports still unfinished timeout seconds after they were requested as failed
+        
+        Exports run in a daemon thread of the worker that queued them; when
+        that worker exits or is recycled the thread dies with it and the
+        row would otherwise stay processing forever.
+        """
+        return cls.objects.filter(
+            status__in=['pending', 'processing'],
+            created_at__lt=timezone.now() - timedelta(seconds=timeout),
+        ).update(
+            status='failed',
+            error_message="The export did not finish in time; the worker running it may have stopped. Please start it again.",
+            completed_at=timezone.now(),
+        )
+
+_data_version_state = threading.local()
+
+
+def new_data_token():
+    """Random token telling one database's DataVersion row from another's"""
+    return secrets.token_hex(8)
+
+
+class DataVersion(models.Model):
+    """Single-row counter bumped whenever data behind the analysis pages changes
+    
+    In-memory snapshots and cached results compare against this number to
+    know when they are stale. Bulk writers (imports, reclassification) can
+    wrap their work in DataVersion.deferred() to bump once at the end.
+    
+    The token is random per row, so caches that outlive the database (a
+    restore, a flush, a new database) never mistake another database's
+    version for this one's.
+    """
+    version = models.BigIntegerField(default=0)
+    token = models.CharField(max_length=32, default=new_data_token, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Data Version'
+    
+    def __str__(self):
+        return f"Data version {self.version}"
+    
+    @classmethod
+    def current(cls):
+        """Return the current data version (0 before the first write)"""
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+    
+    @classmethod
+    def key(cls):
+        """Return '<token>-<version>', the data version qualified by this database's token"""
+        return cls.state()[0]
+    
+    @classmethod
+    def state(cls):
+        """Return (key(), time of the last bump); ('-0', None) before the first write"""
+        token, version, updated_at = (
+            cls.objects.filter(pk=1).values_list('token', 'version', 'updated_at').first() or ('', 0, None)
+        )
+        return f'{token}-{version}', updated_at
+    
+    @classmethod
+    def bump(cls):
+        """Increment the data version, or mark it pending inside deferred()"""
+        if getattr(_data_version_state, 'depth', 0):
+            _data_version_state.pending = True
+            return
+        updated = cls.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
+        if not updated:
+            cls.objects.get_or_create(pk=1, defaults={'version': 1})
+    
+    @classmethod
+    @contextmanager
+    def deferred(cls):
+        """Collapse all bumps inside the block into a single bump on exit"""
+        _data_version_state.depth = getattr(_data_version_state, 'depth', 0) + 1
+        try:
+            yield
+        finally:
+            _data_version_state.depth -= 1
+            if _data_version_state.depth == 0 and getattr(_data_version_state, 'pending', False):
+                _data_version_state.pending = False
+                cls.bump()
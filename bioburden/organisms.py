@@ -0,0 +1,76 @@
+"""
+Organism frequency and co-occurrence analytics.
+
+Counts come from grouped SQL aggregates over LotOrganism; co-occurrence is
+computed as a sparse lot x organism incidence product so it scales with the
+number of links rather than lots x organisms.
+"""
+import numpy as np
+from django.db.models import Count
+
+from .lazy import lazy_module
+from .models import LotOrganism, Organism
+
+sparse = lazy_module('scipy.sparse')
+
+
+def organism_frequency_summary():
+    """Return (summary rows, total occurrences) ordered by frequency"""
+    rows = list(
+        LotOrganism.objects.values('organism_id', 'organism__name')
+        .annotate(count=Count('id'), lot_count=Count('lot', distinct=True))
+        .order_by('-count', 'organism__name')
+    )
+    total = sum(row['count'] for row in rows)
+    summary = [
+        {
+            'id': row['organism_id'],
+            'name': row['organism__name'],
+            'count': row['count'],
+            'lot_count': row['lot_count'],
+            'percentage': round((row['count'] / total) * 100, 1) if total else 0,
+        }
+        for row in rows
+    ]
+    return summary, total
+
+
+def organism_cooccurrence():
+    """Return (organisms, matrix) of lots sharing each organism pair
+    
+    matrix is a scipy.sparse CSR matrix indexed like organisms; the diagonal
+    holds the number of lots each organism was identified on.
+    """
+    pairs = np.array(
+        list(LotOrganism.objects.order_by().values_list('lot_id', 'organism_id').distinct()),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    organisms = list(Organism.objects.filter(lot_links__isnull=False).distinct().order_by('name'))
+    if len(pairs) == 0:
+        return organisms, sparse.csr_matrix((len(organisms), len(organisms)), dtype=np.int64)
+    
+    organism_ids = np.array([organism.id for organism in organisms], dtype=np.int64)
+    id_order = np.argsort(organism_ids)
+    organism_pos = id_order[np.searchsorted(organism_ids, pairs[:, 1], sorter=id_order)]
+    _, lot_pos = np.unique(pairs[:, 0], return_inverse=True)
+    
+    incidence = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.int64), (lot_pos, organism_pos)),
+        shape=(lot_pos.max() + 1, len(organisms)),
+    )
+    return organisms, (incidence.T @ incidence).tocsr()
+
+
+def top_cooccurring_pairs(limit=20):
+    """Return the organism pairs found together on the most lots"""
+    organisms, matrix = organism_cooccurrence()
+    upper = sparse.triu(matrix, k=1).tocoo()
+    order = np.argsort(-upper.data, kind='stable')[:limit]
+    return [
+        {
+            'organism_a': organisms[upper.row[i]].name,
+            'organism_b': organisms[upper.col[i]].name,
+            'lot_count': int(upper.data[i]),
+        }
+        for i in order
+    ]
@@ -0,0 +1,44 @@
+"""
+Post-import precomputation of the analysis pages.
+
+warm_result_cache() computes the default view of every cached analysis page
+at the current data version and stores it in the result cache, spreading
+the pages over a thread pool. The import engine runs it after a successful
+import; `manage.py warm_analysis_cache` runs it on demand.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+from .cache import result_cache, result_key
+from .models import DataVersion
+from .snapshot import get_snapshot
+
+
+def warm_result_cache(workers=None):
+    """Compute and cache the default analysis results; return (name, seconds) per result"""
+    from .views import precomputed_results
+    
+    version = DataVersion.key()
+    cache = result_cache()
+    tasks = precomputed_results()
+    
+    # Load the snapshot once up front instead of in every worker
+    get_snapshot()
+    
+    def run(task):
+        name, params, compute = task
+        started = time.perf_counter()
+        try:
+            cache.set(result_key(name, params, version=version), compute())
+        finally:
+            # Each worker thread opened its own database connection
+            connections.close_all()
+        return name, time.perf_counter() - started
+    
+    if workers is None:
+        workers = min(len(tasks), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        return list(pool.map(run, tasks))
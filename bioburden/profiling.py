@@ -0,0 +1,228 @@
+"""
+Opt-in per-request query profiling.
+
+QueryProfilingMiddleware (enabled with settings.BIOBURDEN_QUERY_PROFILING)
+wraps every database connection for the duration of a request and records
+the query count, total SQL time and how often each query shape ran. A shape
+is the SQL text with IN lists and numeric literals collapsed, so the same
+query issued for different rows counts as one shape. Shapes repeated at
+least BIOBURDEN_N_PLUS_ONE_THRESHOLD times in one request are reported as
+N+1 patterns, together with the line of app code that first issued them.
+
+Profiles are kept per view name in a local SQLite file (the most recent
+BIOBURDEN_QUERY_PROFILE_KEEP requests of each view) and summarized on the
+query_profile debug page.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_IN_LIST = re.compile(r'IN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS request_profile (
+    id INTEGER PRIMARY KEY,
+    view TEXT NOT NULL,
+    path TEXT NOT NULL,
+    recorded REAL NOT NULL,
+    duration_ms REAL NOT NULL,
+    query_count INTEGER NOT NULL,
+    sql_ms REAL NOT NULL,
+    n_plus_one TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS request_profile_view ON request_profile (view, id);
+"""
+
+
+def query_shape(sql):
+    """SQL with IN lists and numeric literals collapsed"""
+    return _NUMBER.sub('N', _IN_LIST.sub('IN (...)', sql))
+
+
+def _origin():
+    """file:line of the innermost app frame outside this module"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR) and filename != __file__:
+            return f'{os.path.relpath(filename, os.path.dirname(_APP_DIR))}:{frame.f_lineno}'
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder:
+    """connection.execute_wrapper() callable collecting timings per query shape"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            shape = query_shape(sql)
+            self.shapes[shape] += 1
+            if shape not in self.origins:
+                self.origins[shape] = _origin()
+
+    def n_plus_one(self, threshold):
+        """Shapes run at least threshold times, most repeated first"""
+        return [
+            {'shape': shape, 'count': count, 'origin': self.origins.get(shape)}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+class ProfileStore:
+    """Rolling per-view request profiles in a local SQLite file"""
+
+    def __init__(self, path, keep=500):
+        self.path = str(path)
+        self.keep = keep
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def record(self, view, path, duration_ms, query_count, sql_ms, n_plus_one):
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT INTO request_profile (view, path, recorded, duration_ms, query_count, sql_ms, n_plus_one) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (view, path, time.time(), duration_ms, query_count, sql_ms, json.dumps(n_plus_one)),
+            )
+            connection.execute(
+                'DELETE FROM request_profile WHERE view = ? AND id <= '
+                '(SELECT id FROM request_profile WHERE view = ? ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                (view, view, self.keep),
+            )
+
+    def report(self):
+        """Per-view summaries, slowest (by p95 duration) first"""
+        rows = self._connection().execute(
+            'SELECT view, duration_ms, query_count, sql_ms, n_plus_one FROM request_profile ORDER BY view, id'
+        ).fetchall()
+
+        views = {}
+        for view, duration_ms, query_count, sql_ms, n_plus_one in rows:
+            entry = views.setdefault(view, {
+                'view': view, 'durations': [], 'queries': [], 'sql_ms': [], 'n_plus_one_requests': 0, 'shapes': {},
+            })
+            entry['durations'].append(duration_ms)
+            entry['queries'].append(query_count)
+            entry['sql_ms'].append(sql_ms)
+            patterns = json.loads(n_plus_one)
+            if patterns:
+                entry['n_plus_one_requests'] += 1
+            for pattern in patterns:
+                shape = entry['shapes'].setdefault(pattern['shape'], {**pattern, 'requests': 0})
+                shape['requests'] += 1
+                shape['count'] = max(shape['count'], pattern['count'])
+
+        report = []
+        for entry in views.values():
+            durations = sorted(entry['durations'])
+            n = len(durations)
+            report.append({
+                'view': entry['view'],
+                'requests': n,
+                'avg_ms': sum(durations) / n,
+                'p95_ms': durations[min(n - 1, -(-n * 95 // 100) - 1)],
+                'max_ms': durations[-1],
+                'avg_queries': sum(entry['queries']) / n,
+                'max_queries': max(entry['queries']),
+                'avg_sql_ms': sum(entry['sql_ms']) / n,
+                'n_plus_one_requests': entry['n_plus_one_requests'],
+                'n_plus_one': sorted(entry['shapes'].values(), key=lambda s: -s['count']),
+            })
+        return sorted(report, key=lambda entry: -entry['p95_ms'])
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM request_profile')
+
+
+_store = None
+
+
+def profile_store():
+    """The ProfileStore at settings.BIOBURDEN_QUERY_PROFILE_PATH"""
+    global _store
+    if _store is None:
+        _store = ProfileStore(
+            getattr(settings, 'BIOBURDEN_QUERY_PROFILE_PATH', 'query_profile.sqlite3'),
+            keep=getattr(settings, 'BIOBURDEN_QUERY_PROFILE_KEEP', 500),
+        )
+    return _store
+
+
+class QueryProfilingMiddleware:
+    """Record queries per request and flag N+1 patterns (opt-in)"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'BIOBURDEN_QUERY_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'BIOBURDEN_N_PLUS_ONE_THRESHOLD', 10)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        # Unresolved URLs and the report page itself are not profiled
+        match = request.resolver_match
+        if match is None or match.view_name == 'bioburden:query_profile':
+            return response
+
+        sql_ms = recorder.seconds * 1000
+        n_plus_one = recorder.n_plus_one(self.threshold)
+        for pattern in n_plus_one:
+            logger.warning(
+                'Possible N+1 in %s: %d x %s (from %s)',
+                match.view_name, pattern['count'], pattern['shape'], pattern['origin'] or 'unknown',
+            )
+        profile_store().record(
+            match.view_name, request.path, duration_ms, recorder.count, sql_ms, n_plus_one
+        )
+
+        response['X-Query-Count'] = str(recorder.count)
+        response['X-SQL-Time-Ms'] = f'{sql_ms:.1f}'
+        return response
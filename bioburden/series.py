@@ -0,0 +1,102 @@
+"""
+Compact encodings of chart series.
+
+Both encoders take snapshot row indices (already filtered, date ordered and
+downsampled) and build their output straight from the column arrays, with
+lots and areas as indices into small per-response dictionaries.
+
+columnar_payload() returns parallel JSON arrays. binary_payload() returns
+typed-array friendly bytes:
+
+    4 bytes   magic b'BBCS'
+    4 bytes   header length (little-endian uint32)
+    n bytes   UTF-8 JSON header (metadata, dictionaries, column table)
+    ...       zero padding up to the data start (8 + n rounded up to a
+              multiple of 8), then each column as little-endian values,
+              padded to 8 bytes so every column can be viewed in place,
+              e.g. new Float64Array(buffer, dataStart + offset, length)
+
+Column offsets in the header are relative to the data start. Dates are
+int32 days since 1970-01-01 in the binary format and ISO strings in the
+columnar one.
+"""
+import json
+import struct
+from datetime import date
+
+import numpy as np
+
+from .thresholds import STATUS_NAMES
+
+
+FORMATS = ('rows', 'columnar', 'binary')
+BINARY_MAGIC = b'BBCS'
+BINARY_CONTENT_TYPE = 'application/vnd.bioburden.series'
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _align8(n):
+    return -(-n // 8) * 8
+
+
+def _dictionary(codes, labels):
+    """Re-encode snapshot codes against only the labels that occur"""
+    used, index = np.unique(codes, return_inverse=True)
+    return [labels[code] for code in used.tolist()], index.astype(np.int32)
+
+
+def _columns(snapshot, rows):
+    lots, lot_index = _dictionary(snapshot['lot_code'][rows], snapshot.lot_numbers)
+    areas, area_index = _dictionary(snapshot['area_code'][rows], snapshot.area_names)
+    columns = {
+        'date': (snapshot['date_ordinal'][rows] - _EPOCH_ORDINAL).astype('<i4'),
+        'value': snapshot['value'][rows].astype('<f8'),
+        'status': snapshot['status_code'][rows].astype('u1'),
+        'lot': lot_index.astype('<i4'),
+        'area': area_index.astype('<i4'),
+    }
+    return lots, areas, columns
+
+
+def columnar_payload(snapshot, rows, meta):
+    """Parallel arrays for dates, values, status codes and lot/area indices"""
+    lots, areas, columns = _columns(snapshot, rows)
+    dates = np.datetime_as_string(columns.pop('date').astype('datetime64[D]'))
+    return {
+        'format': 'columnar',
+        **meta,
+        'statuses': list(STATUS_NAMES),
+        'lots': lots,
+        'areas': areas,
+        'columns': {
+            'date': dates.tolist(),
+            **{name: column.tolist() for name, column in columns.items()},
+        },
+    }
+
+
+def binary_payload(snapshot, rows, meta):
+    """Header plus little-endian column buffers (see module docstring)"""
+    lots, areas, columns = _columns(snapshot, rows)
+
+    header = {
+        'format': 'binary',
+        **meta,
+        'date_unit': 'days since 1970-01-01',
+        'statuses': list(STATUS_NAMES),
+        'lots': lots,
+        'areas': areas,
+        'columns': [],
+    }
+    offset = 0
+    for name, column in columns.items():
+        header['columns'].append({'name': name, 'dtype': column.dtype.str, 'offset': offset, 'length': len(column)})
+        offset += _align8(column.nbytes)
+    body = json.dumps(header, separators=(',', ':')).encode()
+
+    parts = [BINARY_MAGIC, struct.pack('<I', len(body)), body, b'\0' * (_align8(8 + len(body)) - 8 - len(body))]
+    for column in columns.values():
+        parts.append(column.tobytes())
+        parts.append(b'\0' * (_align8(column.nbytes) - column.nbytes))
+    return b''.join(parts)
@@ -0,0 +1,26 @@
+"""
+Keep DataVersion in step with writes made through the ORM.
+
+Single-object saves and deletes arrive here; bulk QuerySet.update() and
+delete() on tests bump the version themselves (see BioburdenDataQuerySet),
+and bulk_create() callers bump explicitly.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Area, BioburdenData, DataVersion, FixedThreshold, Lot, LotOrganism, Organism
+
+
+@receiver(post_save, sender=BioburdenData)
+@receiver(post_save, sender=Lot)
+@receiver(post_save, sender=Area)
+@receiver(post_save, sender=FixedThreshold)
+@receiver(post_save, sender=Organism)
+@receiver(post_save, sender=LotOrganism)
+@receiver(post_delete, sender=Lot)
+@receiver(post_delete, sender=Area)
+@receiver(post_delete, sender=FixedThreshold)
+@receiver(post_delete, sender=Organism)
+@receiver(post_delete, sender=LotOrganism)
+def bump_data_version(sender, **kwargs):
+    DataVersion.bump()
@@ -0,0 +1,120 @@
+"""
+Threshold what-if simulation.
+
+Evaluates candidate alert/action levels against the whole test history held
+in memory as NumPy arrays and reports which tests would change status.
+Nothing is written to the database.
+"""
+import numpy as np
+
+from .models import Area, Lot
+from .snapshot import get_snapshot
+from .thresholds import STATUS_NAMES, ThresholdIndex
+
+
+def load_history():
+    """Return the test history as typed arrays from the in-memory snapshot"""
+    snapshot = get_snapshot()
+    return {
+        'id': snapshot['id'],
+        'lot_id': snapshot.lot_id,
+        'area_id': snapshot.area_id,
+        'date_ordinal': snapshot['date_ordinal'],
+        'value': snapshot['value'],
+        'status_code': snapshot['status_code'],
+    }
+
+
+def _status_counts(codes):
+    counts = np.bincount(codes, minlength=len(STATUS_NAMES))
+    return {name: int(counts[code]) for code, name in enumerate(STATUS_NAMES)}
+
+
+def simulate_thresholds(rules, history=None, max_lots=50):
+    """Evaluate candidate threshold rules against the test history
+
+    Each rule is a dict with alert_level, action_level and optional lot, area,
+    effective_from and effective_to (same scoping as FixedThreshold). Tests
+    covered by a rule are reclassified with it; all other tests keep their
+    current status.
+    """
+    if history is None:
+        history = load_history()
+
+    index = ThresholdIndex([
+        (
+            rule.get('lot'),
+            rule.get('area'),
+            rule.get('effective_from'),
+            rule.get('effective_to'),
+            rule['alert_level'],
+            rule['action_level'],
+        )
+        for rule in rules
+    ])
+
+    before = history['status_code']
+    after = index.classify(history['lot_id'], history['area_id'], history['date_ordinal'], history['value'])
+    covered = after >= 0
+    after = np.where(covered, after, before).astype(np.int8)
+    flipped = after != before
+    escalated = after > before
+
+    # 3x3 transition matrix: rows = current status, columns = simulated status
+    n_status = len(STATUS_NAMES)
+    transitions = np.bincount(
+        before[flipped].astype(np.int64) * n_status + after[flipped],
+        minlength=n_status * n_status,
+    ).reshape(n_status, n_status)
+
+    # Per-area breakdown
+    area_names = dict(Area.objects.values_list('id', 'name'))
+    area_ids, area_pos = np.unique(history['area_id'], return_inverse=True)
+    area_flips = np.bincount(area_pos, weights=flipped, minlength=len(area_ids))
+    area_before = np.bincount(area_pos * n_status + before, minlength=len(area_ids) * n_status).reshape(-1, n_status)
+    area_after = np.bincount(area_pos * n_status + after, minlength=len(area_ids) * n_status).reshape(-1, n_status)
+    by_area = [
+        {
+            'area_id': int(area_id),
+            'area': area_names.get(int(area_id), str(area_id)),
+            'flips': int(area_flips[i]),
+            'before': {name: int(area_before[i, code]) for code, name in enumerate(STATUS_NAMES)},
+            'after': {name: int(area_after[i, code]) for code, name in enumerate(STATUS_NAMES)},
+        }
+        for i, area_id in enumerate(area_ids)
+    ]
+    by_area.sort(key=lambda x: x['flips'], reverse=True)
+
+    # Lots with at least one flip
+    lot_ids, lot_pos = np.unique(history['lot_id'][flipped], return_inverse=True)
+    lot_flips = np.bincount(lot_pos, minlength=len(lot_ids))
+    lot_escalations = np.bincount(lot_pos, weights=escalated[flipped], minlength=len(lot_ids))
+    top = np.argsort(-lot_flips, kind='stable')[:max_lots]
+    lot_numbers = dict(Lot.objects.filter(id__in=lot_ids[top].tolist()).values_list('id', 'lot_number'))
+    affected_lots = [
+        {
+            'lot_id': int(lot_ids[i]),
+            'lot': lot_numbers.get(int(lot_ids[i]), str(lot_ids[i])),
+            'flips': int(lot_flips[i]),
+            'escalations': int(lot_escalations[i]),
+            'deescalations': int(lot_flips[i] - lot_escalations[i]),
+        }
+        for i in top
+    ]
+
+    return {
+        'total_tests': int(len(before)),
+        'covered_tests': int(covered.sum()),
+        'flips': int(flipped.sum()),
+        'escalations': int(escalated.sum()),
+        'deescalations': int((flipped & ~escalated).sum()),
+        'transitions': {
+            f'{STATUS_NAMES[i]}->{STATUS_NAMES[j]}': int(transitions[i, j])
+            for i in range(n_status) for j in range(n_status) if i != j
+        },
+        'status_before': _status_counts(before),
+        'status_after': _status_counts(after),
+        'by_area': by_area,
+        'affected_lot_count': int(len(lot_ids)),
+        'affected_lots': affected_lots,
+    }
@@ -0,0 +1,379 @@
+"""
+In-memory columnar snapshot of the bioburden test table.
+
+The analysis views group and filter the same few columns on every request.
+DataSnapshot keeps those columns as NumPy arrays (lots and areas dictionary
+encoded) and get_snapshot() hands out the current one, checking DataVersion
+on each call. When the version moves on, only rows whose updated_at changed
+since the last load are fetched and merged in; deletions fall back to a
+full reload.
+
+With settings.BIOBURDEN_SNAPSHOT_SHARED enabled, the first process to load a
+version publishes it in a shared memory segment and other worker processes
+map it read-only instead of querying the table themselves.
+"""
+import hashlib
+import json
+import struct
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import Area, BioburdenData, DataVersion, Lot
+
+
+# Stored columns and their dtypes; rows are kept sorted by id
+COLUMNS = (
+    ('id', np.int64),
+    ('lot_code', np.int32),
+    ('area_code', np.int32),
+    ('date_ordinal', np.int32),
+    ('value', np.float64),
+    ('status_code', np.int8),
+    ('organism_type_code', np.int8),
+)
+
+ORGANISM_TYPES = tuple(value for value, _ in BioburdenData.ORGANISM_TYPE_CHOICES)
+N_STATUS = len(BioburdenData.STATUS_CHOICES)
+
+# Rows written shortly before the previous load are fetched again on refresh
+# so commits that were still in flight are not missed
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+class DataSnapshot:
+    """Read-only column arrays for every test at one data version"""
+
+    def __init__(self, columns, lot_ids, area_ids, lot_numbers, area_names, version, loaded_at, shm=None):
+        self.columns = columns
+        self.lot_ids = lot_ids
+        self.area_ids = area_ids
+        self.lot_numbers = lot_numbers
+        self.area_names = area_names
+        self.version = version
+        self.loaded_at = loaded_at
+        self._shm = shm
+        for array in (*columns.values(), lot_ids, area_ids):
+            array.flags.writeable = False
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def lot_id(self):
+        return self.lot_ids[self.columns['lot_code']]
+
+    @property
+    def area_id(self):
+        return self.area_ids[self.columns['area_code']]
+
+    @classmethod
+    def from_arrays(cls, arrays, version, loaded_at):
+        """Build a snapshot from BioburdenDataQuerySet.analytics_arrays() output"""
+        order = np.argsort(arrays['id'], kind='stable')
+        lot_ids, lot_code = np.unique(arrays['lot_id'][order], return_inverse=True)
+        area_ids, area_code = np.unique(arrays['area_id'][order], return_inverse=True)
+
+        lot_labels = dict(Lot.objects.filter(id__in=lot_ids.tolist()).values_list('id', 'lot_number'))
+        area_labels = dict(Area.objects.filter(id__in=area_ids.tolist()).values_list('id', 'name'))
+
+        columns = {
+            'id': arrays['id'][order],
+            'lot_code': lot_code,
+            'area_code': area_code,
+            'date_ordinal': arrays['date_ordinal'][order],
+            'value': arrays['value'][order],
+            'status_code': arrays['status_code'][order],
+            'organism_type_code': arrays['organism_type_code'][order],
+        }
+        columns = {name: np.ascontiguousarray(columns[name], dtype=dtype) for name, dtype in COLUMNS}
+        return cls(
+            columns,
+            lot_ids.astype(np.int64),
+            area_ids.astype(np.int64),
+            [lot_labels.get(int(i), str(i)) for i in lot_ids],
+            [area_labels.get(int(i), str(i)) for i in area_ids],
+            version,
+            loaded_at,
+        )
+
+    @classmethod
+    def load(cls, version):
+        """Read the whole table"""
+        loaded_at = timezone.now()
+        return cls.from_arrays(BioburdenData.objects.analytics_arrays(), version, loaded_at)
+
+    def refreshed(self, version):
+        """Return a new snapshot with rows changed since this one merged in
+
+        Returns None when rows were deleted, in which case the caller should
+        do a full load.
+        """
+        loaded_at = timezone.now()
+        changed = BioburdenData.objects.filter(
+            updated_at__gte=self.loaded_at - REFRESH_OVERLAP
+        ).analytics_arrays()
+        totals = BioburdenData.objects.aggregate(count=Count('id'), id_sum=Sum('id'))
+
+        ids = self.columns['id']
+        pos = np.searchsorted(ids, changed['id'])
+        existing = np.zeros(len(pos), dtype=bool)
+        if len(ids):
+            existing = ids[np.minimum(pos, len(ids) - 1)] == changed['id']
+        new_ids = changed['id'][~existing]
+
+        # Row count and id sum together catch deletes, even when offset by inserts
+        if (len(ids) + len(new_ids) != totals['count']
+                or int(ids.sum()) + int(new_ids.sum()) != (totals['id_sum'] or 0)):
+            return None
+
+        arrays = {
+            'id': ids,
+            'lot_id': self.lot_id,
+            'area_id': self.area_id,
+            'date_ordinal': self.columns['date_ordinal'],
+            'value': self.columns['value'],
+            'status_code': self.columns['status_code'],
+            'organism_type_code': self.columns['organism_type_code'],
+        }
+        merged = {}
+        for name, column in arrays.items():
+            column = column.astype(changed[name].dtype)
+            column[pos[existing]] = changed[name][existing]
+            merged[name] = np.concatenate([column, changed[name][~existing]])
+        return self.from_arrays(merged, version, loaded_at)
+
+    def mask(self, lot_id=None, area_id=None, organism_type=None):
+        """Boolean row filter; ids that do not occur match nothing"""
+        mask = np.ones(len(self), dtype=bool)
+        for ids, codes, wanted in (
+            (self.lot_ids, self.columns['lot_code'], lot_id),
+            (self.area_ids, self.columns['area_code'], area_id),
+        ):
+            if wanted is None:
+                continue
+            pos = np.searchsorted(ids, int(wanted))
+            if pos >= len(ids) or ids[pos] != int(wanted):
+                return np.zeros(len(self), dtype=bool)
+            mask &= codes == pos
+        if organism_type is not None:
+            code = ORGANISM_TYPES.index(organism_type) if organism_type in ORGANISM_TYPES else -2
+            mask &= self.columns['organism_type_code'] == code
+        return mask
+
+    # Shared memory layout: 8-byte header length (written last, so 0 means
+    # "still being written"), JSON header, then 64-byte aligned arrays
+
+    def _array_items(self):
+        return [*self.columns.items(), ('lot_ids', self.lot_ids), ('area_ids', self.area_ids)]
+
+    def publish(self, name):
+        """Copy this snapshot into a new shared memory segment"""
+        header = {
+            'version': self.version,
+            'loaded_at': self.loaded_at.isoformat(),
+            'lot_numbers': self.lot_numbers,
+            'area_names': self.area_names,
+            'arrays': [],
+        }
+        offset = 0
+        for array_name, array in self._array_items():
+            header['arrays'].append([array_name, array.dtype.str, offset, len(array)])
+            offset += _align(array.nbytes)
+        body = json.dumps(header).encode()
+        data_start = _align(8 + len(body))
+
+        shm = _open_segment(name, create=True, size=max(data_start + offset, 1))
+        buf = shm.buf
+        buf[8:8 + len(body)] = body
+        for (array_name, array), (_, _, array_offset, _) in zip(self._array_items(), header['arrays']):
+            start = data_start + array_offset
+            buf[start:start + array.nbytes] = array.tobytes()
+        buf[0:8] = struct.pack('<Q', len(body))
+        shm.close()
+
+    @classmethod
+    def attach(cls, name):
+        """Map a published snapshot read-only, or return None if unavailable"""
+        try:
+            shm = _open_segment(name)
+        except FileNotFoundError:
+            return None
+        (length,) = struct.unpack('<Q', bytes(shm.buf[0:8]))
+        if length == 0:
+            shm.close()
+            return None
+        header = json.loads(bytes(shm.buf[8:8 + length]))
+        data_start = _align(8 + length)
+
+        arrays = {}
+        for array_name, dtype, offset, count in header['arrays']:
+            arrays[array_name] = np.frombuffer(shm.buf, dtype=dtype, count=count, offset=data_start + offset)
+        lot_ids = arrays.pop('lot_ids')
+        area_ids = arrays.pop('area_ids')
+        return cls(
+            arrays, lot_ids, area_ids,
+            header['lot_numbers'], header['area_names'],
+            header['version'], datetime.fromisoformat(header['loaded_at']),
+            shm=shm,
+        )
+
+    def __del__(self):
+        # Drop the array views before unmapping the segment they point into
+        if self._shm is not None:
+            self.columns = {}
+            self.lot_ids = self.area_ids = None
+            _close_segment(self._shm)
+
+
+def _align(n, to=64):
+    return (n + to - 1) // to * to
+
+
+def _open_segment(name, create=False, size=0):
+    """Open a shared memory segment without handing it to the resource tracker
+
+    Snapshots outlive the process that published them, so the tracker must
+    not unlink them when that process exits.
+    """
+    from multiprocessing import resource_tracker, shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:
+        # Python < 3.13 has no track argument
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        shm._untracked = True
+        return shm
+
+
+def _segment_name(version):
+    database = settings.DATABASES['default']
+    digest = hashlib.sha1(f"{database['ENGINE']}:{database['NAME']}".encode()).hexdigest()[:8]
+    return f'bioburden_{digest}_{version}'
+
+
+def _unlink_segment(name):
+    try:
+        shm = _open_segment(name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    if getattr(shm, '_untracked', False):
+        # unlink() unregisters the segment again on Python < 3.13
+        from multiprocessing import resource_tracker
+        resource_tracker.register(shm._name, 'shared_memory')
+    shm.unlink()
+
+
+_unclosed = []
+
+
+def _close_segment(shm):
+    """Close a mapping, retrying later while slices of it are still in use"""
+    _unclosed.append(shm)
+    for pending in list(_unclosed):
+        try:
+            pending.close()
+        except BufferError:
+            continue
+        _unclosed.remove(pending)
+
+
+_lock = threading.Lock()
+_current = None
+
+
+def get_snapshot():
+    """Return a snapshot matching the current data version"""
+    global _current
+
+    version = DataVersion.current()
+    snapshot = _current
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _lock:
+        previous = _current
+        if previous is not None and previous.version == version:
+            return previous
+
+        shared = getattr(settings, 'BIOBURDEN_SNAPSHOT_SHARED', False)
+        snapshot = DataSnapshot.attach(_segment_name(version)) if shared else None
+        if snapshot is None:
+            if previous is not None and len(previous):
+                snapshot = previous.refreshed(version)
+            if snapshot is None:
+                snapshot = DataSnapshot.load(version)
+            if shared:
+                try:
+                    snapshot.publish(_segment_name(version))
+                except FileExistsError:
+                    pass  # another worker is publishing the same version
+                if previous is not None:
+                    _unlink_segment(_segment_name(previous.version))
+
+        _current = snapshot
+    return snapshot
+
+
+def group_stats(codes, n_groups, values, status_codes=None, outlier_z=2.0):
+    """Per-group descriptive statistics in one vectorized pass
+
+    codes are group numbers in [0, n_groups). Returns a dict of arrays of
+    length n_groups: count, mean, std (population), min, max, median, p25,
+    p75 (linear interpolation, as np.percentile), outliers (|z| > outlier_z
+    within the group) and, when status_codes is given, status (n_groups x
+    number of statuses). Groups without rows get NaN statistics.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+
+    count = np.bincount(codes, minlength=n_groups)
+    has_rows = count > 0
+    safe_count = np.maximum(count, 1)
+
+    mean = np.bincount(codes, weights=values, minlength=n_groups) / safe_count
+    deviation = values - mean[codes]
+    std = np.sqrt(np.bincount(codes, weights=deviation ** 2, minlength=n_groups) / safe_count)
+    outlier = (std[codes] > 0) & (np.abs(deviation) > outlier_z * std[codes])
+    outliers = np.bincount(codes, weights=outlier, minlength=n_groups).astype(np.int64)
+
+    # Sort by (group, value) so every group is a contiguous sorted run
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    starts = np.concatenate([[0], np.cumsum(count)[:-1]])
+
+    def percentile(q):
+        h = (safe_count - 1) * q
+        lower = np.floor(h).astype(np.int64)
+        upper = np.minimum(lower + 1, safe_count - 1)
+        a = sorted_values[np.minimum(starts + lower, len(values) - 1)] if len(values) else np.zeros(n_groups)
+        b = sorted_values[np.minimum(starts + upper, len(values) - 1)] if len(values) else np.zeros(n_groups)
+        return np.where(has_rows, a + (b - a) * (h - lower), np.nan)
+
+    result = {
+        'count': count,
+        'mean': np.where(has_rows, mean, np.nan),
+        'std': np.where(has_rows, std, np.nan),
+        'min': percentile(0.0),
+        'max': percentile(1.0),
+        'median': percentile(0.5),
+        'p25': percentile(0.25),
+        'p75': percentile(0.75),
+        'outliers': outliers,
+    }
+    if status_codes is not None:
+        status_codes = np.asarray(status_codes, dtype=np.int64)
+        result['status'] = np.bincount(
+            codes * N_STATUS + status_codes, minlength=n_groups * N_STATUS
+        ).reshape(n_groups, N_STATUS)
+    return result
@@ -0,0 +1,169 @@
+import os
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+
+from .lazy import lazy_module
+from .models import BioburdenData
+from .utils import ExcelImporter
+
+openpyxl = lazy_module('openpyxl')
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Migrate back to migrate_from, let setUpBeforeMigration() add rows, then migrate forward"""
+
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('bioburden', self.migrate_from)])
+        old_apps = executor.loader.project_state([('bioburden', self.migrate_from)]).apps
+        self.setUpBeforeMigration(old_apps)
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('bioburden', self.migrate_to)])
+        self.apps = executor.loader.project_state([('bioburden', self.migrate_to)]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def setUpBeforeMigration(self, apps):
+        pass
+
+
+class StampedLotThresholdMigrationTests(MigrationTestCase):
+    """An upgraded database with per-lot levels stamped by the old ALERT_ACTION LEVELS import"""
+
+    migrate_from = '0015_bioburdendata_natural_key'
+    migrate_to = '0016_globalize_stamped_lot_thresholds'
+
+    def setUpBeforeMigration(self, apps):
+        Lot = apps.get_model('bioburden', 'Lot')
+        Area = apps.get_model('bioburden', 'Area')
+        FixedThreshold = apps.get_model('bioburden', 'FixedThreshold')
+        BioburdenData = apps.get_model('bioburden', 'BioburdenData')
+
+        area = Area.objects.create(name='Clean Room A')
+        lots = [Lot.objects.create(lot_number=f'LOT-{i}') for i in range(3)]
+        for lot in lots:
+            FixedThreshold.objects.create(lot=lot, alert_level=Decimal('100'), action_level=Decimal('200'))
+        # Effective-dated periods imported after the upgrade
+        FixedThreshold.objects.create(
+            effective_to=date(2024, 12, 31), alert_level=Decimal('10'), action_level=Decimal('20'),
+        )
+        FixedThreshold.objects.create(
+            effective_from=date(2025, 1, 1), alert_level=Decimal('50'), action_level=Decimal('80'),
+        )
+        for test_date, sample_id in ((date(2024, 6, 1), 'S1'), (date(2025, 6, 1), 'S2')):
+            BioburdenData.objects.create(
+                lot=lots[0], area=area, test_date=test_date, sample_id=sample_id,
+                cfu_count=Decimal('30'), dilution_factor=Decimal('1'), value=30.0, status='normal',
+            )
+
+    def test_stamped_rows_give_way_to_global_periods(self):
+        FixedThreshold = self.apps.get_model('bioburden', 'FixedThreshold')
+        BioburdenData = self.apps.get_model('bioburden', 'BioburdenData')
+
+        self.assertFalse(FixedThreshold.objects.filter(lot__isnull=False).exists())
+        self.assertEqual(FixedThreshold.objects.count(), 2)
+        self.assertEqual(
+            dict(BioburdenData.objects.values_list('sample_id', 'status')),
+            {'S1': 'action', 'S2': 'normal'},
+        )
+
+
+class StampedLotThresholdWithoutPeriodsMigrationTests(MigrationTestCase):
+    """Stamped per-lot levels and no global threshold: the levels become the global one"""
+
+    migrate_from = '0015_bioburdendata_natural_key'
+    migrate_to = '0016_globalize_stamped_lot_thresholds'
+
+    def setUpBeforeMigration(self, apps):
+        Lot = apps.get_model('bioburden', 'Lot')
+        FixedThreshold = apps.get_model('bioburden', 'FixedThreshold')
+        for i in range(3):
+            lot = Lot.objects.create(lot_number=f'LOT-{i}')
+            FixedThreshold.objects.create(lot=lot, alert_level=Decimal('100'), action_level=Decimal('200'))
+
+    def test_stamped_levels_become_global(self):
+        FixedThreshold = self.apps.get_model('bioburden', 'FixedThreshold')
+        self.assertEqual(
+            list(FixedThreshold.objects.values_list('lot_id', 'area_id', 'alert_level', 'action_level')),
+            [(None, None, Decimal('100.00'), Decimal('200.00'))],
+        )
+
+
+class NaturalKeyDuplicatesMigrationTests(MigrationTestCase):
+    """Tests repeating the natural key, as the old per-sample import wrote them"""
+
+    migrate_from = '0014_dataversion_token'
+    migrate_to = '0015_bioburdendata_natural_key'
+
+    def setUpBeforeMigration(self, apps):
+        Lot = apps.get_model('bioburden', 'Lot')
+        Area = apps.get_model('bioburden', 'Area')
+        BioburdenData = apps.get_model('bioburden', 'BioburdenData')
+
+        lot = Lot.objects.create(lot_number='LOT-1')
+        area = Area.objects.create(name='Clean Room A')
+        for cfu_count in ('12', '30', '12', '7'):
+            BioburdenData.objects.create(
+                lot=lot, area=area, test_date=date(2024, 6, 1), sample_id='AEROBES-S1',
+                cfu_count=Decimal(cfu_count), dilution_factor=Decimal('1'),
+            )
+        # Already taken by another test of the same day
+        BioburdenData.objects.create(
+            lot=lot, area=area, test_date=date(2024, 6, 1), sample_id='AEROBES-S1-2',
+            cfu_count=Decimal('1'), dilution_factor=Decimal('1'),
+        )
+
+    def test_copies_are_dropped_and_distinct_tests_renumbered(self):
+        BioburdenData = self.apps.get_model('bioburden', 'BioburdenData')
+        self.assertEqual(
+            list(BioburdenData.objects.order_by('id').values_list('sample_id', 'cfu_count')),
+            [
+                ('AEROBES-S1', Decimal('12.00')),
+                ('AEROBES-S1-3', Decimal('30.00')),
+                ('AEROBES-S1-4', Decimal('7.00')),
+                ('AEROBES-S1-2', Decimal('1.00')),
+            ],
+        )
+
+
+class RawDataImportTests(TestCase):
+    def import_rows(self, rows):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = 'RAW DATA'
+        sheet.append(['LOT VECTOR', 'AREA TESTED', 'DATE', 'CORRECTION FACTOR', 'VALIDATION', 'PROVIDER',
+                      'CFU AEROBES S1', 'CFU AEROBES S2'])
+        for row in rows:
+            sheet.append(row)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'raw.xlsx')
+            workbook.save(path)
+            importer = ExcelImporter(path)
+            self.assertTrue(importer.import_raw_data())
+        return importer
+
+    def test_two_tests_of_one_lot_and_area_on_the_same_day(self):
+        importer = self.import_rows([
+            ['LOT-1', 'Clean Room A', datetime(2025, 3, 4), 1, 'NO', 'Lab', 10, 12],
+            ['LOT-1', 'Clean Room A', datetime(2025, 3, 4), 1, 'NO', 'Lab', 40, 44],
+        ])
+        self.assertEqual(importer.errors, [])
+        self.assertEqual(
+            list(BioburdenData.objects.order_by('id').values_list('sample_id', 'cfu_count')),
+            [
+                ('AEROBES-20250304-LOT-1', Decimal('11.00')),
+                ('AEROBES-20250304-LOT-1-2', Decimal('42.00')),
+            ],
+        )
@@ -0,0 +1,210 @@
+"""
+Effective-dated, area-aware threshold resolution.
+
+FixedThreshold rows can be scoped to a lot, an area, both or neither, and each
+carries an optional validity period. BioburdenData.save() resolves a single
+test with FixedThreshold.resolve(); this module does the same for whole arrays
+of tests at once so historical data can be reclassified in one pass.
+"""
+from datetime import date
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BioburdenData, DataVersion, FixedThreshold
+
+
+# Status codes used by the vectorized paths (index into STATUS_CHOICES)
+STATUS_NAMES = tuple(status for status, _ in BioburdenData.STATUS_CHOICES)
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+NO_THRESHOLD = -1
+
+# Open-ended periods are mapped onto ordinals outside any real test date
+_OPEN_START = 0
+_OPEN_END = date.max.toordinal()
+_DATE_SPAN = _OPEN_END + 1
+
+
+def _scope_key(lot_ids, area_ids):
+    """Pack (lot_id, area_id) pairs into one int64 key (0 = any)"""
+    return (np.asarray(lot_ids, dtype=np.int64) << 32) | np.asarray(area_ids, dtype=np.int64)
+
+
+class _ScopeIndex:
+    """Sorted interval table for one scope level, e.g. lot+area or lot only"""
+
+    def __init__(self, keys, starts, ends, alert, action):
+        self.keys = np.unique(keys)
+        key_pos = np.searchsorted(self.keys, keys)
+
+        # Intervals sorted by (scope key, start date) as one composite integer
+        composite = key_pos * _DATE_SPAN + starts
+        order = np.argsort(composite, kind='stable')
+        self.composite = composite[order]
+        self.key_pos = key_pos[order]
+        self.ends = ends[order]
+        self.alert = alert[order]
+        self.action = action[order]
+
+    def lookup(self, query_keys, date_ordinals):
+        """Return (interval position, matched mask) for each query"""
+        n = len(query_keys)
+        if len(self.keys) == 0:
+            return np.zeros(n, dtype=np.int64), np.zeros(n, dtype=bool)
+
+        pos = np.searchsorted(self.keys, query_keys)
+        pos_clipped = np.minimum(pos, len(self.keys) - 1)
+        key_found = self.keys[pos_clipped] == query_keys
+
+        # Latest interval of the same scope that started on or before the date
+        idx = np.searchsorted(self.composite, pos_clipped * _DATE_SPAN + date_ordinals, side='right') - 1
+        idx_clipped = np.maximum(idx, 0)
+        matched = (
+            key_found
+            & (idx >= 0)
+            & (self.key_pos[idx_clipped] == pos_clipped)
+            & (self.ends[idx_clipped] >= date_ordinals)
+        )
+        return idx_clipped, matched
+
+
+class ThresholdIndex:
+    """Precomputed interval index over all fixed thresholds
+
+    Scopes are tried from most to least specific; within a scope the period
+    covering the test date applies (FixedThreshold.clean() keeps periods of
+    one scope from overlapping).
+    """
+
+    # (uses lot, uses area), most specific first
+    SCOPES = ((True, True), (True, False), (False, True), (False, False))
+
+    def __init__(self, rows):
+        rows = list(rows)
+        lot = np.array([r[0] or 0 for r in rows], dtype=np.int64)
+        area = np.array([r[1] or 0 for r in rows], dtype=np.int64)
+        starts = np.array([r[2].toordinal() if r[2] else _OPEN_START for r in rows], dtype=np.int64)
+        ends = np.array([r[3].toordinal() if r[3] else _OPEN_END for r in rows], dtype=np.int64)
+        alert = np.array([float(r[4]) for r in rows], dtype=np.float64)
+        action = np.array([float(r[5]) for r in rows], dtype=np.float64)
+
+        self.scopes = []
+        for uses_lot, uses_area in self.SCOPES:
+            mask = ((lot != 0) == uses_lot) & ((area != 0) == uses_area)
+            self.scopes.append((
+                uses_lot,
+                uses_area,
+                _ScopeIndex(_scope_key(lot[mask], area[mask]), starts[mask], ends[mask], alert[mask], action[mask]),
+            ))
+
+    @classmethod
+    def load(cls):
+        """Build the index from the FixedThreshold table"""
+        return cls(FixedThreshold.objects.values_list(
+            'lot_id', 'area_id', 'effective_from', 'effective_to', 'alert_level', 'action_level'
+        ))
+
+    def lookup(self, lot_ids, area_ids, date_ordinals):
+        """Return alert and action level arrays (NaN where no threshold applies)"""
+        lot_ids = np.asarray(lot_ids, dtype=np.int64)
+        area_ids = np.asarray(area_ids, dtype=np.int64)
+        date_ordinals = np.asarray(date_ordinals, dtype=np.int64)
+        zeros = np.zeros_like(lot_ids)
+
+        alert = np.full(len(lot_ids), np.nan)
+        action = np.full(len(lot_ids), np.nan)
+        unresolved = np.ones(len(lot_ids), dtype=bool)
+
+        for uses_lot, uses_area, scope in self.scopes:
+            if not unresolved.any():
+                break
+            keys = _scope_key(lot_ids if uses_lot else zeros, area_ids if uses_area else zeros)
+            idx, matched = scope.lookup(keys, date_ordinals)
+            hit = unresolved & matched
+            alert[hit] = scope.alert[idx[hit]]
+            action[hit] = scope.action[idx[hit]]
+            unresolved &= ~hit
+
+        return alert, action
+
+    def classify(self, lot_ids, area_ids, date_ordinals, values):
+        """Return status codes per test (NO_THRESHOLD where none applies)"""
+        values = np.asarray(values, dtype=np.float64)
+        alert, action = self.lookup(lot_ids, area_ids, date_ordinals)
+
+        codes = np.full(len(values), NO_THRESHOLD, dtype=np.int8)
+        has_threshold = ~np.isnan(alert)
+        codes[has_threshold] = STATUS_CODES['normal']
+        codes[has_threshold & (values >= alert)] = STATUS_CODES['alert']
+        codes[has_threshold & (values >= action)] = STATUS_CODES['action']
+        return codes
+
+
+def reclassify_tests(queryset=None, index=None, batch_size=500):
+    """Recompute status for every test in queryset in one vectorized pass
+
+    Tests with no applicable threshold keep their current status, matching
+    BioburdenData.save(). Returns the number of tests whose status changed.
+    """
+    if queryset is None:
+        queryset = BioburdenData.objects.all()
+    if index is None:
+        index = ThresholdIndex.load()
+
+    tests = queryset.analytics_arrays()
+    if len(tests['id']) == 0:
+        return 0
+
+    ids = tests['id']
+    codes = index.classify(tests['lot_id'], tests['area_id'], tests['date_ordinal'], tests['value'])
+    changed = (codes != NO_THRESHOLD) & (codes != tests['status_code'])
+
+    now = timezone.now()
+    with transaction.atomic(), DataVersion.deferred():
+        for code, name in enumerate(STATUS_NAMES):
+            changed_ids = ids[changed & (codes == code)].tolist()
+            for start in range(0, len(changed_ids), batch_size):
+                BioburdenData.objects.filter(id__in=changed_ids[start:start + batch_size]).update(
+                    status=name, updated_at=now
+                )
+
+    return int(changed.sum())
+
+
+def threshold_segments(lot_id, area_id, date_ordinals, index=None):
+    """Alert/action levels in force over sorted test dates, as runs of equal levels
+
+    lot_id/area_id may be None (any). Returns dicts with ISO 'from'/'to'
+    dates (first and last test date of the run) and the two levels; runs
+    without a threshold are left out. Used to draw threshold overlays that
+    follow effective-dated changes.
+    """
+    if index is None:
+        index = ThresholdIndex.load()
+    date_ordinals = np.unique(np.asarray(date_ordinals, dtype=np.int64))
+    n = len(date_ordinals)
+    if n == 0:
+        return []
+
+    alert, action = index.lookup(np.full(n, lot_id or 0), np.full(n, area_id or 0), date_ordinals)
+
+    def same(a, b):
+        return (a == b) | (np.isnan(a) & np.isnan(b))
+
+    changed = np.ones(n, dtype=bool)
+    changed[1:] = ~(same(alert[1:], alert[:-1]) & same(action[1:], action[:-1]))
+    starts = np.flatnonzero(changed)
+    ends = np.append(starts[1:], n) - 1
+
+    segments = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if np.isnan(alert[start]):
+            continue
+        segments.append({
+            'from': date.fromordinal(int(date_ordinals[start])).isoformat(),
+            'to': date.fromordinal(int(date_ordinals[end])).isoformat(),
+            'alert_level': float(alert[start]),
+            'action_level': float(action[start]),
+        })
+    return segments
@@ -11,11 +11,15 @@ urlpatterns = [
     path('data/', views.BioburdenDataListView.as_view(), name='data_list'),
     path('data/add/', views.BioburdenDataCreateView.as_view(), name='data_create'),
     path('data/<int:pk>/edit/', views.BioburdenDataUpdateView.as_view(), name='data_update'),
+    path('data/export/', views.export_data, name='export_data'),
+    path('data/export/<int:pk>/', views.export_detail, name='export_detail'),
+    path('data/export/<int:pk>/download/', views.export_download, name='export_download'),
     
     # Thresholds
     path('thresholds/', views.FixedThresholdListView.as_view(), name='threshold_list'),
     path('thresholds/add/', views.FixedThresholdCreateView.as_view(), name='threshold_create'),
     path('thresholds/<int:pk>/edit/', views.FixedThresholdUpdateView.as_view(), name='threshold_update'),
+    path('thresholds/simulate/', views.threshold_simulator, name='threshold_simulator'),
     
     # Import
     path('import/', views.import_data, name='import_data'),
@@ -23,6 +27,7 @@ urlpatterns = [
     
     # Analysis
     path('lot/<int:pk>/', views.lot_detail, name='lot_detail'),
+    path('lot/<int:pk>/tests/', views.lot_tests_api, name='lot_tests_api'),
     path('area-comparison/', views.area_comparison, name='area_comparison'),
     path('outlier-analysis/', views.outlier_analysis, name='outlier_analysis'),
     path('organism-frequency/', views.organism_frequency, name='organism_frequency'),
@@ -31,4 +36,13 @@ urlpatterns = [
     
     # API
     path('api/chart-data/', views.chart_data_api, name='chart_data_api'),
+    path('api/aggregates/', views.aggregate_api, name='aggregate_api'),
+    path('api/tests/', views.tests_api, name='tests_api'),
+    path('api/lots/autocomplete/', views.lot_autocomplete, name='lot_autocomplete'),
+    path('api/areas/autocomplete/', views.area_autocomplete, name='area_autocomplete'),
+    path('api/ingest/', views.ingest_api, name='ingest_api'),
+    path('api/threshold-simulation/', views.threshold_simulation_api, name='threshold_simulation_api'),
+    path('api/cache-stats/', views.cache_stats_api, name='cache_stats_api'),
+    path('debug/queries/', views.query_profile, name='query_profile'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
@@ -1,9 +1,17 @@
-import openpyxl
-import pandas as pd
+import time
+from collections import defaultdict
 from datetime import datetime
 from decimal import Decimal
+from django.db.models import F
 from django.utils import timezone
-from .models import Area, Lot, BioburdenData, FixedThreshold, DataImport
+from .lazy import lazy_module
+from .metrics import observe_import
+from .models import Area, Lot, BioburdenData, FixedThreshold, DataImport, DataVersion
+from .thresholds import reclassify_tests
+
+# Imported on first use, so workers that never import a workbook skip them
+openpyxl = lazy_module('openpyxl')
+pd = lazy_module('pandas')
 
 
 class ExcelImporter:
@@ -15,6 +23,7 @@ class ExcelImporter:
         self.warnings = []
         self.records_imported = 0
         self.clear_existing_data = True  # Default behavior
+        self.precompute_results = True  # Warm the analysis caches afterwards
     
     def import_bioburden_data(self, sheet_name='Bioburden Data'):
         """Import bioburden data from Excel sheet"""
@@ -124,11 +133,19 @@ class ExcelImporter:
                     alert_level = Decimal(str(alert_level))
                     action_level = Decimal(str(action_level))
                     
+                    # Optional validity period
+                    effective_from = row.get('Effective From')
+                    effective_from = pd.to_datetime(effective_from).date() if pd.notna(effective_from) else None
+                    effective_to = row.get('Effective To')
+                    effective_to = pd.to_datetime(effective_to).date() if pd.notna(effective_to) else None
+                    
                     # Create or update threshold
                     FixedThreshold.objects.update_or_create(
                         lot=lot,
+                        area=area,
+                        effective_from=effective_from,
                         defaults={
-                            'area': area,
+                            'effective_to': effective_to,
                             'alert_level': alert_level,
                             'action_level': action_level,
                             'notes': row.get('Notes', '')
@@ -201,6 +218,10 @@ class ExcelImporter:
             df = pd.read_excel(self.file_path, sheet_name='RAW DATA')
             df.columns = df.columns.str.strip()
             
+            # Tests of one lot, area, day and organism type seen so far; the
+            # second and later ones get -2, -3, ... on their sample ID
+            occurrences = defaultdict(int)
+            
             for index, row in df.iterrows():
                 try:
                     # Get lot and area
@@ -229,41 +250,37 @@ class ExcelImporter:
                         correction_factor = 1.0
                     correction_factor = float(correction_factor)
                     
-                    # Import AEROBES
-                    aerobe_cols = [c for c in df.columns if 'CFU AEROBES' in c and c.startswith('CFU AEROBES S')]
-                    for col in aerobe_cols:
-                        cfu_value = row.get(col)
-                        if pd.notna(cfu_value):
-                            sample_num = col.replace('CFU AEROBES S', '').strip()
-                            BioburdenData.objects.create(
-                                lot=lot,
-                                area=area,
-                                test_date=test_date,
-                                sample_id=f"AEROBES-S{sample_num}",
-                                cfu_count=Decimal(str(cfu_value)),
-                                adjusted_cfu=Decimal(str(float(cfu_value) * correction_factor)),
-                                dilution_factor=Decimal(str(correction_factor)),
-                                lab_name=row.get('PROVIDER', ''),
-                            )
-                            self.records_imported += 1
+                    validation = row.get('VALIDATION')
+                    validation = str(validation).strip().upper() == 'YES' if pd.notna(validation) else None
                     
-                    # Import FUNGI
-                    fungi_cols = [c for c in df.columns if 'CFU FUNGI' in c and c.startswith('CFU FUNGI S')]
-                    for col in fungi_cols:
-                        cfu_value = row.get(col)
-                        if pd.notna(cfu_value):
-                            sample_num = col.replace('CFU FUNGI S', '').strip()
-                            BioburdenData.objects.create(
-                                lot=lot,
-                                area=area,
-                                test_date=test_date,
-                                sample_id=f"FUNGI-S{sample_num}",
-                                cfu_count=Decimal(str(cfu_value)),
-                                adjusted_cfu=Decimal(str(float(cfu_value) * correction_factor)),
-                                dilution_factor=Decimal(str(correction_factor)),
-                                lab_name=row.get('PROVIDER', ''),
-                            )
-                            self.records_imported += 1
+                    # One test per organism type, keeping every sample value
+                    for organism_type in ('AEROBES', 'FUNGI'):
+                        prefix = f'CFU {organism_type} S'
+                        sample_cols = [c for c in df.columns if c.startswith(prefix)]
+                        sample_values = [float(row.get(col)) for col in sample_cols if pd.notna(row.get(col))]
+                        if not sample_values:
+                            continue
+                        
+                        sample_id = f"{organism_type}-{test_date.strftime('%Y%m%d')}-{lot_number}"
+                        occurrences[lot_number, area_name, test_date, organism_type] += 1
+                        occurrence = occurrences[lot_number, area_name, test_date, organism_type]
+                        if occurrence > 1:
+                            sample_id = f"{sample_id}-{occurrence}"
+                        
+                        test = BioburdenData(
+                            lot=lot,
+                            area=area,
+                            test_date=test_date,
+                            sample_id=sample_id,
+                            organism_type=organism_type,
+                            validation=validation,
+                            dilution_factor=Decimal(str(correction_factor)),
+                            lab_name=row.get('PROVIDER', ''),
+                        )
+                        test.set_samples(sample_values)
+                        test.cfu_count = Decimal(str(round(test.sample_mean, 2)))
+                        test.save()
+                        self.records_imported += 1
                     
                 except Exception as e:
                     self.errors.append(f"RAW DATA row {index + 2}: {str(e)}")
@@ -277,97 +294,138 @@ class ExcelImporter:
             return False
     
     def import_alert_action_levels(self):
-        """Import fixed thresholds from ALERT_ACTION LEVELS sheet"""
+        """Import effective-dated fixed thresholds from ALERT_ACTION LEVELS sheet
+        
+        Consecutive DATE PERIOD rows with the same levels are merged into one
+        validity period. The earliest period also covers older tests and the
+        latest one stays open-ended. Periods apply to all lots and areas.
+        """
         try:
             df = pd.read_excel(self.file_path, sheet_name='ALERT_ACTION LEVELS')
             df.columns = df.columns.str.strip()
             
-            # Get the most recent (last row) threshold values
-            if len(df) > 0:
-                last_row = df.iloc[-1]
-                alert_level = Decimal(str(last_row.get('ALERT LEVEL FIXED', 0)))
-                action_level = Decimal(str(last_row.get('ACTION LEVEL FIXED', 0)))
-                
-                # Create thresholds for all lots
-                lots = Lot.objects.all()
-                thresholds_created = 0
-                for lot in lots:
-                    FixedThreshold.objects.update_or_create(
-                        lot=lot,
-                        defaults={
-                            'alert_level': alert_level,
-                            'action_level': action_level,
-                        }
-                    )
-                    thresholds_created += 1
-                
-                self.warnings.append(f"✓ Created {thresholds_created} fixed thresholds (Alert: {alert_level}, Action: {action_level})")
-                return True
-            else:
+            df['DATE PERIOD'] = pd.to_datetime(df['DATE PERIOD'], errors='coerce')
+            df = df.dropna(subset=['DATE PERIOD', 'ALERT LEVEL FIXED', 'ACTION LEVEL FIXED'])
+            df = df.sort_values('DATE PERIOD').reset_index(drop=True)
+            
+            if len(df) == 0:
                 self.warnings.append("ALERT_ACTION LEVELS sheet is empty")
                 return False
+            
+            # A new period starts whenever the levels change
+            levels = df[['ALERT LEVEL FIXED', 'ACTION LEVEL FIXED']]
+            period_ids = (levels != levels.shift()).any(axis=1).cumsum()
+            
+            thresholds = []
+            for _, period in df.groupby(period_ids):
+                first_row = period.iloc[0]
+                vdmax = first_row.get('VDMAX DOSE', 'N/A')
+                thresholds.append(FixedThreshold(
+                    lot=None,
+                    area=None,
+                    effective_from=period['DATE PERIOD'].min().date(),
+                    effective_to=period['DATE PERIOD'].max().date(),
+                    alert_level=Decimal(str(first_row['ALERT LEVEL FIXED'])),
+                    action_level=Decimal(str(first_row['ACTION LEVEL FIXED'])),
+                    notes=f"VDMAX: {vdmax if pd.notna(vdmax) else 'N/A'}",
+                ))
+            
+            thresholds[0].effective_from = None
+            thresholds[-1].effective_to = None
+            
+            # Replace the global (all lots, all areas) periods
+            FixedThreshold.objects.filter(lot__isnull=True, area__isnull=True).delete()
+            FixedThreshold.objects.bulk_create(thresholds)
+            DataVersion.bump()
+            
+            for threshold in thresholds:
+                start = threshold.effective_from or 'start'
+                end = threshold.effective_to or 'open'
+                self.warnings.append(
+                    f"✓ Threshold period {start} to {end} "
+                    f"(Alert: {threshold.alert_level}, Action: {threshold.action_level})"
+                )
+            return True
                 
         except Exception as e:
             self.warnings.append(f"ALERT_ACTION LEVELS sheet not found or error: {str(e)}")
             return False
     
+    def warm_analysis_cache(self):
+        """Precompute the default analysis pages so the first visitors hit warm results"""
+        from .precompute import warm_result_cache
+        
+        try:
+            timings = warm_result_cache()
+            total = sum(seconds for _, seconds in timings)
+            self.warnings.append(f"✓ Precomputed {len(timings)} analysis results ({total:.1f}s of work)")
+        except Exception as e:
+            self.warnings.append(f"Analysis results not precomputed: {str(e)}")
+    
     def detect_and_import(self):
         """Automatically detect sheets and import complete data"""
+        started = time.perf_counter()
         try:
             workbook = openpyxl.load_workbook(self.file_path, read_only=True)
             sheet_names = workbook.sheetnames
             workbook.close()
             
-            # Clear existing data if requested
-            if self.clear_existing_data:
-                BioburdenData.objects.all().delete()
-                FixedThreshold.objects.all().delete()
-                Lot.objects.all().delete()
-                Area.objects.all().delete()
-                self.warnings.append("✓ Cleared existing data")
-            
-            # Import in proper order
-            # 1. LOT_MASTER (creates lots with organism data)
-            if 'LOT_MASTER' in sheet_names:
-                self.import_lot_master()
-            
-            # 2. RAW DATA (creates bioburden tests)
-            if 'RAW DATA' in sheet_names:
-                self.import_raw_data()
-            else:
-                # Fallback to old method if RAW DATA sheet doesn't exist
-                bioburden_sheets = [s for s in sheet_names if 'bioburden' in s.lower() or 'data' in s.lower()]
-                if bioburden_sheets:
-                    self.import_bioburden_data(bioburden_sheets[0])
+            # Bump the data version once for the whole import
+            with DataVersion.deferred():
+                # Clear existing data if requested
+                if self.clear_existing_data:
+                    BioburdenData.objects.all().delete()
+                    FixedThreshold.objects.all().delete()
+                    Lot.objects.all().delete()
+                    Area.objects.all().delete()
+                    self.warnings.append("✓ Cleared existing data")
+                
+                # Import in proper order
+                # 1. LOT_MASTER (creates lots with organism data)
+                if 'LOT_MASTER' in sheet_names:
+                    self.import_lot_master()
+                
+                # 2. RAW DATA (creates bioburden tests)
+                if 'RAW DATA' in sheet_names:
+                    self.import_raw_data()
                 else:
-                    self.import_bioburden_data(sheet_names[0])
-            
-            # 3. ALERT_ACTION LEVELS (creates thresholds)
-            if 'ALERT_ACTION LEVELS' in sheet_names:
-                self.import_alert_action_levels()
-            else:
-                # Fallback to old method
-                threshold_sheets = [s for s in sheet_names if 'threshold' in s.lower() or 'alert' in s.lower()]
-                if threshold_sheets:
-                    self.import_fixed_thresholds(threshold_sheets[0])
-            
-            # Recalculate status for all tests
-            for test in BioburdenData.objects.all():
-                test.save()  # This triggers status calculation
+                    # Fallback to old method if RAW DATA sheet doesn't exist
+                    bioburden_sheets = [s for s in sheet_names if 'bioburden' in s.lower() or 'data' in s.lower()]
+                    if bioburden_sheets:
+                        self.import_bioburden_data(bioburden_sheets[0])
+                    else:
+                        self.import_bioburden_data(sheet_names[0])
+                
+                # 3. ALERT_ACTION LEVELS (creates thresholds)
+                if 'ALERT_ACTION LEVELS' in sheet_names:
+                    self.import_alert_action_levels()
+                else:
+                    # Fallback to old method
+                    threshold_sheets = [s for s in sheet_names if 'threshold' in s.lower() or 'alert' in s.lower()]
+                    if threshold_sheets:
+                        self.import_fixed_thresholds(threshold_sheets[0])
+                
+                # Recalculate adjusted CFU and status for all tests in bulk
+                BioburdenData.objects.exclude(cfu_count=0).update(
+                    adjusted_cfu=F('cfu_count') * F('dilution_factor')
+                )
+                BioburdenData.objects.refresh_values()
+                reclassify_tests()
+                
+                # bulk_create() bypasses the model signals
+                DataVersion.bump()
             
-            return {
-                'success': len(self.errors) == 0,
-                'records_imported': self.records_imported,
-                'errors': self.errors,
-                'warnings': self.warnings
-            }
+            if self.precompute_results and not self.errors:
+                self.warm_analysis_cache()
             
         except Exception as e:
             self.errors.append(f"Fatal error during import: {str(e)}")
-            return {
-                'success': False,
-                'records_imported': self.records_imported,
-                'errors': self.errors,
-                'warnings': self.warnings
-            }
+        
+        observe_import('excel', time.perf_counter() - started, self.records_imported, not self.errors)
+        return {
+            'success': len(self.errors) == 0,
+            'records_imported': self.records_imported,
+            'errors': self.errors,
+            'warnings': self.warnings
+        }
 
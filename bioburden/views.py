@@ -1,42 +1,93 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib import messages
-from django.db.models import Avg, Count, Max, Min, StdDev, Q
-from django.http import JsonResponse
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
-from datetime import datetime, timedelta
-from decimal import Decimal
+from django.db.models import Avg, Count, Max, Q, Prefetch
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from django.views.generic import ListView, CreateView, UpdateView
+from django.urls import reverse, reverse_lazy
+from datetime import date, datetime
+from urllib.parse import urlencode
+import csv
+import gzip
+import hmac
 import json
+import time
+
+import numpy as np
 
 from .models import (
     BioburdenData, Area, Lot, FixedThreshold, 
-    DynamicThreshold, DataImport
+    DataImport, DataExport, LotOrganism
 )
 from .forms import (
     DataImportForm, BioburdenDataForm, 
-    FixedThresholdForm, FilterForm
+    FixedThresholdForm, FilterForm, ThresholdSimulationForm
+)
+from .aggregation import BUCKET_FIELDS, GROUP_FIELDS, bucket_aggregates
+from .cache import cached_result, conditional_on_data_version, result_cache_stats
+from .downsampling import METHODS as DOWNSAMPLING_METHODS, downsample
+from .exports import (
+    CONTENT_TYPES as EXPORT_CONTENT_TYPES, EXPORT_COLUMNS, EXPORT_FORMATS, export_records, start_export, xlsx_file
+)
+from .extracts import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, csv_stream, decode_cursor, iter_records, keyset_page, ndjson_stream,
+    seek_page
 )
+from .ingest import MAX_INGEST_RECORDS, ingest_records, parse_csv_records
+from .lookups import DEFAULT_LIMIT as LOOKUP_DEFAULT_LIMIT, MAX_LIMIT as LOOKUP_MAX_LIMIT, search as lookup_search
+from .metrics import registry as metrics_registry, render_prometheus
+from .organisms import organism_frequency_summary, top_cooccurring_pairs
+from .profiling import profile_store
+from .series import BINARY_CONTENT_TYPE, FORMATS as SERIES_FORMATS, binary_payload, columnar_payload
+from .simulation import simulate_thresholds
+from .snapshot import get_snapshot, group_stats
+from .thresholds import STATUS_CODES, STATUS_NAMES, threshold_segments
 from .utils import ExcelImporter
 
 
-def dashboard(request):
-    """Main dashboard view with charts and metrics"""
-    
-    # Apply filters
-    filter_form = FilterForm(request.GET)
-    queryset = BioburdenData.objects.all()
-    
-    if filter_form.is_valid():
-        if filter_form.cleaned_data.get('lot'):
-            queryset = queryset.filter(lot=filter_form.cleaned_data['lot'])
-        if filter_form.cleaned_data.get('area'):
-            queryset = queryset.filter(area=filter_form.cleaned_data['area'])
-        if filter_form.cleaned_data.get('date_from'):
-            queryset = queryset.filter(test_date__gte=filter_form.cleaned_data['date_from'])
-        if filter_form.cleaned_data.get('date_to'):
-            queryset = queryset.filter(test_date__lte=filter_form.cleaned_data['date_to'])
-        if filter_form.cleaned_data.get('status'):
-            queryset = queryset.filter(status=filter_form.cleaned_data['status'])
+def _filter_params(filter_form):
+    """Normalized FilterForm values (pks and dates); empty when the form is invalid"""
+    if not filter_form.is_valid():
+        return {}
+    data = filter_form.cleaned_data
+    return {
+        'lot': data['lot'].pk if data.get('lot') else None,
+        'area': data['area'].pk if data.get('area') else None,
+        'date_from': data.get('date_from'),
+        'date_to': data.get('date_to'),
+        'status': data.get('status'),
+        'organism_type': data.get('organism_type'),
+    }
+
+
+def _filter_query(query_dict):
+    """The non-empty FilterForm fields of a query string, e.g. to pass them on"""
+    return {name: query_dict[name] for name in FilterForm.base_fields if query_dict.get(name)}
+
+
+def _apply_filters(queryset, filters):
+    """Apply _filter_params() output to a BioburdenData queryset"""
+    if filters.get('lot'):
+        queryset = queryset.filter(lot_id=filters['lot'])
+    if filters.get('area'):
+        queryset = queryset.filter(area_id=filters['area'])
+    if filters.get('date_from'):
+        queryset = queryset.filter(test_date__gte=filters['date_from'])
+    if filters.get('date_to'):
+        queryset = queryset.filter(test_date__lte=filters['date_to'])
+    if filters.get('status'):
+        queryset = queryset.filter(status=filters['status'])
+    if filters.get('organism_type'):
+        queryset = queryset.filter(organism_type=filters['organism_type'])
+    return queryset
+
+
+def _dashboard_context(filters):
+    """Dashboard statistics for the given filters (cached per data version)"""
+    queryset = _apply_filters(BioburdenData.objects.all(), filters)
     
     # Statistics
     total_tests = queryset.count()
@@ -51,81 +102,210 @@ def dashboard(request):
     
     # Area comparison
     area_stats = queryset.values('area__name').annotate(
-        avg_cfu=Avg('adjusted_cfu'),
-        max_cfu=Max('adjusted_cfu'),
+        avg_cfu=Avg('value'),
+        max_cfu=Max('value'),
         count=Count('id')
     ).order_by('-avg_cfu')
     
     # Lot comparison
     lot_stats = queryset.values('lot__lot_number').annotate(
-        avg_cfu=Avg('adjusted_cfu'),
-        max_cfu=Max('adjusted_cfu'),
+        avg_cfu=Avg('value'),
+        max_cfu=Max('value'),
         alert_count=Count('id', filter=Q(status='alert')),
         action_count=Count('id', filter=Q(status='action')),
     ).order_by('-action_count', '-alert_count')[:10]
     
-    context = {
-        'filter_form': filter_form,
+    return {
         'total_tests': total_tests,
         'alert_count': alert_count,
         'action_count': action_count,
         'normal_count': total_tests - alert_count - action_count,
-        'recent_tests': recent_tests,
+        'recent_tests': list(recent_tests),
         'status_distribution': list(status_distribution),
         'area_stats': list(area_stats),
         'lot_stats': list(lot_stats),
     }
+
+
+@conditional_on_data_version('dashboard')
+def dashboard(request):
+    """Main dashboard view with charts and metrics"""
+    
+    # Apply filters (an invalid form shows unfiltered data)
+    filter_form = FilterForm(request.GET)
+    filters = _filter_params(filter_form)
+    
+    context = cached_result('dashboard', filters, lambda: _dashboard_context(filters))
+    context = {'filter_form': filter_form, **context}
     
     return render(request, 'bioburden/dashboard.html', context)
 
 
-def chart_data_api(request):
-    """API endpoint for chart data (AJAX)"""
-    
-    lot_id = request.GET.get('lot')
-    area_id = request.GET.get('area')
+def _chart_series(lot_id, area_id, organism_type, today, max_points=None, method='lttb'):
+    """Snapshot rows to plot (date ordered, downsampled) plus thresholds and point counts"""
+    snapshot = get_snapshot()
+    rows = np.flatnonzero(snapshot.mask(
+        lot_id=lot_id or None,
+        area_id=area_id or None,
+        organism_type=organism_type or None,
+    ))
     
-    queryset = BioburdenData.objects.all()
+    # Time series data
+    rows = rows[np.argsort(snapshot['date_ordinal'][rows], kind='stable')]
+    total_points = len(rows)
     
+    # Levels in force over the whole series, before any point is dropped
+    segments = []
     if lot_id:
-        queryset = queryset.filter(lot_id=lot_id)
-    if area_id:
-        queryset = queryset.filter(area_id=area_id)
+        segments = threshold_segments(int(lot_id), int(area_id) if area_id else None, snapshot['date_ordinal'][rows])
     
-    # Time series data
-    data = queryset.select_related('lot', 'area').order_by('test_date').values(
-        'test_date', 'adjusted_cfu', 'cfu_count', 'status', 
-        'lot__lot_number', 'area__name'
-    )
+    # Downsample to max_points, always keeping alert and action results
+    if max_points is not None:
+        rows = rows[downsample(
+            snapshot['date_ordinal'][rows],
+            snapshot['value'][rows],
+            max_points,
+            keep=snapshot['status_code'][rows] != STATUS_CODES['normal'],
+            method=method,
+        )]
     
     # Get thresholds
     thresholds = {}
     if lot_id:
-        try:
-            lot = Lot.objects.get(id=lot_id)
-            if hasattr(lot, 'threshold'):
-                thresholds = {
-                    'alert_level': float(lot.threshold.alert_level),
-                    'action_level': float(lot.threshold.action_level)
-                }
-        except Lot.DoesNotExist:
-            pass
-    
-    # Convert to list and format dates
-    chart_data = []
-    for item in data:
-        chart_data.append({
-            'date': item['test_date'].strftime('%Y-%m-%d'),
-            'value': float(item['adjusted_cfu'] or item['cfu_count']),
-            'status': item['status'],
-            'lot': item['lot__lot_number'],
-            'area': item['area__name']
-        })
+        threshold = FixedThreshold.resolve(lot_id, area_id or None, today)
+        if threshold:
+            thresholds = {
+                'alert_level': float(threshold.alert_level),
+                'action_level': float(threshold.action_level)
+            }
     
-    return JsonResponse({
-        'data': chart_data,
-        'thresholds': thresholds
-    })
+    meta = {
+        'thresholds': thresholds,
+        'threshold_segments': segments,
+        'total_points': total_points,
+        'returned_points': len(rows),
+        'downsampled': len(rows) < total_points
+    }
+    return snapshot, rows, meta
+
+
+def _chart_rows(snapshot, rows):
+    """One dict per point, the default chart_data_api format"""
+    return [
+        {
+            'date': date.fromordinal(ordinal).isoformat(),
+            'value': value,
+            'status': STATUS_NAMES[status],
+            'lot': snapshot.lot_numbers[lot_code],
+            'area': snapshot.area_names[area_code]
+        }
+        for ordinal, value, status, lot_code, area_code in zip(
+            snapshot['date_ordinal'][rows].tolist(),
+            snapshot['value'][rows].tolist(),
+            snapshot['status_code'][rows].tolist(),
+            snapshot['lot_code'][rows].tolist(),
+            snapshot['area_code'][rows].tolist(),
+        )
+    ]
+
+
+def _chart_content(output_format, *args):
+    """Chart payload serialized once, so cache hits skip encoding"""
+    snapshot, rows, meta = _chart_series(*args)
+    if output_format == 'binary':
+        return binary_payload(snapshot, rows, meta)
+    if output_format == 'columnar':
+        payload = columnar_payload(snapshot, rows, meta)
+    else:
+        payload = {'data': _chart_rows(snapshot, rows), **meta}
+    return json.dumps(payload, cls=DjangoJSONEncoder)
+
+
+# Responses smaller than this are not worth gzipping
+GZIP_MIN_BYTES = 2048
+
+
+def _compressed_response(request, name, params, content, content_type):
+    """Response with content gzipped (and the gzip cached too) when the client accepts it"""
+    response = HttpResponse(content_type=content_type)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if len(content) >= GZIP_MIN_BYTES and 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        raw = content.encode() if isinstance(content, str) else content
+        content = cached_result(name, {**params, 'encoding': 'gzip'}, lambda: gzip.compress(raw, mtime=0))
+        response['Content-Encoding'] = 'gzip'
+    response.content = content
+    return response
+
+
+def precomputed_results():
+    """(view name, params, compute) for the default view of each analysis page
+
+    Keys and values match what the views themselves cache, so warming these
+    (see bioburden/precompute.py) serves the first visitor from the cache.
+    """
+    today = datetime.now().date()
+    return [
+        ('dashboard', {}, lambda: _dashboard_context({})),
+        ('chart_data_api', {'today': today}, lambda: _chart_content('rows', None, None, None, today)),
+        ('lot_summaries', {}, _lot_summaries),
+        ('area_comparison', {}, _area_comparison_context),
+        ('outlier_analysis', {}, _outlier_analysis_context),
+        ('organism_frequency', {}, _organism_frequency_context),
+        ('cfu_per_area_analysis', {}, _cfu_per_area_analysis_context),
+        ('statistical_summary', {}, _statistical_summary_context),
+    ]
+
+
+@conditional_on_data_version('chart_data_api', daily=True, negotiate_gzip=True)
+def chart_data_api(request):
+    """API endpoint for chart data (AJAX)
+    
+    format=rows (default) returns one object per point, format=columnar
+    parallel arrays and format=binary little-endian column buffers (see
+    bioburden/series.py). Large responses are gzipped when accepted.
+    """
+    
+    lot_id = request.GET.get('lot')
+    area_id = request.GET.get('area')
+    organism_type = request.GET.get('organism_type')
+    method = request.GET.get('method') or 'lttb'
+    output_format = request.GET.get('format') or 'rows'
+    today = datetime.now().date()
+    
+    try:
+        lot_id = int(lot_id) if lot_id else None
+        area_id = int(area_id) if area_id else None
+    except ValueError:
+        return JsonResponse({'error': 'lot and area must be integer ids'}, status=400)
+    if output_format not in SERIES_FORMATS:
+        return JsonResponse({'error': f"format must be one of: {', '.join(SERIES_FORMATS)}"}, status=400)
+    
+    # Optional server-side downsampling
+    max_points = request.GET.get('max_points')
+    try:
+        max_points = int(max_points) if max_points else None
+        if max_points is not None and max_points < 2:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'max_points must be an integer of at least 2'}, status=400)
+    if method not in DOWNSAMPLING_METHODS:
+        return JsonResponse(
+            {'error': f"method must be one of: {', '.join(DOWNSAMPLING_METHODS)}"}, status=400
+        )
+    
+    # The lot threshold depends on the date, so it is part of the key
+    params = {'lot': lot_id, 'area': area_id, 'organism_type': organism_type, 'today': today}
+    if max_points is not None:
+        params.update(max_points=max_points, method=method)
+    if output_format != 'rows':
+        params['format'] = output_format
+    content = cached_result(
+        'chart_data_api', params,
+        lambda: _chart_content(output_format, lot_id, area_id, organism_type, today, max_points, method)
+    )
+    
+    content_type = BINARY_CONTENT_TYPE if output_format == 'binary' else 'application/json'
+    return _compressed_response(request, 'chart_data_api', params, content, content_type)
 
 
 def import_data(request):
@@ -191,35 +371,107 @@ def import_detail(request, pk):
 
 
 class BioburdenDataListView(ListView):
-    """List all bioburden test data"""
+    """List bioburden test data, newest first
+    
+    Pages are addressed by cursors on (test_date, id) instead of page
+    numbers, so every page is an index seek however deep it is; the total
+    is counted once per data version and filter combination.
+    """
     model = BioburdenData
     template_name = 'bioburden/data_list.html'
     context_object_name = 'tests'
     paginate_by = 50
     
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('lot', 'area')
-        
-        # Apply filters
-        lot_id = self.request.GET.get('lot')
-        area_id = self.request.GET.get('area')
-        status = self.request.GET.get('status')
-        
-        if lot_id:
-            queryset = queryset.filter(lot_id=lot_id)
-        if area_id:
-            queryset = queryset.filter(area_id=area_id)
-        if status:
-            queryset = queryset.filter(status=status)
-        
-        return queryset.order_by('-test_date')
+        self.filter_form = FilterForm(self.request.GET)
+        self.filters = _filter_params(self.filter_form)
+        queryset = BioburdenData.objects.select_related('lot', 'area').defer('samples')
+        return _apply_filters(queryset, self.filters)
+    
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            after = decode_cursor(self.request.GET['after']) if self.request.GET.get('after') else None
+            before = decode_cursor(self.request.GET['before']) if self.request.GET.get('before') else None
+        except ValueError:
+            raise Http404("Invalid page cursor")
+        tests, self.next_cursor, self.prev_cursor = seek_page(
+            queryset, page_size, after=after, before=before, descending=True
+        )
+        return None, None, tests, bool(self.next_cursor or self.prev_cursor)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['filter_form'] = FilterForm(self.request.GET)
+        filter_query = _filter_query(self.request.GET)
+        context['filter_form'] = self.filter_form
+        context['filter_query'] = urlencode(filter_query)
+        context['total_count'] = cached_result('data_list_count', self.filters, self.object_list.count)
+        context['first_page_url'] = f'?{urlencode(filter_query)}'
+        if self.next_cursor:
+            context['next_page_url'] = f"?{urlencode({**filter_query, 'after': self.next_cursor})}"
+        if self.prev_cursor:
+            context['prev_page_url'] = f"?{urlencode({**filter_query, 'before': self.prev_cursor})}"
         return context
 
 
+def export_data(request):
+    """Export filtered tests as CSV or XLSX, or queue the export in the background"""
+    
+    output_format = request.GET.get('format') or 'csv'
+    filter_form = FilterForm(request.GET)
+    if output_format not in EXPORT_FORMATS or not filter_form.is_valid():
+        messages.error(request, "Invalid export request.")
+        return redirect('bioburden:data_list')
+    
+    queryset = _apply_filters(BioburdenData.objects.all(), _filter_params(filter_form))
+    
+    if request.GET.get('background'):
+        export = DataExport.objects.create(
+            format=output_format,
+            filters=_filter_query(request.GET),
+            requested_by=request.user.get_username() or None
+        )
+        start_export(export, queryset)
+        messages.info(request, "Export started. The file will be available for download below.")
+        return redirect('bioburden:export_detail', pk=export.pk)
+    
+    filename = f"bioburden_tests_{date.today().strftime('%Y%m%d')}.{output_format}"
+    if output_format == 'xlsx':
+        return FileResponse(
+            xlsx_file(export_records(queryset)), as_attachment=True, filename=filename,
+            content_type=EXPORT_CONTENT_TYPES['xlsx']
+        )
+    response = StreamingHttpResponse(
+        csv_stream(export_records(queryset), EXPORT_COLUMNS), content_type=EXPORT_CONTENT_TYPES['csv']
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_detail(request, pk):
+    """Status of a background export"""
+    DataExport.fail_stale(settings.BIOBURDEN_EXPORT_TIMEOUT)
+    data_export = get_object_or_404(DataExport, pk=pk)
+    recent_exports = DataExport.objects.order_by('-created_at')[:10]
+    
+    context = {
+        'data_export': data_export,
+        'recent_exports': recent_exports
+    }
+    
+    return render(request, 'bioburden/export_detail.html', context)
+
+
+def export_download(request, pk):
+    """Download the file of a completed background export"""
+    data_export = get_object_or_404(DataExport, pk=pk)
+    if data_export.status != 'completed' or not data_export.file:
+        raise Http404("Export file is not available")
+    return FileResponse(
+        data_export.file.open('rb'), as_attachment=True, filename=data_export.default_file_name(),
+        content_type=EXPORT_CONTENT_TYPES[data_export.format]
+    )
+
+
 class BioburdenDataCreateView(CreateView):
     """Create new bioburden test record"""
     model = BioburdenData
@@ -279,105 +531,412 @@ class FixedThresholdUpdateView(UpdateView):
         return super().form_valid(form)
 
 
-def lot_detail(request, pk):
-    """Detailed view for a specific lot"""
-    lot = get_object_or_404(Lot, pk=pk)
+@conditional_on_data_version('aggregate_api')
+def aggregate_api(request):
+    """Trend aggregates per day/week/month bucket, optionally grouped (AJAX)"""
     
-    # Get all tests for this lot
-    tests = BioburdenData.objects.filter(lot=lot).select_related('area').order_by('-test_date')
+    bucket = request.GET.get('bucket') or 'month'
+    group_by = [name.strip() for name in request.GET.get('group_by', '').split(',') if name.strip()]
+    filter_form = FilterForm(request.GET)
     
-    # Statistics
-    stats = tests.aggregate(
-        avg_cfu=Avg('adjusted_cfu'),
-        max_cfu=Max('adjusted_cfu'),
-        min_cfu=Min('adjusted_cfu'),
-        std_dev=StdDev('adjusted_cfu'),
-        total_tests=Count('id'),
-        alert_count=Count('id', filter=Q(status='alert')),
-        action_count=Count('id', filter=Q(status='action'))
+    errors = {}
+    if bucket not in BUCKET_FIELDS:
+        errors['bucket'] = [f"Must be one of: {', '.join(BUCKET_FIELDS)}"]
+    unknown = [name for name in group_by if name not in GROUP_FIELDS]
+    if unknown:
+        errors['group_by'] = [f"Unknown dimension(s) {', '.join(unknown)}; use {', '.join(GROUP_FIELDS)}"]
+    if not filter_form.is_valid():
+        errors.update(filter_form.errors)
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+    
+    filters = _filter_params(filter_form)
+    group_by = list(dict.fromkeys(group_by))
+    params = {**filters, 'bucket': bucket, 'group_by': ','.join(group_by)}
+    buckets = cached_result('aggregate_api', params, lambda: bucket_aggregates(
+        _apply_filters(BioburdenData.objects.all(), filters), bucket, group_by
+    ))
+    
+    return JsonResponse({
+        'bucket': bucket,
+        'group_by': group_by,
+        'buckets': buckets
+    })
+
+
+TESTS_API_FORMATS = ('json', 'ndjson', 'csv')
+
+
+def tests_api(request):
+    """Raw test records: keyset-paginated JSON pages, or an NDJSON/CSV stream"""
+    
+    output_format = request.GET.get('format') or 'json'
+    filter_form = FilterForm(request.GET)
+    
+    errors = {}
+    if output_format not in TESTS_API_FORMATS:
+        errors['format'] = [f"Must be one of: {', '.join(TESTS_API_FORMATS)}"]
+    position = None
+    if request.GET.get('cursor'):
+        try:
+            position = decode_cursor(request.GET['cursor'])
+        except ValueError:
+            errors['cursor'] = ['Invalid cursor']
+    page_size = DEFAULT_PAGE_SIZE
+    if request.GET.get('page_size'):
+        try:
+            page_size = int(request.GET['page_size'])
+        except ValueError:
+            page_size = 0
+        if not 1 <= page_size <= MAX_PAGE_SIZE:
+            errors['page_size'] = [f'Must be an integer between 1 and {MAX_PAGE_SIZE}']
+    if not filter_form.is_valid():
+        errors.update(filter_form.errors)
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+    
+    queryset = _apply_filters(BioburdenData.objects.all(), _filter_params(filter_form))
+    
+    if output_format == 'ndjson':
+        return StreamingHttpResponse(
+            ndjson_stream(iter_records(queryset, position)), content_type='application/x-ndjson'
+        )
+    if output_format == 'csv':
+        response = StreamingHttpResponse(
+            csv_stream(iter_records(queryset, position)), content_type='text/csv'
+        )
+        response['Content-Disposition'] = 'attachment; filename="bioburden_tests.csv"'
+        return response
+    
+    results, next_cursor = keyset_page(queryset, position, page_size)
+    return JsonResponse({
+        'page_size': page_size,
+        'next_cursor': next_cursor,
+        'results': results
+    })
+
+
+def _autocomplete(request, name):
+    """Prefix search over lot numbers or area names for LookupSelect widgets"""
+    try:
+        limit = int(request.GET.get('limit') or LOOKUP_DEFAULT_LIMIT)
+        if not 1 <= limit <= LOOKUP_MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': f'limit must be an integer between 1 and {LOOKUP_MAX_LIMIT}'}, status=400)
+    
+    results, more = lookup_search(name, request.GET.get('q', ''), limit)
+    return JsonResponse({
+        'results': results,
+        'more': more
+    })
+
+
+@conditional_on_data_version('lot_autocomplete')
+def lot_autocomplete(request):
+    """Lots whose number starts with ?q= (AJAX)"""
+    return _autocomplete(request, 'lot')
+
+
+@conditional_on_data_version('area_autocomplete')
+def area_autocomplete(request):
+    """Areas whose name starts with ?q= (AJAX)"""
+    return _autocomplete(request, 'area')
+
+
+def cache_stats_api(request):
+    """Hit/miss statistics of the analysis result cache"""
+    return JsonResponse(result_cache_stats())
+
+
+def metrics(request):
+    """Request and import metrics of all workers in the Prometheus text format"""
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS and not request.user.is_staff:
+        raise Http404
+    
+    return HttpResponse(
+        render_prometheus(metrics_registry().totals()), content_type='text/plain; version=0.0.4; charset=utf-8'
     )
+
+
+def query_profile(request):
+    """Per-view query profiles, slowest first (DEBUG or staff only; POST clears)"""
+    if not (settings.DEBUG or request.user.is_staff):
+        raise Http404
+    
+    store = profile_store()
+    if request.method == 'POST':
+        store.clear()
+        messages.success(request, 'Query profiles cleared.')
+        return redirect('bioburden:query_profile')
+    
+    context = {
+        'enabled': settings.BIOBURDEN_QUERY_PROFILING,
+        'threshold': settings.BIOBURDEN_N_PLUS_ONE_THRESHOLD,
+        'views': store.report(),
+    }
+    
+    return render(request, 'bioburden/query_profile.html', context)
+
+
+def threshold_simulator(request):
+    """What-if simulator for candidate alert/action levels (read-only)"""
+    form = ThresholdSimulationForm(request.GET or None)
+    result = None
+    elapsed_ms = None
     
-    # Get threshold
-    threshold = None
-    if hasattr(lot, 'threshold'):
-        threshold = lot.threshold
+    if form.is_valid():
+        started = time.perf_counter()
+        result = simulate_thresholds([form.as_rule()])
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
     
-    # Area breakdown
-    area_breakdown = tests.values('area__name', 'status').annotate(
-        count=Count('id'),
-        avg_cfu=Avg('adjusted_cfu')
+    context = {
+        'form': form,
+        'result': result,
+        'elapsed_ms': elapsed_ms
+    }
+    
+    return render(request, 'bioburden/threshold_simulator.html', context)
+
+
+@csrf_exempt
+def threshold_simulation_api(request):
+    """API endpoint for threshold what-if simulation (never writes)
+    
+    GET takes a single candidate as query parameters; POST takes a JSON body
+    {"rules": [{"lot": .., "area": .., "alert_level": .., "action_level": ..}, ...]}.
+    """
+    if request.method == 'POST':
+        try:
+            rules_data = json.loads(request.body).get('rules', [])
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    else:
+        rules_data = [request.GET]
+    
+    rules = []
+    for i, rule_data in enumerate(rules_data):
+        form = ThresholdSimulationForm(rule_data)
+        if not form.is_valid():
+            return JsonResponse({'error': 'Invalid rule', 'rule': i, 'details': form.errors}, status=400)
+        rules.append(form.as_rule())
+    
+    if not rules:
+        return JsonResponse({'error': 'No rules given'}, status=400)
+    
+    started = time.perf_counter()
+    result = simulate_thresholds(rules)
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    
+    return JsonResponse(result)
+
+
+def _ingest_token_valid(request):
+    """Whether the request carries one of settings.BIOBURDEN_INGEST_TOKENS as a bearer token"""
+    scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return False
+    return any(
+        hmac.compare_digest(token.encode(), allowed.encode())
+        for allowed in getattr(settings, 'BIOBURDEN_INGEST_TOKENS', [])
     )
+
+
+@csrf_exempt
+def ingest_api(request):
+    """Bulk upsert of test results from a JSON array or CSV body (bearer token required)
+    
+    JSON bodies are a list of records or {"records": [...]}; CSV bodies use
+    the record field names as header and ';' between sample values.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405, headers={'Allow': 'POST'})
+    if not _ingest_token_valid(request):
+        return JsonResponse(
+            {'error': 'Authentication required'}, status=401, headers={'WWW-Authenticate': 'Bearer'}
+        )
+    
+    try:
+        if request.content_type == 'text/csv':
+            records = parse_csv_records(request.body.decode('utf-8-sig'))
+        else:
+            records = json.loads(request.body)
+            if isinstance(records, dict):
+                records = records.get('records')
+    except (ValueError, UnicodeDecodeError, csv.Error):
+        return JsonResponse({'error': 'Invalid request body'}, status=400)
+    if not isinstance(records, list) or not records:
+        return JsonResponse({'error': 'No records given'}, status=400)
+    if len(records) > MAX_INGEST_RECORDS:
+        return JsonResponse({'error': f'At most {MAX_INGEST_RECORDS} records per request'}, status=400)
+    
+    started = time.perf_counter()
+    result = ingest_records(records)
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    
+    return JsonResponse(result)
+
+
+def _lot_summaries():
+    """Test statistics of every lot keyed by lot id (cached per data version)"""
+    
+    snapshot = get_snapshot()
+    stats = group_stats(
+        snapshot['lot_code'], len(snapshot.lot_ids), snapshot['value'], snapshot['status_code']
+    )
+    
+    summaries = {}
+    for code, lot_id in enumerate(snapshot.lot_ids.tolist()):
+        summaries[lot_id] = {
+            'total_tests': int(stats['count'][code]),
+            'avg_cfu': float(stats['mean'][code]),
+            'max_cfu': float(stats['max'][code]),
+            'min_cfu': float(stats['min'][code]),
+            'std_dev': float(stats['std'][code]),
+            'alert_count': int(stats['status'][code, STATUS_CODES['alert']]),
+            'action_count': int(stats['status'][code, STATUS_CODES['action']])
+        }
+    
+    return summaries
+
+
+LOT_CHART_MAX_POINTS = 500
+LOT_TESTS_PAGE_SIZE = 50
+
+
+@conditional_on_data_version('lot_detail', daily=True)
+def lot_detail(request, pk):
+    """Detailed view for a specific lot (tests and trend load asynchronously)"""
+    lot = get_object_or_404(Lot, pk=pk)
+    
+    stats = cached_result('lot_summaries', {}, _lot_summaries).get(lot.pk, {
+        'total_tests': 0,
+        'avg_cfu': None,
+        'alert_count': 0,
+        'action_count': 0
+    })
     
     context = {
         'lot': lot,
-        'tests': tests,
         'stats': stats,
-        'threshold': threshold,
-        'area_breakdown': area_breakdown
+        'threshold': lot.threshold,
+        'chart_max_points': LOT_CHART_MAX_POINTS,
+        'tests_page_size': LOT_TESTS_PAGE_SIZE
     }
     
     return render(request, 'bioburden/lot_detail.html', context)
 
 
-def area_comparison(request):
-    """Compare bioburden levels across different areas"""
+@conditional_on_data_version('lot_tests_api')
+def lot_tests_api(request, pk):
+    """One page of a lot's tests, newest first (AJAX)"""
+    lot = get_object_or_404(Lot.objects.only('pk'), pk=pk)
+    
+    try:
+        position = decode_cursor(request.GET['after']) if request.GET.get('after') else None
+        page_size = int(request.GET.get('page_size') or LOT_TESTS_PAGE_SIZE)
+        if not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': f'Invalid cursor or page_size (1 to {MAX_PAGE_SIZE})'}, status=400)
+    
+    tests = BioburdenData.objects.filter(lot=lot).values(
+        'id', 'test_date', 'area__name', 'sample_id', 'cfu_count', 'adjusted_cfu', 'status', 'lab_name'
+    )
+    rows, next_cursor, _ = seek_page(tests, page_size, after=position, descending=True)
+    status_labels = dict(BioburdenData.STATUS_CHOICES)
+    
+    results = [
+        {
+            'id': row['id'],
+            'test_date': row['test_date'],
+            'area': row['area__name'],
+            'sample_id': row['sample_id'],
+            'cfu_count': row['cfu_count'],
+            'adjusted_cfu': row['adjusted_cfu'],
+            'status': row['status'],
+            'status_display': status_labels.get(row['status'], row['status']),
+            'lab_name': row['lab_name'],
+            'edit_url': reverse('bioburden:data_update', args=[row['id']])
+        }
+        for row in rows
+    ]
+    
+    return JsonResponse({
+        'next_cursor': next_cursor,
+        'results': results
+    })
+
+
+def _area_comparison_context():
+    """Template context for area_comparison (cached per data version)"""
     
-    areas = Area.objects.all()
+    snapshot = get_snapshot()
+    stats = group_stats(
+        snapshot['area_code'], len(snapshot.area_ids), snapshot['value'], snapshot['status_code']
+    )
+    area_codes = {area_id: code for code, area_id in enumerate(snapshot.area_ids.tolist())}
     
     area_data = []
-    for area in areas:
-        tests = BioburdenData.objects.filter(area=area)
-        stats = tests.aggregate(
-            avg_cfu=Avg('adjusted_cfu'),
-            max_cfu=Max('adjusted_cfu'),
-            total_tests=Count('id'),
-            alert_count=Count('id', filter=Q(status='alert')),
-            action_count=Count('id', filter=Q(status='action'))
-        )
+    for area in Area.objects.all():
+        code = area_codes.get(area.pk)
+        if code is None:
+            area_stats = {
+                'avg_cfu': None,
+                'max_cfu': None,
+                'total_tests': 0,
+                'alert_count': 0,
+                'action_count': 0
+            }
+        else:
+            area_stats = {
+                'avg_cfu': float(stats['mean'][code]),
+                'max_cfu': float(stats['max'][code]),
+                'total_tests': int(stats['count'][code]),
+                'alert_count': int(stats['status'][code, STATUS_CODES['alert']]),
+                'action_count': int(stats['status'][code, STATUS_CODES['action']])
+            }
         
         area_data.append({
             'area': area,
-            'stats': stats
+            'stats': area_stats
         })
     
     context = {
         'area_data': area_data
     }
     
+    return context
+
+
+@conditional_on_data_version('area_comparison')
+def area_comparison(request):
+    """Compare bioburden levels across different areas"""
+    
+    context = cached_result('area_comparison', {}, _area_comparison_context)
+    
     return render(request, 'bioburden/area_comparison.html', context)
 
 
-def outlier_analysis(request):
-    """Statistical outlier detection for lots"""
-    import numpy as np
-    from scipy import stats as scipy_stats
+def _outlier_analysis_context():
+    """Template context for outlier_analysis (cached per data version)"""
     
-    lots = Lot.objects.all()
-    outlier_data = []
+    snapshot = get_snapshot()
     
-    for lot in lots:
-        tests = BioburdenData.objects.filter(lot=lot)
-        
-        if tests.count() == 0:
-            continue
-        
-        # Get CFU values
-        cfu_values = [float(test.adjusted_cfu or test.cfu_count) for test in tests]
+    # Mean, spread and |Z| > 2 outlier counts for every lot in one pass
+    stats = group_stats(snapshot['lot_code'], len(snapshot.lot_ids), snapshot['value'])
+    lot_codes = {lot_id: code for code, lot_id in enumerate(snapshot.lot_ids.tolist())}
+    
+    outlier_data = []
+    for lot in Lot.objects.filter(pk__in=lot_codes):
+        code = lot_codes[lot.pk]
+        total = int(stats['count'][code])
         
-        if len(cfu_values) < 3:
+        if total < 3:
             continue
         
-        # Calculate statistics
-        mean_cfu = np.mean(cfu_values)
-        std_cfu = np.std(cfu_values)
-        median_cfu = np.median(cfu_values)
-        
-        # Calculate Z-scores
-        z_scores = scipy_stats.zscore(cfu_values) if std_cfu > 0 else [0] * len(cfu_values)
-        
-        # Identify outliers (|Z| > 2 is common threshold)
-        outlier_count = sum(1 for z in z_scores if abs(z) > 2)
-        outlier_percentage = (outlier_count / len(cfu_values)) * 100 if len(cfu_values) > 0 else 0
+        outlier_count = int(stats['outliers'][code])
+        outlier_percentage = (outlier_count / total) * 100
         
         # Determine status
         if outlier_percentage == 0:
@@ -392,10 +951,10 @@ def outlier_analysis(request):
         
         outlier_data.append({
             'lot': lot,
-            'mean_cfu': round(mean_cfu, 2),
-            'std_cfu': round(std_cfu, 2),
-            'median_cfu': round(median_cfu, 2),
-            'total_samples': len(cfu_values),
+            'mean_cfu': round(float(stats['mean'][code]), 2),
+            'std_cfu': round(float(stats['std'][code]), 2),
+            'median_cfu': round(float(stats['median'][code]), 2),
+            'total_samples': total,
             'outlier_count': outlier_count,
             'outlier_percentage': round(outlier_percentage, 1),
             'status': status,
@@ -409,101 +968,92 @@ def outlier_analysis(request):
         'outlier_data': outlier_data
     }
     
+    return context
+
+
+@conditional_on_data_version('outlier_analysis')
+def outlier_analysis(request):
+    """Statistical outlier detection for lots"""
+    
+    context = cached_result('outlier_analysis', {}, _outlier_analysis_context)
+    
     return render(request, 'bioburden/outlier_analysis.html', context)
 
 
-def organism_frequency(request):
-    """Organism frequency analysis by lot and organism type"""
+def _organism_frequency_context():
+    """Template context for organism_frequency (cached per data version)"""
     
     # Organism frequency by lot
-    lots_with_organisms = Lot.objects.exclude(primary_organism__isnull=True)
+    lots_with_organisms = Lot.objects.filter(organism_links__isnull=False).distinct().prefetch_related(
+        Prefetch('organism_links', queryset=LotOrganism.objects.select_related('organism'))
+    )
     
     lot_organism_data = []
     for lot in lots_with_organisms:
-        organisms = []
-        if lot.primary_organism:
-            organisms.append(('Primary', lot.primary_organism))
-        if lot.secondary_organism:
-            organisms.append(('Secondary', lot.secondary_organism))
-        if lot.tertiary_organism:
-            organisms.append(('Tertiary', lot.tertiary_organism))
-        
-        organism_count = len(organisms)
+        by_rank = {link.rank: link.organism.name for link in lot.organism_links.all()}
         
         lot_organism_data.append({
             'lot': lot,
-            'organism_count': organism_count,
-            'organisms': organisms,
+            'organism_count': len(by_rank),
+            'organisms': [by_rank.get(rank) for rank, _ in LotOrganism.RANK_CHOICES],
             'production_date': lot.production_date
         })
     
-    # Organism frequency summary
-    from collections import Counter
-    
-    all_organisms = []
-    for lot in lots_with_organisms:
-        if lot.primary_organism:
-            all_organisms.append(lot.primary_organism)
-        if lot.secondary_organism:
-            all_organisms.append(lot.secondary_organism)
-        if lot.tertiary_organism:
-            all_organisms.append(lot.tertiary_organism)
-    
-    organism_counts = Counter(all_organisms)
-    organism_summary = [
-        {'name': org, 'count': count, 'percentage': round((count/len(all_organisms))*100, 1)}
-        for org, count in organism_counts.most_common()
-    ]
+    # Organism frequency summary and co-occurrence
+    organism_summary, total_organisms = organism_frequency_summary()
     
     context = {
         'lot_organism_data': lot_organism_data,
         'organism_summary': organism_summary,
-        'total_organisms': len(all_organisms),
-        'unique_organisms': len(organism_counts)
+        'organism_pairs': top_cooccurring_pairs(),
+        'total_organisms': total_organisms,
+        'unique_organisms': len(organism_summary)
     }
     
+    return context
+
+
+@conditional_on_data_version('organism_frequency')
+def organism_frequency(request):
+    """Organism frequency analysis by lot and organism type"""
+    
+    context = cached_result('organism_frequency', {}, _organism_frequency_context)
+    
     return render(request, 'bioburden/organism_frequency.html', context)
 
 
-def cfu_per_area_analysis(request):
-    """Detailed CFU analysis per area with statistics"""
+def _cfu_per_area_analysis_context():
+    """Template context for cfu_per_area_analysis (cached per data version)"""
     
-    areas = Area.objects.all()
-    area_analysis = []
+    snapshot = get_snapshot()
+    stats = group_stats(
+        snapshot['area_code'], len(snapshot.area_ids), snapshot['value'], snapshot['status_code']
+    )
+    area_codes = {area_id: code for code, area_id in enumerate(snapshot.area_ids.tolist())}
     
-    for area in areas:
-        tests = BioburdenData.objects.filter(area=area)
+    area_analysis = []
+    for area in Area.objects.filter(pk__in=area_codes):
+        code = area_codes[area.pk]
         
-        if tests.count() == 0:
-            continue
+        stats_data = {
+            'area': area,
+            'total_tests': int(stats['count'][code]),
+            'mean_cfu': round(float(stats['mean'][code]), 2),
+            'median_cfu': round(float(stats['median'][code]), 2),
+            'std_cfu': round(float(stats['std'][code]), 2),
+            'min_cfu': round(float(stats['min'][code]), 2),
+            'max_cfu': round(float(stats['max'][code]), 2),
+            'range_cfu': round(float(stats['max'][code] - stats['min'][code]), 2),
+            'percentile_25': round(float(stats['p25'][code]), 2),
+            'percentile_75': round(float(stats['p75'][code]), 2),
+        }
         
-        # Get CFU values
-        cfu_values = [float(test.adjusted_cfu or test.cfu_count) for test in tests]
+        # Status counts
+        stats_data['normal_count'] = int(stats['status'][code, STATUS_CODES['normal']])
+        stats_data['alert_count'] = int(stats['status'][code, STATUS_CODES['alert']])
+        stats_data['action_count'] = int(stats['status'][code, STATUS_CODES['action']])
         
-        if len(cfu_values) > 0:
-            import numpy as np
-            
-            stats_data = {
-                'area': area,
-                'total_tests': len(cfu_values),
-                'mean_cfu': round(np.mean(cfu_values), 2),
-                'median_cfu': round(np.median(cfu_values), 2),
-                'std_cfu': round(np.std(cfu_values), 2),
-                'min_cfu': round(min(cfu_values), 2),
-                'max_cfu': round(max(cfu_values), 2),
-                'range_cfu': round(max(cfu_values) - min(cfu_values), 2),
-            }
-            
-            # Calculate percentiles
-            stats_data['percentile_25'] = round(np.percentile(cfu_values, 25), 2)
-            stats_data['percentile_75'] = round(np.percentile(cfu_values, 75), 2)
-            
-            # Status counts
-            stats_data['normal_count'] = tests.filter(status='normal').count()
-            stats_data['alert_count'] = tests.filter(status='alert').count()
-            stats_data['action_count'] = tests.filter(status='action').count()
-            
-            area_analysis.append(stats_data)
+        area_analysis.append(stats_data)
     
     # Sort by mean CFU descending
     area_analysis.sort(key=lambda x: x['mean_cfu'], reverse=True)
@@ -512,17 +1062,23 @@ def cfu_per_area_analysis(request):
         'area_analysis': area_analysis
     }
     
-    return render(request, 'bioburden/cfu_per_area_analysis.html', context)
+    return context
 
 
-def statistical_summary(request):
-    """Comprehensive statistical summary and Z-score analysis"""
-    import numpy as np
-    from scipy import stats as scipy_stats
+@conditional_on_data_version('cfu_per_area_analysis')
+def cfu_per_area_analysis(request):
+    """Detailed CFU analysis per area with statistics"""
+    
+    context = cached_result('cfu_per_area_analysis', {}, _cfu_per_area_analysis_context)
     
+    return render(request, 'bioburden/cfu_per_area_analysis.html', context)
+
+
+def _statistical_summary_context():
+    """Template context for statistical_summary (cached per data version)"""
     # Overall statistics
     all_tests = BioburdenData.objects.all()
-    cfu_values = [float(test.adjusted_cfu or test.cfu_count) for test in all_tests]
+    cfu_values = get_snapshot()['value']
     
     if len(cfu_values) > 0:
         overall_stats = {
@@ -531,29 +1087,25 @@ def statistical_summary(request):
             'median': round(np.median(cfu_values), 2),
             'std': round(np.std(cfu_values), 2),
             'variance': round(np.var(cfu_values), 2),
-            'min': round(min(cfu_values), 2),
-            'max': round(max(cfu_values), 2),
-            'range': round(max(cfu_values) - min(cfu_values), 2),
+            'min': round(cfu_values.min(), 2),
+            'max': round(cfu_values.max(), 2),
+            'range': round(cfu_values.max() - cfu_values.min(), 2),
             'cv': round((np.std(cfu_values) / np.mean(cfu_values)) * 100, 2) if np.mean(cfu_values) > 0 else 0
         }
         
-        # Calculate Z-scores for recent tests
-        z_scores = scipy_stats.zscore(cfu_values) if overall_stats['std'] > 0 else [0] * len(cfu_values)
-        
-        # Get tests with high Z-scores (outliers)
-        recent_tests = list(all_tests.order_by('-test_date')[:20])
+        # Z-scores for the most recent tests against the overall distribution
+        mean_value = np.mean(cfu_values)
+        std_value = np.std(cfu_values)
         recent_with_z = []
         
-        for i, test in enumerate(all_tests.order_by('-test_date')[:20]):
-            idx = list(all_tests.order_by('-test_date')[:20]).index(test)
-            if idx < len(z_scores):
-                z_score = z_scores[-(idx+1)]  # Reverse index
-                recent_with_z.append({
-                    'test': test,
-                    'z_score': round(z_score, 2),
-                    'abs_z_score': round(abs(z_score), 2),
-                    'is_outlier': abs(z_score) > 2
-                })
+        for test in all_tests.select_related('lot', 'area').order_by('-test_date')[:20]:
+            z_score = (test.value - mean_value) / std_value if std_value > 0 else 0
+            recent_with_z.append({
+                'test': test,
+                'z_score': round(z_score, 2),
+                'abs_z_score': round(abs(z_score), 2),
+                'is_outlier': abs(z_score) > 2
+            })
     else:
         overall_stats = None
         recent_with_z = []
@@ -567,4 +1119,13 @@ def statistical_summary(request):
         'thresholds': thresholds
     }
     
-    return render(request, 'bioburden/statistical_summary.html', context)
+    return context
+
+
+@conditional_on_data_version('statistical_summary')
+def statistical_summary(request):
+    """Comprehensive statistical summary and Z-score analysis"""
+    
+    context = cached_result('statistical_summary', {}, _statistical_summary_context)
+    
+    return render(request, 'bioburden/statistical_summary.html', context)
\ No newline at end of file
@@ -31,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bioburden.metrics.MetricsMiddleware',
+    'bioburden.profiling.QueryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -104,3 +106,68 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Caches: 'results' holds analysis results keyed by data version and is
+# shared by all worker processes on the host (see bioburden/cache.py)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'results': {
+        'BACKEND': 'bioburden.cache.SQLiteLRUCache',
+        'LOCATION': BASE_DIR / 'result_cache.sqlite3',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+BIOBURDEN_RESULT_CACHE = 'results'
+
+# Background exports still unfinished this many seconds after they were
+# requested are shown as failed (their worker was most likely recycled)
+BIOBURDEN_EXPORT_TIMEOUT = 3600
+
+# The unfiltered admin test list shows the database's row estimate instead
+# of counting once the table has this many rows. On SQLite the estimate
+# comes from sqlite_stat1, which only ANALYZE updates, so schedule it (e.g.
+# nightly `sqlite3 db.sqlite3 ANALYZE`) before the table reaches this size;
+# smaller lists are counted exactly, cached per data version
+BIOBURDEN_ADMIN_ESTIMATED_COUNT_MIN = 1_000_000
+
+# Release identifier included in result cache keys and ETags; when empty a
+# digest of the app's code and templates is used, so every deploy that
+# changes them starts from fresh entries
+BIOBURDEN_CODE_VERSION = os.environ.get('BIOBURDEN_CODE_VERSION', '')
+
+# Share the in-memory analytics snapshot between worker processes through
+# shared memory (see bioburden/snapshot.py)
+BIOBURDEN_SNAPSHOT_SHARED = False
+
+# Bearer tokens accepted by the bulk ingest API (comma-separated in the
+# environment); the endpoint refuses every request while this is empty
+BIOBURDEN_INGEST_TOKENS = [
+    token.strip() for token in os.environ.get('BIOBURDEN_INGEST_TOKENS', '').split(',') if token.strip()
+]
+
+# Per-request query profiling and N+1 detection (see bioburden/profiling.py);
+# off unless BIOBURDEN_QUERY_PROFILING=1 in the environment
+BIOBURDEN_QUERY_PROFILING = os.environ.get('BIOBURDEN_QUERY_PROFILING') == '1'
+BIOBURDEN_QUERY_PROFILE_PATH = BASE_DIR / 'query_profile.sqlite3'
+BIOBURDEN_QUERY_PROFILE_KEEP = 500
+BIOBURDEN_N_PLUS_ONE_THRESHOLD = 10
+
+# Prometheus metrics (see bioburden/metrics.py), aggregated across worker
+# processes through a local SQLite file and served at /metrics/ to
+# INTERNAL_IPS and staff; BIOBURDEN_METRICS=0 in the environment turns them off
+BIOBURDEN_METRICS = os.environ.get('BIOBURDEN_METRICS', '1') != '0'
+BIOBURDEN_METRICS_PATH = BASE_DIR / 'metrics.sqlite3'
+BIOBURDEN_METRICS_FLUSH_INTERVAL = 10.0
+INTERNAL_IPS = ['127.0.0.1', '::1']
+
+# Modules to import ahead of first use in each worker (see bioburden/lazy.py
+# and gunicorn.conf.py), e.g. BIOBURDEN_WARM_IMPORTS=pandas,openpyxl; by
+# default pandas, openpyxl and scipy load on the first request needing them
+BIOBURDEN_WARM_IMPORTS = [
+    module.strip() for module in os.environ.get('BIOBURDEN_WARM_IMPORTS', '').split(',') if module.strip()
+]
@@ -0,0 +1,15 @@
+"""
+Gunicorn settings (read automatically from the working directory).
+
+pandas, openpyxl and scipy are imported on first use (bioburden/lazy.py).
+Set BIOBURDEN_WARM_IMPORTS=pandas,openpyxl,scipy.sparse to have each worker
+import them in a background thread as soon as it has loaded the
+application, so the first import or export it serves does not pay for them.
+"""
+wsgi_app = 'bioburden_project.wsgi:application'
+
+
+def post_worker_init(worker):
+    from bioburden.lazy import warm_imports
+
+    warm_imports(background=True)
@@ -9,6 +9,9 @@ import numpy as np
 from datetime import datetime
 from decimal import Decimal
 from bioburden.models import Area, Lot, BioburdenData, FixedThreshold
+from bioburden.precompute import warm_result_cache
+from bioburden.thresholds import reclassify_tests
+from bioburden.utils import ExcelImporter
 from django.utils import timezone
 
 print("=" * 80)
@@ -143,7 +146,7 @@ for index, row in df_raw.iterrows():
             correction_factor = 1.0
         
         provider = str(row.get('PROVIDER', 'External Lab'))
-        validation = str(row.get('VALIDATION', 'NO'))
+        validation = str(row.get('VALIDATION', 'NO')).strip().upper()
         
         # Process AEROBES samples
         aerobe_columns = [f'CFU AEROBES S{i}' for i in range(1, 11)]
@@ -152,7 +155,7 @@ for index, row in df_raw.iterrows():
         if aerobe_values:
             avg_cfu = sum(aerobe_values) / len(aerobe_values)
             
-            BioburdenData.objects.create(
+            test = BioburdenData(
                 lot=lot,
                 area=area,
                 test_date=test_date,
@@ -161,8 +164,11 @@ for index, row in df_raw.iterrows():
                 dilution_factor=Decimal(str(correction_factor)),
                 lab_name=provider,
                 analyst='Lab Analyst',
-                notes=f"Type: AEROBES, Validation: {validation}, Samples: {len(aerobe_values)}, Min: {min(aerobe_values)}, Max: {max(aerobe_values)}"
+                organism_type='AEROBES',
+                validation=validation == 'YES',
             )
+            test.set_samples(aerobe_values)
+            test.save()
             test_count += 1
         
         # Process FUNGI samples
@@ -178,7 +184,7 @@ for index, row in df_raw.iterrows():
         if fungi_values:
             avg_fungi = sum(fungi_values) / len(fungi_values)
             
-            BioburdenData.objects.create(
+            test = BioburdenData(
                 lot=lot,
                 area=area,
                 test_date=test_date,
@@ -187,8 +193,11 @@ for index, row in df_raw.iterrows():
                 dilution_factor=Decimal(str(correction_factor)),
                 lab_name=provider,
                 analyst='Lab Analyst',
-                notes=f"Type: FUNGI, Validation: {validation}, Samples: {len(fungi_values)}, Min: {min(fungi_values)}, Max: {max(fungi_values)}"
+                organism_type='FUNGI',
+                validation=validation == 'YES',
             )
+            test.set_samples(fungi_values)
+            test.save()
             test_count += 1
     
     except Exception as e:
@@ -205,41 +214,18 @@ if error_count > 0:
 # ============================================================================
 print("\n🚨 Step 3: Importing fixed alert/action levels...")
 
-df_thresholds = pd.read_excel(excel_file, sheet_name='ALERT_ACTION LEVELS')
-df_thresholds.columns = df_thresholds.columns.str.strip()
-
-# Get the most recent threshold (2026)
-if len(df_thresholds) > 0:
-    latest_threshold = df_thresholds.iloc[-1]
-    
-    alert_level = latest_threshold.get('ALERT LEVEL FIXED')
-    action_level = latest_threshold.get('ACTION LEVEL FIXED')
-    period = latest_threshold.get('DATE PERIOD', 'Current')
-    
-    if not pd.isna(alert_level) and not pd.isna(action_level):
-        print(f"  Using threshold period: {period}")
-        print(f"  Alert Level:  {alert_level}")
-        print(f"  Action Level: {action_level}")
-        
-        threshold_count = 0
-        for lot in Lot.objects.all():
-            FixedThreshold.objects.create(
-                lot=lot,
-                alert_level=Decimal(str(alert_level)),
-                action_level=Decimal(str(action_level)),
-                notes=f"Period: {period}, VDMAX: {latest_threshold.get('VDMAX DOSE', 'N/A')}"
-            )
-            threshold_count += 1
-        
-        print(f"✓ Created {threshold_count} fixed thresholds")
+importer = ExcelImporter(excel_file)
+importer.import_alert_action_levels()
+for message in importer.warnings:
+    print(f"  {message}")
+print(f"✓ Created {FixedThreshold.objects.count()} effective-dated thresholds")
 
 # ============================================================================
 # 4. CALCULATE STATUS FOR ALL TESTS
 # ============================================================================
-print("\n🔄 Step 4: Calculating status based on thresholds...")
+print("\n🔄 Step 4: Calculating status based on thresholds in force on each test date...")
 
-for test in BioburdenData.objects.all():
-    test.save()
+reclassify_tests()
 
 status_counts = {
     'normal': BioburdenData.objects.filter(status='normal').count(),
@@ -252,6 +238,10 @@ print(f"  🟢 Normal:  {status_counts['normal']} tests")
 print(f"  🟠 Alert:   {status_counts['alert']} tests")
 print(f"  🔴 Action:  {status_counts['action']} tests")
 
+print("\n⚡ Precomputing analysis pages...")
+timings = warm_result_cache()
+print(f"✓ Cached {len(timings)} analysis results")
+
 # ============================================================================
 # 5. SUMMARY STATISTICS
 # ============================================================================
@@ -269,12 +259,13 @@ for area in areas_list:
     print(f"    - {area}: {count} tests")
 
 print(f"\n  • Bioburden tests:      {BioburdenData.objects.count()}")
-print(f"    - AEROBES:            {BioburdenData.objects.filter(sample_id__contains='AEROBES').count()}")
-print(f"    - FUNGI:              {BioburdenData.objects.filter(sample_id__contains='FUNGI').count()}")
+print(f"    - AEROBES:            {BioburdenData.objects.filter(organism_type='AEROBES').count()}")
+print(f"    - FUNGI:              {BioburdenData.objects.filter(organism_type='FUNGI').count()}")
 
 print(f"\n  • Fixed thresholds:     {FixedThreshold.objects.count()}")
-print(f"    - Alert level:        {alert_level}")
-print(f"    - Action level:       {action_level}")
+for threshold in FixedThreshold.objects.order_by('effective_from'):
+    print(f"    - {threshold.effective_from or 'start'} to {threshold.effective_to or 'open'}: "
+          f"Alert {threshold.alert_level}, Action {threshold.action_level}")
 
 # Date range
 first_test = BioburdenData.objects.order_by('test_date').first()